@@ -0,0 +1,211 @@
+/*
+ * Optional C implementation of the CPU bound parts of protocol.py
+ *
+ * encode_words(words)       -> same as protocol.EncodeWords
+ * decode_words(size, data)  -> same as protocol.DecodeWords
+ * split_packets(data, max)  -> same as protocol.SplitPackets
+ *
+ * protocol.py falls back on its pure python functions when this module is
+ * not built. See setupSpeedups.py
+ */
+#define PY_SSIZE_T_CLEAN
+#include "Python.h"
+
+static PyObject *struct_error = NULL;
+
+static unsigned long
+read_uint32(const unsigned char *p)
+{
+    return (unsigned long)p[0] | ((unsigned long)p[1] << 8)
+        | ((unsigned long)p[2] << 16) | ((unsigned long)p[3] << 24);
+}
+
+static void
+write_uint32(char *p, unsigned long value)
+{
+    p[0] = (char)(value & 0xff);
+    p[1] = (char)((value >> 8) & 0xff);
+    p[2] = (char)((value >> 16) & 0xff);
+    p[3] = (char)((value >> 24) & 0xff);
+}
+
+static PyObject *
+raise_unpack_error(void)
+{
+    PyErr_SetString(struct_error, "unpack requires a string argument of length 4");
+    return NULL;
+}
+
+PyDoc_STRVAR(encode_words_doc,
+"encode_words(words) -> (size, encoded words)");
+
+static PyObject *
+encode_words(PyObject *self, PyObject *args)
+{
+    PyObject *words, *seq, *strings, *encoded, *result;
+    Py_ssize_t i, n, size = 0;
+    char *p;
+
+    if (!PyArg_ParseTuple(args, "O:encode_words", &words))
+        return NULL;
+    seq = PySequence_Fast(words, "words must be iterable");
+    if (seq == NULL)
+        return NULL;
+    n = PySequence_Fast_GET_SIZE(seq);
+    strings = PyList_New(n);
+    if (strings == NULL) {
+        Py_DECREF(seq);
+        return NULL;
+    }
+    for (i = 0; i < n; i++) {
+        PyObject *word = PyObject_Str(PySequence_Fast_GET_ITEM(seq, i));
+        if (word == NULL) {
+            Py_DECREF(strings);
+            Py_DECREF(seq);
+            return NULL;
+        }
+        PyList_SET_ITEM(strings, i, word);
+        size += PyString_GET_SIZE(word) + 5;
+    }
+    Py_DECREF(seq);
+
+    encoded = PyString_FromStringAndSize(NULL, size);
+    if (encoded == NULL) {
+        Py_DECREF(strings);
+        return NULL;
+    }
+    p = PyString_AS_STRING(encoded);
+    for (i = 0; i < n; i++) {
+        PyObject *word = PyList_GET_ITEM(strings, i);
+        Py_ssize_t len = PyString_GET_SIZE(word);
+        write_uint32(p, (unsigned long)len);
+        memcpy(p + 4, PyString_AS_STRING(word), len);
+        p[4 + len] = '\0';
+        p += len + 5;
+    }
+    Py_DECREF(strings);
+
+    result = Py_BuildValue("(nN)", size, encoded);
+    return result;
+}
+
+PyDoc_STRVAR(decode_words_doc,
+"decode_words(size, data) -> list of words");
+
+static PyObject *
+decode_words(PyObject *self, PyObject *args)
+{
+    const unsigned char *data;
+    Py_ssize_t size, data_len;
+    PY_LONG_LONG offset = 0;
+    PyObject *words;
+
+    if (!PyArg_ParseTuple(args, "ns#:decode_words", &size, &data, &data_len))
+        return NULL;
+    if (data_len < 4)
+        return raise_unpack_error();
+    words = PyList_New(0);
+    if (words == NULL)
+        return NULL;
+    while (offset < size) {
+        PY_LONG_LONG start, end;
+        PyObject *word;
+        int rc;
+
+        if (offset + 4 > data_len) {
+            Py_DECREF(words);
+            return raise_unpack_error();
+        }
+        start = offset + 4;
+        end = start + read_uint32(data + offset);
+        if (end > data_len)
+            end = data_len;
+        word = PyString_FromStringAndSize((const char *)data + start, (Py_ssize_t)(end - start));
+        if (word == NULL) {
+            Py_DECREF(words);
+            return NULL;
+        }
+        rc = PyList_Append(words, word);
+        Py_DECREF(word);
+        if (rc < 0) {
+            Py_DECREF(words);
+            return NULL;
+        }
+        offset += read_uint32(data + offset) + 5;
+    }
+    return words;
+}
+
+PyDoc_STRVAR(split_packets_doc,
+"split_packets(data[, max_size]) -> (list of complete packets, remaining data)");
+
+static PyObject *
+split_packets(PyObject *self, PyObject *args)
+{
+    const char *data;
+    Py_ssize_t data_len, offset = 0;
+    unsigned long max_size = 16 * 1024 * 1024;
+    PyObject *packets, *rest;
+
+    if (!PyArg_ParseTuple(args, "s#|k:split_packets", &data, &data_len, &max_size))
+        return NULL;
+    packets = PyList_New(0);
+    if (packets == NULL)
+        return NULL;
+    while (data_len - offset >= 8) {
+        unsigned long packet_size = read_uint32((const unsigned char *)data + offset + 4);
+        PyObject *packet;
+        int rc;
+
+        if (packet_size < 12 || packet_size > max_size) {
+            PyErr_Format(PyExc_ValueError, "invalid packet size %lu", packet_size);
+            Py_DECREF(packets);
+            return NULL;
+        }
+        if ((unsigned long)(data_len - offset) < packet_size)
+            break;
+        packet = PyString_FromStringAndSize(data + offset, (Py_ssize_t)packet_size);
+        if (packet == NULL) {
+            Py_DECREF(packets);
+            return NULL;
+        }
+        rc = PyList_Append(packets, packet);
+        Py_DECREF(packet);
+        if (rc < 0) {
+            Py_DECREF(packets);
+            return NULL;
+        }
+        offset += (Py_ssize_t)packet_size;
+    }
+    rest = PyString_FromStringAndSize(data + offset, data_len - offset);
+    if (rest == NULL) {
+        Py_DECREF(packets);
+        return NULL;
+    }
+    return Py_BuildValue("(NN)", packets, rest);
+}
+
+static PyMethodDef speedups_methods[] = {
+    {"encode_words", encode_words, METH_VARARGS, encode_words_doc},
+    {"decode_words", decode_words, METH_VARARGS, decode_words_doc},
+    {"split_packets", split_packets, METH_VARARGS, split_packets_doc},
+    {NULL, NULL, 0, NULL}
+};
+
+PyMODINIT_FUNC
+init_frostbitespeedups(void)
+{
+    PyObject *module, *struct_module;
+
+    struct_module = PyImport_ImportModule("struct");
+    if (struct_module == NULL)
+        return;
+    struct_error = PyObject_GetAttrString(struct_module, "error");
+    Py_DECREF(struct_module);
+    if (struct_error == NULL)
+        return;
+    module = Py_InitModule3("_frostbitespeedups", speedups_methods,
+                            "C implementation of the Frostbite packet codec");
+    if (module == NULL)
+        return;
+}
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Fleet-wide banlist replication
+#
+# usage :
+#     python banreplication.py [-b <ban store>] import <host>:<port>:<password>
+#         merge the banlist of a server into the ban store
+#     python banreplication.py [-b <ban store>] [-c <checkpoint file>] [-k] [-f] push <server list file>
+#         make the banlist of every server match the ban store
+#         -k : keep the bans found on a server but not in the store
+#         -f : ignore the checkpoint file and check every server
+#
+# The ban store is a JSON file holding the canonical list of bans. For each
+# server only the banList.add / banList.remove commands needed are sent,
+# pipelined, followed by banList.save. Servers already synchronized with the
+# current content of the store are recorded in the checkpoint file and
+# skipped when the push is run again after a partial failure.
+#
+from protocol import FrostbiteError, BANLIST_FIELDS, iterBanlistContent
+from fleet import read_server_list, pipeline, run_on_fleet, connect, connect_fleet, close_fleet
+import hashlib
+import json
+import os
+import sys
+import threading
+
+
+def banKey(ban):
+    return (ban['idType'], ban['id'])
+
+
+def sameBan(a, b):
+    """True if both bans have the same effect. The time left of 'seconds' bans
+    decreases on the server so it is not compared"""
+    if a['banType'] != b['banType'] or a['reason'] != b['reason']:
+        return False
+    return True
+
+
+def banAddCommand(ban):
+    if ban['banType'] == 'seconds':
+        return ('banList.add', ban['idType'], ban['id'], 'seconds', ban['time'], ban['reason'])
+    else:
+        return ('banList.add', ban['idType'], ban['id'], ban['banType'], ban['reason'])
+
+
+def banListEdits(store, serverBans, keepExtra=False):
+    """return the banList commands making a server banlist match the store.
+    store and serverBans are dicts (idType, id) -> ban"""
+    commands = []
+    for key, ban in serverBans.iteritems():
+        wanted = store.get(key)
+        if wanted is None:
+            if not keepExtra:
+                commands.append(('banList.remove',) + key)
+        elif not sameBan(ban, wanted):
+            commands.append(('banList.remove',) + key)
+    for key, ban in store.iteritems():
+        current = serverBans.get(key)
+        if current is None or not sameBan(current, ban):
+            commands.append(banAddCommand(ban))
+    return commands
+
+
+class BanStore(object):
+    """canonical list of bans kept in a JSON file"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.bans = {}
+        if os.path.exists(filename):
+            f = open(filename)
+            try:
+                for ban in json.load(f)['bans']:
+                    # words are bytes on the wire, stored as latin-1 in JSON
+                    ban = dict((k, ban[k].encode('latin-1')) for k in BANLIST_FIELDS)
+                    self.bans[banKey(ban)] = ban
+            finally:
+                f.close()
+
+    def merge(self, bans):
+        """add bans to the store. Return the number of new or changed bans"""
+        count = 0
+        for ban in bans:
+            ban = dict((k, ban[k]) for k in BANLIST_FIELDS)
+            old = self.bans.get(banKey(ban))
+            if old is None or not sameBan(old, ban):
+                count += 1
+            self.bans[banKey(ban)] = ban
+        return count
+
+    def digest(self):
+        """fingerprint of the store content, used for checkpointing"""
+        h = hashlib.sha1()
+        for key in sorted(self.bans.keys()):
+            ban = self.bans[key]
+            h.update(repr([ban[k] for k in BANLIST_FIELDS if k != 'time' or ban['banType'] == 'seconds']))
+        return h.hexdigest()
+
+    def save(self):
+        tmp = self.filename + '.tmp'
+        f = open(tmp, 'w')
+        try:
+            json.dump({'bans': [self.bans[k] for k in sorted(self.bans.keys())]}, f, indent=1, encoding='latin-1')
+        finally:
+            f.close()
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+        os.rename(tmp, self.filename)
+
+
+class Checkpoint(object):
+    """remember which servers are synchronized with which store digest"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self.done = {}
+        if filename and os.path.exists(filename):
+            f = open(filename)
+            try:
+                self.done = json.load(f)
+            finally:
+                f.close()
+
+    def is_done(self, server_name, digest):
+        return self.done.get(server_name) == digest
+
+    def mark_done(self, server_name, digest):
+        self._lock.acquire()
+        try:
+            self.done[server_name] = digest
+            if self.filename:
+                f = open(self.filename, 'w')
+                try:
+                    json.dump(self.done, f, indent=1)
+                finally:
+                    f.close()
+        finally:
+            self._lock.release()
+
+
+def getServerBans(server):
+    bans = {}
+    for ban in iterBanlistContent(server.command_iter('banList.list')):
+        bans[banKey(ban)] = ban
+    return bans
+
+
+def replicate(server, store, keepExtra=False):
+    """make the banlist of a FrostbiteServer match the store. Return the
+    commands sent"""
+    commands = banListEdits(store.bans, getServerBans(server), keepExtra)
+    if not commands:
+        return commands
+    results = pipeline(server, commands + [('banList.save',)])
+    failed = [(c, r) for c, r in zip(commands, results) if isinstance(r, Exception)]
+    if failed:
+        raise FrostbiteError("%s of %s ban commands failed, first one : %r" % (len(failed), len(commands), failed[0]))
+    if isinstance(results[-1], Exception):
+        raise FrostbiteError("banList.save failed : %r" % results[-1])
+    return commands
+
+
+def push(store, serverEntries, checkpoint, keepExtra=False):
+    digest = store.digest()
+    entries = [e for e in serverEntries if not checkpoint.is_done("%s:%s" % e[:2], digest)]
+    for e in serverEntries:
+        if e not in entries:
+            print "%-24s already synchronized" % ("%s:%s" % e[:2])
+    connections, errors = connect_fleet(entries)
+
+    def replicate_and_checkpoint(name):
+        commands = replicate(connections[name], store, keepExtra)
+        checkpoint.mark_done(name, digest)
+        return commands
+
+    try:
+        results = run_on_fleet(sorted(connections.keys()), replicate_and_checkpoint)
+        for name in sorted(errors.keys()):
+            print "%-24s connection failed : %s" % (name, errors[name])
+        for name in sorted(results.keys()):
+            result, elapsed = results[name]
+            if isinstance(result, Exception):
+                print "%-24s %6.3fs  failed : %s" % (name, elapsed, result)
+            else:
+                added = len([c for c in result if c[0] == 'banList.add'])
+                print "%-24s %6.3fs  +%s -%s" % (name, elapsed, added, len(result) - added)
+    finally:
+        close_fleet(connections)
+
+
+def main():
+    from getopt import getopt
+
+    storeFile = 'bans.json'
+    checkpointFile = 'bans.checkpoint.json'
+    keepExtra = False
+    force = False
+    opts, args = getopt(sys.argv[1:], 'b:c:kf')
+    for k, v in opts:
+        if k == '-b':
+            storeFile = v
+        elif k == '-c':
+            checkpointFile = v
+        elif k == '-k':
+            keepExtra = True
+        elif k == '-f':
+            force = True
+    if len(args) != 2 or args[0] not in ('import', 'push'):
+        print "usage : python banreplication.py [-b <ban store>] import <host>:<port>:<password>"
+        print "        python banreplication.py [-b <ban store>] [-c <checkpoint file>] [-k] [-f] push <server list file>"
+        sys.exit(1)
+
+    store = BanStore(storeFile)
+    if args[0] == 'import':
+        host, port, password = args[1].split(':', 2)
+        server = connect((host, int(port), password))
+        try:
+            count = store.merge(getServerBans(server).values())
+        finally:
+            server.stop()
+        store.save()
+        print "%s new or changed bans, %s bans in store" % (count, len(store.bans))
+    else:
+        checkpoint = Checkpoint(checkpointFile)
+        if force:
+            checkpoint.done = {}
+        push(store, read_server_list(args[1]), checkpoint, keepExtra)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Micro benchmarks for the Frostbite protocol module
+#
+# usage : python benchmark.py [-d <seconds of synthetic traffic>] [<benchmark name> ...]
+#
+from protocol import EncodePacket, OK_RESPONSE, DecodePacket, SplitPackets
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+
+def bench_ack_encoding(duration=10, events_per_second=5000):
+    """compare the cost of encoding the 'OK' acknowledgements of a synthetic
+    stream of server events"""
+    nb_events = duration * events_per_second
+    sequences = [i & 0x3fffffff for i in xrange(nb_events)]
+
+    start = time.time()
+    for sequence in sequences:
+        EncodePacket(True, True, sequence, ("OK",))
+    full_encoding = time.time() - start
+
+    start = time.time()
+    for sequence in sequences:
+        OK_RESPONSE.encode(True, True, sequence)
+    template_encoding = time.time() - start
+
+    print "ack encoding for %s events (%ss at %s events/s)" % (nb_events, duration, events_per_second)
+    for name, elapsed in (('EncodePacket', full_encoding), ('PacketTemplate', template_encoding)):
+        print "  %-16s %8.3fs  %6.2f us/ack  %5.2f%% of a core" % (name, elapsed,
+            elapsed * 1000000 / nb_events, elapsed * 100 / duration)
+    print "  speedup : x%.1f" % (full_encoding / template_encoding)
+
+
+class LoopbackServer(threading.Thread):
+    """minimal game server on localhost replying to every command, so that
+    benchmarks involving a connection do not depend on network latency"""
+
+    replies = {
+        'version': ['OK', 'BFBC2', 'R9'],
+        'help': ['OK', 'admin.listPlayers', 'serverInfo', 'version', 'help'],
+    }
+
+    def __init__(self):
+        threading.Thread.__init__(self, name="LoopbackServer")
+        self.daemon = True
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(5)
+        self.port = self.listener.getsockname()[1]
+
+    def run(self):
+        while True:
+            try:
+                conn, addr = self.listener.accept()
+            except socket.error:
+                return
+            t = threading.Thread(target=self.serve, args=(conn,))
+            t.daemon = True
+            t.start()
+
+    def serve(self, conn):
+        data = ''
+        while True:
+            try:
+                chunk = conn.recv(65536)
+            except socket.error:
+                return
+            if not chunk:
+                return
+            packets, data = SplitPackets(data + chunk)
+            for packet in packets:
+                isFromServer, isResponse, sequence, words = DecodePacket(packet)
+                if not isResponse:
+                    reply = self.replies.get(words[0], ['UnknownCommand'])
+                    conn.sendall(EncodePacket(False, True, sequence, reply))
+
+    def stop(self):
+        self.listener.close()
+
+
+def bench_startup(duration=10):
+    """time taken to import the console module in a new interpreter, and to
+    connect the console to a local server until the prompt is ready"""
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def run_python(code):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', code], cwd=here)
+        return time.time() - start
+
+    baseline = []
+    imports = []
+    deadline = time.time() + duration / 2.0
+    while len(imports) < 3 or time.time() < deadline:
+        baseline.append(run_python('pass'))
+        imports.append(run_python('import frostbiteCommander'))
+    import_time = min(imports) - min(baseline)
+
+    from protocol import FrostbiteServer
+    from frostbiteCommander import openConsole
+    server = LoopbackServer()
+    server.start()
+    startups = []
+    try:
+        deadline = time.time() + duration / 2.0
+        while len(startups) < 3 or time.time() < deadline:
+            start = time.time()
+            connection = FrostbiteServer('127.0.0.1', server.port)
+            try:
+                openConsole(connection, banner=False)
+                startups.append(time.time() - start)
+            finally:
+                connection.stop()
+                connection.join()
+    finally:
+        server.stop()
+
+    print "console startup (target : 200 ms plus one round trip)"
+    print "  import frostbiteCommander  %7.1f ms  (best of %s)" % (import_time * 1000, len(imports))
+    print "  connect to prompt          %7.1f ms  (best of %s, worst %.1f ms)" % (
+        min(startups) * 1000, len(startups), max(startups) * 1000)
+    print "  total                      %7.1f ms" % ((import_time + min(startups)) * 1000)
+
+
+def synthetic_events(nb_players=64):
+    """endless stream of the events of a busy server with nb_players players"""
+    import random
+    rand = random.Random(0)
+    players = ['Player%02d' % i for i in range(nb_players)]
+    weapons = ['M16A2', 'AEK971', 'M249', 'SVD', 'knife']
+    while True:
+        killer, victim = rand.sample(players, 2)
+        yield ['player.onKill', killer, victim, rand.choice(weapons), rand.choice(('true', 'false', 'false'))]
+        yield ['player.onSpawn', victim, 'assault']
+        if rand.random() < 0.1:
+            yield ['player.onChat', killer, 'gg ' + victim, 'all']
+        if rand.random() < 0.02:
+            yield ['player.onSquadChange', victim, '1', str(rand.randint(1, 8))]
+
+
+def bench_event_sink(duration=10):
+    """sustained number of events per second written to SQLite by EventSink,
+    compared to one INSERT per event committed as it is received"""
+    import shutil
+    import sqlite3
+    import tempfile
+    from eventsink import EventSink, CREATE_TABLE, INSERT_EVENT, event_row
+
+    directory = tempfile.mkdtemp()
+    try:
+        events = synthetic_events(64)
+
+        db = sqlite3.connect(os.path.join(directory, 'naive.db'))
+        db.execute(CREATE_TABLE)
+        naive_count = 0
+        start = time.time()
+        while time.time() - start < min(2, duration / 5.0):
+            db.execute(INSERT_EVENT, event_row(time.time(), 'bench', next(events)))
+            db.commit()
+            naive_count += 1
+        naive_rate = naive_count / (time.time() - start)
+        db.close()
+
+        sink = EventSink(os.path.join(directory, 'sink.db'), 'bench')
+        sink.start()
+        posted = 0
+        start = time.time()
+        while time.time() - start < duration:
+            for i in xrange(1000):
+                sink.post(next(events))
+            posted += 1000
+        sink.stop()
+        sink.join()
+        elapsed = time.time() - start
+    finally:
+        shutil.rmtree(directory)
+
+    print "event sink, synthetic 64 player server"
+    print "  INSERT and commit per event  %9.0f events/s" % naive_rate
+    print "  EventSink                    %9.0f events/s  (%s events in %s transactions, %s dropped, %.1fs)" % (
+        sink.written / elapsed, sink.written, sink.batches, sink.dropped, elapsed)
+
+
+def bench_killfeed(duration=10, nb_servers=16):
+    """number of player.onKill events per second KillFeed processes on one
+    core, spread over the feeds of nb_servers 64 player servers"""
+    from killfeed import KillFeed
+
+    kills = []
+    for words in synthetic_events(64):
+        if words[0] == 'player.onKill':
+            kills.append(words)
+            if len(kills) == 100000:
+                break
+    feeds = [KillFeed('server%s' % i) for i in range(nb_servers)]
+    alerts = []
+    for feed in feeds:
+        feed.subscribe(lambda server_name, player, rule, value: alerts.append(rule))
+
+    count = 0
+    now = 0.0
+    start = time.time()
+    while time.time() - start < duration:
+        for i in xrange(0, len(kills), nb_servers):
+            # 100 kills per second of game time on each server
+            now += 0.01
+            for feed, words in zip(feeds, kills[i:i + nb_servers]):
+                feed.on_kill(words, now)
+        count += len(kills)
+    elapsed = time.time() - start
+
+    print "kill feed analytics, %s servers of 64 players" % nb_servers
+    print "  %9.0f kills/s  %6.2f us/kill  %s alerts" % (count / elapsed, elapsed * 1000000 / count, len(alerts))
+
+
+def bench_chat_filter(duration=10, nb_words=2000):
+    """time per player.onChat message of ChatFilter with a list of nb_words
+    words, compared to looking for each word in turn"""
+    import random
+    from chatfilter import ChatFilter
+
+    rand = random.Random(0)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = [''.join([rand.choice(letters) for j in range(rand.randint(4, 9))]) for i in range(nb_words)]
+    vocabulary = ['gg', 'nice', 'shot', 'where', 'is', 'the', 'flag', 'medic', 'please', 'lol'] + words[:20]
+    messages = [' '.join([rand.choice(vocabulary) for j in range(rand.randint(2, 12))]) for i in range(1000)]
+
+    def loop_match(message):
+        text = message.lower()
+        return [w for w in words if w in text]
+
+    chat = ChatFilter('bench', words)
+    chat.command('!rules', lambda server_name, player, arguments: None)
+    results = []
+    for name, match in (('word loop', loop_match), ('ChatFilter', chat.on_chat)):
+        count = 0
+        start = time.time()
+        while time.time() - start < duration / 2.0:
+            for message in messages:
+                if match is loop_match:
+                    match(message)
+                else:
+                    match('Player01', message)
+            count += len(messages)
+        results.append((name, (time.time() - start) / count))
+
+    print "chat filter, %s words" % nb_words
+    for name, per_message in results:
+        print "  %-12s %8.2f us/message" % (name, per_message * 1000000)
+    print "  ChatFilter.stats() : mean %.2f us, max %.2f us" % (
+        chat.stats()['mean_time'] * 1000000, chat.stats()['max_time'] * 1000000)
+
+
+benchmarks = {
+    'ack_encoding': bench_ack_encoding,
+    'startup': bench_startup,
+    'event_sink': bench_event_sink,
+    'killfeed': bench_killfeed,
+    'chat_filter': bench_chat_filter,
+}
+
+def main():
+    from getopt import getopt
+    duration = 10
+    opts, args = getopt(sys.argv[1:], 'd:')
+    for k, v in opts:
+        if k == '-d':
+            duration = int(v)
+    names = args or sorted(benchmarks.keys())
+    for name in names:
+        benchmarks[name](duration)
+        print
+
+
+if __name__ == '__main__':
+    main()
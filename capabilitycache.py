@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# On-disk cache of what game servers support
+#
+# usage :
+#     cache = CapabilityCache()
+#     entry = cache.lookup(host, port)    # None or a dict with keys game, version, ...
+#     cache.store(host, port, game, version, commands=[...], playlists=[...], maps={...})
+#
+# Entries are kept in a JSON file in the user's cache directory, keyed by
+# host, port, game and version, so that the console can start without
+# waiting for capability queries. Whoever uses an entry is expected to
+# revalidate it against the server afterwards.
+#
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+
+def default_cache_file():
+    """return the path of the cache file in the user's cache directory"""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.environ.get('APPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'frostbiteCommander', 'capabilities.json')
+
+
+def _latin1(obj):
+    """turn the unicode strings read from JSON back into the byte strings
+    words are made of"""
+    if isinstance(obj, unicode):
+        return obj.encode('latin-1')
+    elif isinstance(obj, list):
+        return [_latin1(o) for o in obj]
+    elif isinstance(obj, dict):
+        return dict([(_latin1(k), _latin1(v)) for k, v in obj.iteritems()])
+    return obj
+
+
+class CapabilityCache(object):
+    """command lists, playlists and maps of game servers, by host, port,
+    game and version. Read and write errors are logged and otherwise ignored,
+    the cache being an optimization only"""
+
+    def __init__(self, filename=None):
+        self.filename = filename or default_cache_file()
+        self._entries = None
+        self._lock = threading.Lock()
+
+    #===============================================================================
+    #
+    #    Public API
+    #
+    #===============================================================================
+
+    def lookup(self, host, port):
+        """return the most recent entry for a server, or None"""
+        self._lock.acquire()
+        try:
+            prefix = "%s:%s/" % (host, port)
+            found = None
+            for key, entry in self._load().iteritems():
+                if key.startswith(prefix) and (found is None or entry['time'] > found['time']):
+                    found = entry
+            return dict(found) if found is not None else None
+        finally:
+            self._lock.release()
+
+    def store(self, host, port, game, version, **capabilities):
+        """record the capabilities of a server (commands, playlists, maps, ...),
+        keeping those of the previous entry for the same version which are
+        not given"""
+        self._lock.acquire()
+        try:
+            entries = self._load()
+            key = self._key(host, port, game, version)
+            entry = dict(entries.get(key, {}))
+            entry.update(capabilities)
+            entry.update({'game': game, 'version': version, 'time': time.time()})
+            entries[key] = entry
+            self._save()
+        finally:
+            self._lock.release()
+
+    #===============================================================================
+    #
+    # Other methods
+    #
+    #===============================================================================
+
+    def getLogger(self):
+        return logging.getLogger("CapabilityCache")
+
+    def _key(self, host, port, game, version):
+        return "%s:%s/%s/%s" % (host, port, game, version)
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.filename):
+                try:
+                    f = open(self.filename)
+                    try:
+                        self._entries = _latin1(json.load(f))
+                    finally:
+                        f.close()
+                except (IOError, ValueError), err:
+                    self.getLogger().warn("could not read %s : %s" % (self.filename, err))
+        return self._entries
+
+    def _save(self):
+        tmp = self.filename + '.tmp'
+        try:
+            directory = os.path.dirname(self.filename)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            f = open(tmp, 'w')
+            try:
+                json.dump(self._entries, f, encoding='latin-1')
+            finally:
+                f.close()
+            if os.path.exists(self.filename):
+                os.remove(self.filename)
+            os.rename(tmp, self.filename)
+        except (IOError, OSError), err:
+            self.getLogger().warn("could not write %s : %s" % (self.filename, err))
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Chat filter : match player.onChat messages against word lists and route
+# !commands, in a single pass over each message
+#
+# usage :
+#     chat = ChatFilter('eu1', wordfile='badwords.txt')
+#     chat.subscribe(on_match)     # on_match(server_name, player, message, matches)
+#     chat.command('!rules', on_rules)    # on_rules(server_name, player, arguments)
+#     frostbiteServer.subscribe(chat.on_event, events=ChatFilter.EVENTS)
+#     print chat.stats()
+#
+# The words are compiled into an Aho-Corasick automaton which finds all the
+# words contained in a message while reading it once, whatever the number of
+# words. Matching ignores case and, by default, only reports whole words.
+# Commands are kept in a trie, so finding the command a message starts with
+# takes one pass over the command name.
+#
+# Word files have one word or expression per line, lines starting with '#'
+# being comments. The word file is checked for changes every check_interval
+# seconds and recompiled in a background thread ; messages are matched
+# against the previous automaton until the new one replaces it.
+#
+from protocol import _monotonic
+from collections import deque
+import logging
+import os
+import threading
+
+
+def read_word_file(filename):
+    """return the words of a word file"""
+    words = []
+    f = open(filename)
+    try:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                words.append(line)
+    finally:
+        f.close()
+    return words
+
+
+class AhoCorasick(object):
+    """automaton finding all the occurrences of a set of patterns in a text"""
+
+    def __init__(self, patterns):
+        # state -> {character: next state}, failure state and patterns ending there
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        self.patterns = set()
+        for pattern in patterns:
+            pattern = pattern.lower()
+            if pattern and pattern not in self.patterns:
+                self.patterns.add(pattern)
+                self._add(pattern)
+        self._link()
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def _add(self, pattern):
+        state = 0
+        for c in pattern:
+            next_state = self._goto[state].get(c)
+            if next_state is None:
+                next_state = self._goto[state][c] = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = next_state
+        self._out[state] = self._out[state] + (pattern,)
+
+    def _link(self):
+        """set the failure states, breadth first"""
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, next_state in goto[state].iteritems():
+                queue.append(next_state)
+                f = fail[state]
+                while f and c not in goto[f]:
+                    f = fail[f]
+                fail[next_state] = goto[f].get(c, 0)
+                out[next_state] = out[next_state] + out[fail[next_state]]
+
+    def finditer(self, text):
+        """yield (start, end, pattern) for each occurrence of a pattern in
+        text, which is expected in lower case"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, c in enumerate(text):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            if out[state]:
+                for pattern in out[state]:
+                    yield i + 1 - len(pattern), i + 1, pattern
+
+
+class CommandTrie(object):
+    """commands such as '!kick' by name, looked up character by character"""
+
+    def __init__(self):
+        # node : [{character: node}, handler or None]
+        self._root = [{}, None]
+
+    def add(self, name, handler):
+        node = self._root
+        for c in name.lower():
+            node = node[0].setdefault(c, [{}, None])
+        node[1] = handler
+
+    def match(self, message):
+        """return (handler, arguments) for the command message starts with,
+        or None. The command name has to be followed by a space or end the
+        message"""
+        node = self._root
+        length = len(message)
+        for i in xrange(length + 1):
+            if i == length or message[i] == ' ':
+                if node[1] is not None:
+                    return node[1], message[i + 1:].strip()
+                return None
+            node = node[0].get(message[i].lower())
+            if node is None:
+                return None
+
+
+def _is_word_char(c):
+    return c.isalnum() or c == '_'
+
+
+class ChatFilter(object):
+    """match the player.onChat messages of a server against a word list and
+    run the commands they contain"""
+
+    EVENTS = ('player.onChat',)
+
+    def __init__(self, server_name=None, words=(), wordfile=None, whole_words=True, check_interval=10):
+        self.server_name = server_name
+        self.wordfile = wordfile
+        self.whole_words = whole_words
+        self.check_interval = check_interval
+        self.observers = set()
+        self.messages = 0
+        self.matched = 0
+        self.commands_run = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self._automaton = AhoCorasick(words)
+        self._commands = CommandTrie()
+        # command name -> handler
+        self._handlers = {}
+        self._wordfile_mtime = None
+        self._next_check = 0
+        self._reloading = False
+        self._lock = threading.Lock()
+        if wordfile is not None:
+            self.reload()
+
+    #===============================================================================
+    #
+    #    Public API
+    #
+    #===============================================================================
+
+    def subscribe(self, func):
+        """call func(server_name, player, message, matches) for each message
+        containing words of the list, matches being the words found"""
+        self.observers = self.observers | set([func])
+
+    def unsubscribe(self, func):
+        self.observers = self.observers - set([func])
+
+    def command(self, name, handler):
+        """call handler(server_name, player, arguments) for messages starting
+        with name, such as '!rules'"""
+        self._lock.acquire()
+        try:
+            self._handlers[name] = handler
+            # build a new trie rather than changing the one in use
+            commands = CommandTrie()
+            for command_name, command_handler in self._handlers.iteritems():
+                commands.add(command_name, command_handler)
+            self._commands = commands
+        finally:
+            self._lock.release()
+
+    def set_words(self, words):
+        """replace the word list. Messages being matched are matched against
+        the previous list"""
+        self._automaton = AhoCorasick(words)
+
+    def reload(self):
+        """recompile the word file"""
+        mtime = os.path.getmtime(self.wordfile)
+        self.set_words(read_word_file(self.wordfile))
+        self._wordfile_mtime = mtime
+        self.getLogger().info("%s words loaded from %s" % (len(self._automaton), self.wordfile))
+
+    def on_event(self, words):
+        """event observer, to subscribe to the EVENTS of a server"""
+        if words[0] == 'player.onChat' and len(words) > 2 and words[1] != 'Server':
+            self.on_chat(words[1], words[2])
+
+    def on_chat(self, player, message):
+        start = _monotonic()
+        if self.wordfile is not None and start >= self._next_check:
+            self._check_wordfile(start)
+        automaton = self._automaton
+        found = []
+        text = message.lower()
+        for begin, end, pattern in automaton.finditer(text):
+            if self.whole_words and ((begin > 0 and _is_word_char(text[begin - 1]))
+                                     or (end < len(text) and _is_word_char(text[end]))):
+                continue
+            if pattern not in found:
+                found.append(pattern)
+        command = self._commands.match(message)
+        elapsed = _monotonic() - start
+        self.messages += 1
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+
+        if found:
+            self.matched += 1
+            for func in self.observers:
+                func(self.server_name, player, message, found)
+        if command is not None:
+            handler, arguments = command
+            self.commands_run += 1
+            try:
+                handler(self.server_name, player, arguments)
+            except Exception, err:
+                self.getLogger().error("command %r from %s failed : %r" % (message, player, err))
+
+    def stats(self):
+        """return the number of messages processed and the time spent per
+        message, matching and routing only"""
+        return {
+            'messages': self.messages,
+            'matched': self.matched,
+            'commands': self.commands_run,
+            'words': len(self._automaton),
+            'mean_time': self.total_time / self.messages if self.messages else 0.0,
+            'max_time': self.max_time,
+        }
+
+    #===============================================================================
+    #
+    # Other methods
+    #
+    #===============================================================================
+
+    def getLogger(self):
+        return logging.getLogger("ChatFilter")
+
+    def _check_wordfile(self, now):
+        self._next_check = now + self.check_interval
+        try:
+            mtime = os.path.getmtime(self.wordfile)
+        except OSError, err:
+            self.getLogger().warn("cannot check %s : %s" % (self.wordfile, err))
+            return
+        if mtime == self._wordfile_mtime or self._reloading:
+            return
+        self._reloading = True
+        t = threading.Thread(target=self._reload, name="ChatFilterReloadThread")
+        t.daemon = True
+        t.start()
+
+    def _reload(self):
+        """Threaded code"""
+        try:
+            self.reload()
+        except (IOError, OSError), err:
+            self.getLogger().error("cannot reload %s : %s" % (self.wordfile, err))
+        finally:
+            self._reloading = False
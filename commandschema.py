@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Command schemas : what the commands of a given game server accept
+#
+# usage :
+#     schema = get_schema('BFBC2', 'R9')
+#     command = schema.get('admin.kickPlayer')
+#     print command.synopsis()
+#     error = command.check(['admin.kickPlayer', 'Courgette'])  # None if valid
+#
+# The schemas are described in data modules (schema_bfbc2, schema_bf3, ...)
+# which are only imported the first time a schema of that game is asked for.
+# A data module defines :
+#
+#     COMMANDS : a sequence of (name, arguments, flags) where arguments is a
+#         string such as '<name: player> [reason: string]' (<> for required
+#         arguments, [] for optional ones) and flags a string containing 'u'
+#         if the command can be run without being logged in, and 'm' if the
+#         command has effects on the server or its players.
+#     HELP : a dict command name -> help text
+#
+import re
+import threading
+
+# (game, version prefix or None for any version, data module name)
+_registry = []
+_schemas = {}
+_lock = threading.Lock()
+
+
+def register(game, version_prefix, module_name):
+    """declare the data module describing the commands of a game server.
+    The longest matching version prefix wins"""
+    _registry.append((game, version_prefix, module_name))
+
+
+def find_module(game, version):
+    """return the name of the data module for that game and version, or None"""
+    best = None
+    for g, prefix, module_name in _registry:
+        if g != game:
+            continue
+        if prefix is None:
+            if best is None:
+                best = ('', module_name)
+        elif version is not None and version.startswith(prefix):
+            if best is None or len(prefix) > len(best[0]):
+                best = (prefix, module_name)
+    if best is None:
+        return None
+    return best[1]
+
+
+def get_schema(game, version=None):
+    """return the CommandSchema of a game server, or None if unknown.
+    The data module is imported on first use only"""
+    module_name = find_module(game, version)
+    if module_name is None:
+        return None
+    _lock.acquire()
+    try:
+        schema = _schemas.get(module_name)
+        if schema is None:
+            module = __import__(module_name)
+            schema = _schemas[module_name] = CommandSchema(module.COMMANDS, module.HELP)
+        return schema
+    finally:
+        _lock.release()
+
+
+register('BFBC2', None, 'schema_bfbc2')
+register('MOH', None, 'schema_bfbc2')
+register('BF3', None, 'schema_bf3')
+
+
+#===============================================================================
+#
+#    Argument types
+#
+#===============================================================================
+
+def _startswith(candidates, text):
+    return [a for a in candidates if a.lower().startswith(text.lower())]
+
+
+class ArgumentType(object):
+    """a type of command argument, most of them are a single word"""
+
+    def width(self, words):
+        """number of words taken by the argument, given the words starting
+        with it"""
+        return 1
+
+    def check(self, words):
+        """return an error message if words are not valid, else None"""
+        return None
+
+    def complete(self, commander, previous, words, text):
+        """completions of text. previous is the list of the words of the
+        previous arguments, words the words of this argument before text"""
+        return []
+
+    def player_offsets(self, words):
+        """positions, among the words of the argument, of the player names"""
+        return ()
+
+
+class IntegerType(ArgumentType):
+    def check(self, words):
+        try:
+            int(words[0])
+        except ValueError:
+            return "%r is not an integer" % words[0]
+
+
+class ChoiceType(ArgumentType):
+    def __init__(self, choices):
+        self.choices = choices
+
+    def check(self, words):
+        if words[0] not in self.choices:
+            return "%r is not one of %s" % (words[0], ', '.join(self.choices))
+
+    def complete(self, commander, previous, words, text):
+        return _startswith(self.choices, text)
+
+
+class HexType(ArgumentType):
+    def check(self, words):
+        if not re.match('^[0-9a-fA-F]*$', words[0]):
+            return "%r is not an hexadecimal string" % words[0]
+
+
+class PlayerType(ArgumentType):
+    def player_offsets(self, words):
+        return (0,)
+
+    def complete(self, commander, previous, words, text):
+        return _startswith(commander._getConnectedPlayers(), text)
+
+
+class PlayerSubsetType(ArgumentType):
+    """all | team <team id> | squad <team id> <squad id> | player <name>"""
+    _widths = {'all': 1, 'team': 2, 'squad': 3, 'player': 2}
+
+    def width(self, words):
+        return self._widths.get(words[0], 1)
+
+    def player_offsets(self, words):
+        if words[0] == 'player':
+            return (1,)
+        return ()
+
+    def check(self, words):
+        if words[0] not in self._widths:
+            return "%r is not a player subset (all, team, squad or player)" % words[0]
+        if words[0] in ('team', 'squad'):
+            for w in words[1:]:
+                if not w.isdigit():
+                    return "%r is not a team/squad id" % w
+
+    def complete(self, commander, previous, words, text):
+        if not words:
+            return _startswith(['all', 'team ', 'squad ', 'player '], text)
+        elif words == ['player']:
+            return _startswith(commander._getConnectedPlayers(), text)
+        return []
+
+
+class TimeoutType(ArgumentType):
+    """perm | round | seconds <integer>"""
+
+    def width(self, words):
+        return 2 if words[0] == 'seconds' else 1
+
+    def check(self, words):
+        if words[0] not in ('perm', 'round', 'seconds'):
+            return "%r is not a timeout (perm, round or seconds <integer>)" % words[0]
+        if words[0] == 'seconds' and not words[1].isdigit():
+            return "%r is not a number of seconds" % words[1]
+
+    def complete(self, commander, previous, words, text):
+        if not words:
+            return _startswith(['perm', 'round', 'seconds '], text)
+        return []
+
+
+class PlaylistType(ArgumentType):
+    def complete(self, commander, previous, words, text):
+        return _startswith(commander._getPlaylists(), text)
+
+
+class MapType(ArgumentType):
+    def complete(self, commander, previous, words, text):
+        return _startswith(commander._getSupportedMaps(), text)
+
+
+class BannedIdType(ArgumentType):
+    """id of a ban whose id-type is the previous argument"""
+
+    def complete(self, commander, previous, words, text):
+        prefix = (previous[-1] if previous else '') + ' '
+        return _startswith([b[len(prefix):] for b in commander._getBans() if b.startswith(prefix)], text)
+
+
+class ReservedSlotType(ArgumentType):
+    def complete(self, commander, previous, words, text):
+        return _startswith(commander._getReservedSlots(), text)
+
+
+ARGUMENT_TYPES = {
+    'string': ArgumentType(),
+    'password': ArgumentType(),
+    'filename': ArgumentType(),
+    'integer': IntegerType(),
+    'team': IntegerType(),
+    'squad': IntegerType(),
+    'boolean': ChoiceType(['true', 'false']),
+    'id-type': ChoiceType(['name', 'ip', 'guid']),
+    'hex': HexType(),
+    'player': PlayerType(),
+    'player subset': PlayerSubsetType(),
+    'timeout': TimeoutType(),
+    'playlist': PlaylistType(),
+    'map': MapType(),
+    'banned id': BannedIdType(),
+    'reserved slot': ReservedSlotType(),
+}
+
+
+#===============================================================================
+#
+#    Schemas
+#
+#===============================================================================
+
+class Argument(object):
+    def __init__(self, name, type_name, optional):
+        self.name = name
+        self.type_name = type_name
+        self.type = ARGUMENT_TYPES[type_name]
+        self.optional = optional
+
+    def __str__(self):
+        if self.optional:
+            return "[%s: %s]" % (self.name, self.type_name)
+        return "<%s: %s>" % (self.name, self.type_name)
+
+
+_argument_re = re.compile(r'([<\[])\s*([^:>\]]+?)\s*:\s*([^>\]]+?)\s*[>\]]')
+
+
+class Command(object):
+    """description of one command : its arguments, whether it can be run
+    without being logged in and whether it has effects on the server or its
+    players"""
+
+    def __init__(self, name, arguments, flags, help=None):
+        self.name = name
+        self.arguments = [Argument(n, t, b == '[') for b, n, t in _argument_re.findall(arguments)]
+        self.unprivileged = 'u' in flags
+        self.mutating = 'm' in flags
+        self.help = help
+
+    def synopsis(self):
+        return ' '.join([self.name] + [str(a) for a in self.arguments])
+
+    def check(self, words):
+        """return an error message if the words of a command line do not
+        match the arguments of the command, else None"""
+        words = list(words[1:])
+        for argument in self.arguments:
+            if not words:
+                if argument.optional:
+                    return None
+                return "missing %s" % argument
+            width = argument.type.width(words)
+            if width > len(words):
+                return "incomplete %s" % argument
+            error = argument.type.check(words[:width])
+            if error:
+                return "invalid %s : %s" % (argument, error)
+            words = words[width:]
+        if words:
+            return "too many arguments : %s" % ' '.join(words)
+        return None
+
+    def player_indexes(self, words):
+        """indexes of the words of a valid command line naming a player"""
+        indexes = []
+        i = 1
+        for argument in self.arguments:
+            if i >= len(words):
+                break
+            width = argument.type.width(words[i:])
+            indexes.extend([i + offset for offset in argument.type.player_offsets(words[i:i + width])])
+            i += width
+        return indexes
+
+    def complete(self, commander, words, text):
+        """completions of text, given the words of the command line before it"""
+        previous = []
+        words = list(words[1:])
+        for argument in self.arguments:
+            if not words:
+                return argument.type.complete(commander, previous, [], text)
+            width = argument.type.width(words)
+            if width > len(words):
+                return argument.type.complete(commander, previous, words, text)
+            previous.extend(words[:width])
+            words = words[width:]
+        return []
+
+
+class CommandSchema(object):
+    """the commands known for a game server, by name"""
+
+    def __init__(self, commands, help):
+        self._commands = {}
+        for name, arguments, flags in commands:
+            self._commands[self._key(name)] = Command(name, arguments, flags, help.get(name))
+
+    def _key(self, name):
+        # the console turns dots into underscores
+        return name.replace('.', '_').lower()
+
+    def get(self, name):
+        """return the Command of that name or None"""
+        return self._commands.get(self._key(name))
+
+    def names(self):
+        return sorted([c.name for c in self._commands.itervalues()])
+
+    def unprivileged_commands(self):
+        return sorted([c.name for c in self._commands.itervalues() if c.unprivileged])
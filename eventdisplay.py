@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Buffered, rate-aggregated display of Frostbite events for the console
+#
+# usage :
+#     display = EventDisplay()
+#     frostbiteServer.subscribe(display.post)
+#     display.hide('player.onSpawn')
+#     display.start()
+#
+# post() only queues the event, so the connection thread never waits on the
+# terminal. A display thread renders the queue at most max_rate times per
+# second. Within each window of window seconds, the first burst events of a
+# type are printed and the others are summarized once the window ends :
+#     .:: player.onKill x 87 in last 5s
+# When the console prompt is displayed, it is redrawn below the events
+# together with what the user was typing. While a command runs, events are
+# kept queued so that they do not interleave with its output ; the console
+# renders them once the command is done.
+#
+from collections import deque
+import fnmatch
+import sys
+import threading
+import time
+
+try:
+    import readline
+except ImportError:
+    readline = None
+
+
+class EventDisplay(threading.Thread):
+    """queue of events to print, rendered from its own thread"""
+
+    def __init__(self, out=None, max_rate=10, window=5, burst=5, max_queued=10000):
+        threading.Thread.__init__(self, name="EventDisplayThread")
+        self.daemon = True
+        self.out = out or sys.stdout
+        self.max_rate = max_rate
+        self.window = window
+        self.burst = burst
+        self.enabled = True
+        self.prompt = None
+        # (show or hide, fnmatch pattern) ; the last matching filter wins
+        self.filters = []
+        self.dropped = 0
+        self._queue = deque(maxlen=max_queued)
+        self._max_queued = max_queued
+        self._lock = threading.Lock()
+        self._stopEvent = threading.Event()
+        self._window_start = time.time()
+        # event name -> number of events in the current window
+        self._window_counts = {}
+        self._filter_cache = {}
+
+    #===============================================================================
+    #
+    #    Public API
+    #
+    #===============================================================================
+
+    def post(self, words):
+        """queue an event. Called from the connection thread, never blocks"""
+        if not self.enabled or not words or not self._is_shown(words[0]):
+            return
+        if len(self._queue) >= self._max_queued:
+            self.dropped += 1
+        self._queue.append(words)
+
+    def show(self, pattern):
+        self._add_filter(True, pattern)
+
+    def hide(self, pattern):
+        self._add_filter(False, pattern)
+
+    def set_prompt(self, prompt):
+        """prompt currently displayed by the console, or None while a command
+        runs. Events rendered while a prompt is displayed are printed above it ;
+        while there is none, the display thread leaves them queued"""
+        self._lock.acquire()
+        try:
+            self.prompt = prompt
+        finally:
+            self._lock.release()
+
+    def render(self):
+        """print the queued events and the summaries of the ended window"""
+        self._lock.acquire()
+        try:
+            self._render()
+        finally:
+            self._lock.release()
+
+    def stop(self):
+        self._stopEvent.set()
+
+    #===============================================================================
+    #
+    # Other methods
+    #
+    #===============================================================================
+
+    def run(self):
+        """Threaded code"""
+        while not self._stopEvent.wait(1.0 / self.max_rate):
+            self._lock.acquire()
+            try:
+                if self.prompt is not None:
+                    self._render()
+            finally:
+                self._lock.release()
+
+    def _render(self):
+        """called with the lock held"""
+        lines = []
+        counts = self._window_counts
+        while self._queue:
+            words = self._queue.popleft()
+            count = counts[words[0]] = counts.get(words[0], 0) + 1
+            if count <= self.burst:
+                lines.append(".:: Event received : %r" % words)
+        now = time.time()
+        if now - self._window_start >= self.window:
+            for name in sorted(counts.keys()):
+                if counts[name] > self.burst:
+                    lines.append(".:: %s x %s in last %gs" % (name, counts[name], round(now - self._window_start, 1)))
+            self._window_counts = {}
+            self._window_start = now
+        if self.dropped:
+            lines.append(".:: %s events dropped" % self.dropped)
+            self.dropped = 0
+        if lines:
+            self._write(lines)
+
+    def _add_filter(self, shown, pattern):
+        self.filters = self.filters + [(shown, pattern)]
+        self._filter_cache = {}
+
+    def _is_shown(self, name):
+        shown = self._filter_cache.get(name)
+        if shown is None:
+            shown = True
+            for filter_shown, pattern in self.filters:
+                if fnmatch.fnmatchcase(name, pattern):
+                    shown = filter_shown
+            self._filter_cache[name] = shown
+        return shown
+
+    def _write(self, lines):
+        prompt = self.prompt
+        if prompt is None or not self.out.isatty():
+            self.out.write('\n'.join(lines) + '\n')
+        else:
+            # erase the prompt line, print the events and redraw the prompt
+            # with what was typed so far
+            typed = readline.get_line_buffer() if readline is not None else ''
+            self.out.write('\r\x1b[K' + '\n'.join(lines) + '\n' + prompt + typed)
+        self.out.flush()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Event sink : store Frostbite events in a SQLite database
+#
+# usage :
+#     sink = EventSink('events.db', server_name='eu1')
+#     sink.start()
+#     frostbiteServer.subscribe(sink.post)
+#     ...
+#     sink.stop()     # writes the events still queued
+#     sink.join()
+#
+# post() only queues the event with the time it was received, the
+# connection thread never touches the database. A writer thread inserts
+# the queued events in transactions of up to batch_size events, or of the
+# events received within max_delay seconds, whichever comes first. The
+# database is in WAL mode so that it can be read while events are written.
+#
+# When the writer cannot keep up and max_queued events are waiting, post()
+# blocks for up to put_timeout seconds, slowing down the connection, then
+# drops the event. Dropped events are counted and logged.
+#
+# Known events are stored with their player, target and detail in their own
+# columns, for instance the killer, the victim and the weapon of a kill.
+# Every event also keeps all its words as a JSON list :
+#
+#     CREATE TABLE events (id, time, server, name, player, target, detail, words)
+#
+import Queue
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+# event name -> index in the words of (player, target, detail), or None
+EVENT_COLUMNS = {
+    'player.onJoin': (1, None, 2),
+    'player.onAuthenticated': (1, None, 2),
+    'player.onLeave': (1, None, None),
+    'player.onSpawn': (1, None, 2),
+    'player.onKill': (1, 2, 3),
+    'player.onChat': (1, None, 2),
+    'player.onKicked': (1, None, 2),
+    'player.onTeamChange': (1, None, 2),
+    'player.onSquadChange': (1, None, 3),
+    'punkBuster.onMessage': (None, None, 1),
+    'server.onLoadingLevel': (None, None, 1),
+    'server.onRoundOver': (None, None, 1),
+}
+
+CREATE_TABLE = """CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    server TEXT,
+    name TEXT NOT NULL,
+    player TEXT,
+    target TEXT,
+    detail TEXT,
+    words TEXT NOT NULL
+)"""
+
+CREATE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS events_time ON events (time)",
+    "CREATE INDEX IF NOT EXISTS events_player ON events (player)",
+)
+
+INSERT_EVENT = "INSERT INTO events (time, server, name, player, target, detail, words) VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+
+def _text(word):
+    """words are byte strings, stored as latin-1 text"""
+    if word is None:
+        return None
+    return word.decode('latin-1')
+
+
+def event_row(event_time, server_name, words):
+    """return the row of the events table for an event"""
+    columns = EVENT_COLUMNS.get(words[0], (None, None, None))
+    values = [_text(words[i]) if i is not None and i < len(words) else None for i in columns]
+    return (event_time, server_name, _text(words[0])) + tuple(values) + (json.dumps(list(words), encoding='latin-1'),)
+
+
+class EventSink(threading.Thread):
+    """queue of events written to a SQLite database by its own thread"""
+
+    def __init__(self, filename, server_name=None, batch_size=500, max_delay=1.0,
+                 max_queued=50000, put_timeout=0.5):
+        threading.Thread.__init__(self, name="EventSinkThread")
+        self.daemon = True
+        self.filename = filename
+        self.server_name = server_name
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.put_timeout = put_timeout
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self._queue = Queue.Queue(max_queued)
+        self._stopEvent = threading.Event()
+
+    #===============================================================================
+    #
+    #    Public API
+    #
+    #===============================================================================
+
+    def post(self, words):
+        """queue an event. Called from the connection thread, blocks for at
+        most put_timeout seconds when the queue is full"""
+        try:
+            self._queue.put((time.time(), words), True, self.put_timeout)
+        except Queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                self.getLogger().warn("%s events dropped, the database cannot keep up" % self.dropped)
+
+    def pending(self):
+        """number of events waiting to be written"""
+        return self._queue.qsize()
+
+    def stop(self):
+        """stop once the queued events are written"""
+        self._stopEvent.set()
+
+    #===============================================================================
+    #
+    # Other methods
+    #
+    #===============================================================================
+
+    def getLogger(self):
+        return logging.getLogger("EventSink")
+
+    def run(self):
+        """Threaded code"""
+        db = sqlite3.connect(self.filename)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(CREATE_TABLE)
+            for statement in CREATE_INDEXES:
+                db.execute(statement)
+            db.commit()
+            while True:
+                batch = self._next_batch()
+                if batch:
+                    self._write(db, batch)
+                elif self._stopEvent.isSet():
+                    break
+        finally:
+            db.close()
+        self.getLogger().info("%s events written in %s transactions" % (self.written, self.batches))
+
+    def _next_batch(self):
+        """wait for a first event, then for up to batch_size events within
+        max_delay seconds"""
+        try:
+            first = self._queue.get(True, 0.2)
+        except Queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.time() + self.max_delay
+        while len(batch) < self.batch_size:
+            try:
+                # no waiting on stop, the queue is only drained
+                batch.append(self._queue.get_nowait())
+            except Queue.Empty:
+                timeout = deadline - time.time()
+                if timeout <= 0 or self._stopEvent.isSet():
+                    break
+                try:
+                    batch.append(self._queue.get(True, min(timeout, 0.05)))
+                except Queue.Empty:
+                    pass
+        return batch
+
+    def _write(self, db, batch):
+        server_name = _text(self.server_name)
+        rows = [event_row(event_time, server_name, words) for event_time, words in batch]
+        try:
+            # one transaction and a single prepared statement for the batch
+            db.executemany(INSERT_EVENT, rows)
+            db.commit()
+        except sqlite3.Error, err:
+            db.rollback()
+            self.dropped += len(rows)
+            self.getLogger().error("could not write %s events : %s" % (len(rows), err))
+            return
+        self.written += len(rows)
+        self.batches += 1
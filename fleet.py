@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Helpers for tools working on a fleet of Frostbite servers
+#
+# A server list file has one server per line :
+#     <host>:<port>:<password>
+# Empty lines and lines starting with '#' are ignored.
+#
+from protocol import FrostbiteServer, FrostbiteError
+import threading
+import time
+
+
+def read_server_list(filename):
+    """return the list of (host, port, password) found in a server list file"""
+    servers = []
+    f = open(filename)
+    try:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            host, port, password = line.split(':', 2)
+            servers.append((host, int(port), password))
+    finally:
+        f.close()
+    return servers
+
+
+def pipeline(server, commands):
+    """send all commands without waiting for the replies, then collect them.
+    Return, in order, the words following 'OK' for each command, or the
+    exception raised for it. The whole list costs about one round trip"""
+    pendings = []
+    for command in commands:
+        try:
+            pendings.append(server.command_async(tuple(command)))
+        except FrostbiteError, err:
+            pendings.append(err)
+    results = []
+    for pending in pendings:
+        if isinstance(pending, FrostbiteError):
+            results.append(pending)
+            continue
+        try:
+            results.append(server.get_response(pending))
+        except FrostbiteError, err:
+            results.append(err)
+    return results
+
+
+def run_on_fleet(targets, func, *args):
+    """call func(target, *args) for each target in its own thread. Return a
+    dict target -> (result or exception raised, elapsed seconds)"""
+    results = {}
+    lock = threading.Lock()
+
+    def run(target):
+        start = time.time()
+        try:
+            result = func(target, *args)
+        except Exception, err:
+            result = err
+        lock.acquire()
+        try:
+            results[target] = (result, time.time() - start)
+        finally:
+            lock.release()
+
+    threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def connect(server_entry):
+    """open and authenticate a connection to a (host, port, password) entry"""
+    host, port, password = server_entry
+    server = FrostbiteServer(host, port, password)
+    try:
+        server.auth()
+    except FrostbiteError:
+        server.stop()
+        raise
+    return server
+
+
+def connect_fleet(server_entries):
+    """connect to all servers concurrently. Return a dict "host:port" ->
+    FrostbiteServer, and a dict "host:port" -> error for the failures"""
+    connections = {}
+    errors = {}
+    for entry, (result, elapsed) in run_on_fleet(server_entries, connect).items():
+        name = "%s:%s" % entry[:2]
+        if isinstance(result, Exception):
+            errors[name] = result
+        else:
+            connections[name] = result
+    return connections, errors
+
+
+def close_fleet(connections):
+    for server in connections.values():
+        server.stop()
@@ -5,13 +5,21 @@
 # 
 #
 from protocol import FrostbiteServer, FrostbiteError, generatePasswordHash, \
-    CommandFailedError
+    CommandFailedError, _monotonic, BANLIST_FIELDS, iterBanlistContent
+from capabilitycache import CapabilityCache
+from eventdisplay import EventDisplay
+from playerindex import PlayerIndex
+import recordoutput
+import commandschema
 import cmd
 import getpass
 import imp
+import logging
+import pipes
 import re
 import shlex
 import sys
+import threading
 import time
 
 __author__ = "Thomas Leveil <thomasleveil@gmail.com>"
@@ -25,29 +33,126 @@ class FrostbiteCommander(cmd.Cmd):
     _frostbiteServer = None
     _frosbitecmdList = []
     _frostbiteUnprivilegedCmdList = ['login.hashed', 'login.plainText', 'logout', 'quit', 'serverInfo', 'version']
+    # command listing the commands available on the server
+    _helpCommand = 'help'
+    # commands handled by the console itself
+    _consoleCmdList = ['time', 'bench', 'stats', 'events', 'format']
+    # EventDisplay showing the game events, if any
+    eventDisplay = None
+    # None to print the raw response words, else one of recordoutput.FORMATS
+    outputFormat = None
+    # number of records after which formatted output pauses, None for no pause
+    pageSize = None
+    # PlayerIndex resolving the partial player names of commands, if any
+    playerIndex = None
     _connectedPlayersCache = []
     _connectedPlayersCacheTime = None
     _playlistsCache = None
+    # playlist -> supported maps
+    _supportedMapsCache = None
     _banlistCache = []
     _banlistCacheTime = None
     _reservedSlotsCache = []
     _reservedSlotsCacheTime = None
+    _schema = None
     
-    def __init__(self, frostbiteServer):
+    def __init__(self, frostbiteServer, game=None, version=None, pendingHelp=None, commandList=None):
+        """pendingHelp is an optional PendingCommand for the _helpCommand
+        request, sent beforehand so the console does not wait for it.
+        commandList is an optional list of available commands, such as one
+        from the capability cache, in which case the server is not asked"""
         cmd.Cmd.__init__(self)
         self.prompt = '> '
         self._frostbiteServer = frostbiteServer
-        self._initAvailableCmds()
+        self._game = game
+        self._version = version
+        if commandList is not None:
+            self._frosbitecmdList = sorted(commandList)
+        else:
+            self._initAvailableCmds(pendingHelp)
+    
+    @property
+    def schema(self):
+        """CommandSchema of the game server, loaded on first use. None if the
+        game is unknown"""
+        if self._schema is None and self._game is not None:
+            self._schema = commandschema.get_schema(self._game, self._version)
+        return self._schema
+
+    def _getUnprivilegedCmds(self):
+        if self.schema is not None:
+            return self.schema.unprivileged_commands()
+        return self._frostbiteUnprivilegedCmdList
         
-    def _initAvailableCmds(self):
+    def _initAvailableCmds(self, pendingHelp=None):
         """depending on the login status, build up the list of available commands"""
         try:
-            self._frosbitecmdList = self._frostbiteServer.command('help')
+            if pendingHelp is None:
+                self._frosbitecmdList = self._frostbiteServer.command(self._helpCommand)
+            else:
+                self._frosbitecmdList = self._frostbiteServer.get_response(pendingHelp)
             self._frosbitecmdList.sort()
         except CommandFailedError, err:
             print err.message
-            self._frosbitecmdList = self._frostbiteUnprivilegedCmdList
+            self._frosbitecmdList = self._getUnprivilegedCmds()
         
+    def _checkArguments(self, line):
+        """check a command line against the command schema. Print the error
+        and the command synopsis and return False if the arguments are not
+        valid, so that the command is not sent for nothing"""
+        if self.schema is None:
+            return True
+        try:
+            words = shlex.split(line)
+        except ValueError, err:
+            print "error : %s" % err
+            return False
+        if not words:
+            return True
+        command = self.schema.get(words[0])
+        if command is None:
+            return True
+        error = command.check(words)
+        if error is None:
+            return True
+        print "error : %s" % error
+        print "usage : %s" % command.synopsis()
+        return False
+
+    def _serverName(self):
+        return "%s:%s" % (self._frostbiteServer.host, self._frostbiteServer.port)
+
+    def _resolvePlayerNames(self, line):
+        """replace the player names of a command line which are part of the
+        name of a single connected player by the full name. Return None if a
+        name matches several players, names matching nobody are kept as is.
+        For commands with effects, only a name the player name starts with is
+        substituted ; players whose name contains it or is close to it are
+        suggested"""
+        if self.playerIndex is None or self.schema is None:
+            return line
+        words = shlex.split(line)
+        command = self.schema.get(words[0]) if words else None
+        indexes = command.player_indexes(words) if command is not None else []
+        if not indexes:
+            return line
+        self._getConnectedPlayers()
+        for i in indexes:
+            records = self.playerIndex.resolve(words[i], self._serverName(),
+                                               substring=not command.mutating, fuzzy=not command.mutating)
+            if not records and command.mutating:
+                suggestions = self.playerIndex.suggest(words[i], self._serverName())
+                if suggestions:
+                    print "note : no connected player named %r, did you mean %s ?" % (
+                        words[i], ' or '.join([r.name for r in suggestions]))
+            if len(records) > 1:
+                print "error : %r matches several players : %s" % (words[i], ', '.join([r.name for r in records]))
+                return None
+            if records and records[0].name != words[i]:
+                print "%s : %r is %s" % (words[0], words[i], records[0].name)
+                words[i] = records[0].name
+        return ' '.join([pipes.quote(w) for w in words])
+
     def _sendFrostbiteCmd(self, command, verbose=False):
         """send a command and returns the response's words"""
         words = shlex.split(command)
@@ -75,6 +180,8 @@ class FrostbiteCommander(cmd.Cmd):
                 for p in playersInfo:
                     self._connectedPlayersCache.append(p['name'])
                 self._connectedPlayersCacheTime = time.time()
+                if self.playerIndex is not None:
+                    self.playerIndex.update(self._serverName(), playersInfo)
                 return self._connectedPlayersCache
             else:
                 return []
@@ -94,8 +201,7 @@ class FrostbiteCommander(cmd.Cmd):
     
     def _getBans(self):
         bans = []
-        banInfo = BanlistContent(self._getBanlist())
-        for b in banInfo:
+        for b in iterBanlistContent(self._getBanlist()):
             bans.append(b['idType'] + ' ' + b['id'])
         return bans
             
@@ -123,6 +229,59 @@ class FrostbiteCommander(cmd.Cmd):
             else:
                 return []
     
+    def _getSupportedMaps(self):
+        if self._supportedMapsCache is None:
+            maps = {}
+            for playlist in self._getPlaylists():
+                words = self._sendFrostbiteCmd('admin.supportedMaps ' + playlist, verbose=False)
+                if words[0] == 'OK':
+                    maps[playlist] = words[1:]
+            self._supportedMapsCache = maps
+        names = set()
+        for playlistMaps in self._supportedMapsCache.values():
+            names.update(playlistMaps)
+        return sorted(names)
+
+    def refreshCapabilities(self, cache):
+        """ask the server for its version, commands, playlists and maps in a
+        background thread, update the console with them and record them in
+        the capability cache"""
+        t = threading.Thread(target=self._refreshCapabilities, args=(cache,),
+                             name="RefreshCapabilitiesThread")
+        t.daemon = True
+        t.start()
+        return t
+
+    def _refreshCapabilities(self, cache):
+        server = self._frostbiteServer
+        capabilities = {}
+        try:
+            pendingVersion = server.command_async('version')
+            pendingHelp = server.command_async(self._helpCommand)
+            pendingPlaylists = None
+            if self.schema is not None and self.schema.get('admin.getPlaylists') is not None:
+                pendingPlaylists = server.command_async('admin.getPlaylists')
+            game, version = server.get_response(pendingVersion)[:2]
+            if (game, version) != (self._game, self._version):
+                # this runs in the background, do not write over the console
+                logging.getLogger("FrostbiteCommander").warn("the server now runs %s version %s, restart the console to get its commands" % (game, version))
+            try:
+                capabilities['commands'] = sorted(server.get_response(pendingHelp))
+                self._frosbitecmdList = capabilities['commands']
+            except CommandFailedError:
+                # not logged in, keep the cached list of privileged commands
+                pass
+            if pendingPlaylists is not None:
+                playlists = server.get_response(pendingPlaylists)
+                pendings = [(p, server.command_async('admin.supportedMaps', p)) for p in playlists]
+                maps = dict([(p, server.get_response(pending)) for p, pending in pendings])
+                capabilities['playlists'] = self._playlistsCache = playlists
+                capabilities['maps'] = self._supportedMapsCache = maps
+        except FrostbiteError, err:
+            logging.getLogger("FrostbiteCommander").warn("could not refresh server capabilities : %r" % err)
+            return
+        cache.store(server.host, server.port, game, version, **capabilities)
+
     def parseline(self, line):
         """Parse the line into a command name and a string containing
         the arguments.  Returns a tuple containing (command, args, line).
@@ -134,6 +293,16 @@ class FrostbiteCommander(cmd.Cmd):
             command = command.replace('.', '_')
         return command, arg, line
     
+    def preloop(self):
+        if self.eventDisplay is not None:
+            self.eventDisplay.set_prompt(self.prompt)
+
+    def precmd(self, line):
+        """the prompt is gone while the command runs"""
+        if self.eventDisplay is not None:
+            self.eventDisplay.set_prompt(None)
+        return line
+
     def postcmd(self, words, line):
         """Hook method executed just after a command dispatch is finished.
         If the 1st word received from the command is not 'OK', try to display
@@ -142,28 +311,83 @@ class FrostbiteCommander(cmd.Cmd):
         cmd, arg, line = self.parseline(line)
         if words and words[0] != 'OK' and words[0] != 'UnknownCommand':
             self.do_help(cmd)
+        if self.eventDisplay is not None:
+            self.eventDisplay.render()
+            self.eventDisplay.set_prompt(self.prompt)
             
     def emptyline(self):
         pass
 
     def default(self, line):
         """what to do if no do_<cmd> function are found"""
+        if not self._checkArguments(line):
+            return
+        line = self._resolvePlayerNames(line)
+        if line is None:
+            return
+        if self.outputFormat is not None:
+            words = shlex.split(line)
+            if words and words[0] != 'quit':
+                return self._writeRecords(words)
         words = self._sendFrostbiteCmd(line)
         print words
         return words
+
+    def _writeRecords(self, words):
+        """run a command and stream its result in outputFormat, one record
+        per ban, per player, or per word for the other commands"""
+        server = self._frostbiteServer
+        try:
+            if words[0] == 'banList.list':
+                fields = BANLIST_FIELDS
+                records = iterBanlistContent(server.command_iter(tuple(words)))
+            elif words[0] in ('listPlayers', 'admin.listPlayers'):
+                response = server.command(tuple(words))
+                fields = response[1:1 + int(response[0])]
+                records = PlayerInfoBlock(response)
+            else:
+                fields = ('word',)
+                records = ({'word': w} for w in server.command_iter(tuple(words)))
+        except CommandFailedError, err:
+            print err.message
+            return err.message
+        recordoutput.write_records(records, fields, self.outputFormat, page_size=self.pageSize)
+        return ['OK']
+
+    def completedefault(self, text, line, begidx, endidx):
+        """complete the arguments of the commands described in the schema"""
+        if self.schema is None:
+            return []
+        try:
+            words = shlex.split(line[:begidx])
+        except ValueError:
+            return []
+        if not words:
+            return []
+        command = self.schema.get(words[0])
+        if command is None:
+            return []
+        return command.complete(self, words, text)
     
     def completenames(self, text, *ignored):
         """command names completion. return a list of matching commands"""
         cmds = self._frosbitecmdList
         if 'help' not in cmds:
             cmds.insert(0, 'help')
+        cmds = cmds + [c for c in self._consoleCmdList if c not in cmds]
         return [a for a in cmds if a.lower().startswith(text.lower())]
 
     def do_help(self, line):
         """override default help command"""
         command, arg, line = self.parseline(line)
         if command:
-            cmd.Cmd.do_help(self, command)
+            schemaCommand = self.schema.get(command) if self.schema is not None else None
+            if schemaCommand is not None and schemaCommand.help is not None:
+                print schemaCommand.help
+            elif schemaCommand is not None and not hasattr(self, 'help_' + command):
+                print "\n usage : %s\n" % schemaCommand.synopsis()
+            else:
+                cmd.Cmd.do_help(self, command)
         else:
             print "Available commands :"
             print "====================\n"
@@ -206,6 +430,10 @@ class FrostbiteCommander(cmd.Cmd):
                 return words
             
     def do_listPlayers(self, arg):
+        if not self._checkArguments('listPlayers ' + arg):
+            return
+        if self.outputFormat is not None:
+            return self._writeRecords(['listPlayers'] + shlex.split(arg))
         words = self._sendFrostbiteCmd('listPlayers ' + arg)
         print words
         if words[0] == 'OK':
@@ -214,13 +442,175 @@ class FrostbiteCommander(cmd.Cmd):
                     print "%r" % p
             finally:
                 pass
+        return words
     do_admin_listPlayers = do_admin_listplayers = do_listplayers = do_listPlayers
+
+    def do_time(self, arg):
+        """send a command and print its round trip time"""
+        if not arg.strip():
+            self.help_time()
+            return
+        start = _monotonic()
+        words = self._sendFrostbiteCmd(arg)
+        elapsed = _monotonic() - start
+        print words
+        print "round trip : %.1f ms" % (elapsed * 1000)
+        return words
+
+    def do_bench(self, arg):
+        """send a command N times and print latency statistics"""
+        try:
+            args = shlex.split(arg)
+            pipelined = '-p' in args
+            if pipelined:
+                args.remove('-p')
+            count = int(args[0])
+            words = tuple(args[1:])
+            if count < 1 or not words or words[0] in ('quit', 'logout'):
+                raise ValueError
+            schemaCommand = self.schema.get(words[0]) if self.schema is not None else None
+            if schemaCommand is not None and schemaCommand.mutating:
+                print "error : %s has effects on the server, not benchmarking it" % words[0]
+                return
+        except (IndexError, ValueError):
+            self.help_bench()
+            return
+        server = self._frostbiteServer
+        latencies = []
+        errors = 0
+        start = _monotonic()
+        if pipelined:
+            pendings = []
+            for i in xrange(count):
+                try:
+                    pendings.append(server.command_async(words))
+                except FrostbiteError:
+                    errors += 1
+            for pending in pendings:
+                try:
+                    server.get_response(pending)
+                    latencies.append(pending.elapsed)
+                except FrostbiteError:
+                    errors += 1
+        else:
+            for i in xrange(count):
+                t = _monotonic()
+                try:
+                    server.command(words)
+                    latencies.append(_monotonic() - t)
+                except FrostbiteError:
+                    errors += 1
+        total = _monotonic() - start
+        print "%s %s, %s ok, %s errors in %.3fs : %.1f commands/s" % (
+            count, "pipelined commands" if pipelined else "commands",
+            len(latencies), errors, total, count / total if total else 0)
+        if latencies:
+            latencies.sort()
+            def percentile(p):
+                return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100.0))] * 1000
+            print "min %.1f ms  p50 %.1f ms  p99 %.1f ms  max %.1f ms" % (
+                latencies[0] * 1000, percentile(50), percentile(99), latencies[-1] * 1000)
+        if not errors:
+            return ['OK']
+
+    def do_events(self, arg):
+        """control the display of game events"""
+        display = self.eventDisplay
+        if display is None:
+            print "events are not displayed"
+            return
+        args = arg.split()
+        if not args:
+            print "events display : %s" % ('on' if display.enabled else 'off')
+            for shown, pattern in display.filters:
+                print "  %s %s" % ('show' if shown else 'hide', pattern)
+        elif args == ['on'] or args == ['off']:
+            display.enabled = args[0] == 'on'
+        elif len(args) == 2 and args[0] in ('show', 'hide'):
+            getattr(display, args[0])(args[1])
+        else:
+            self.help_events()
+            return
+        return ['OK']
+
+    def do_format(self, arg):
+        """choose how command results are printed"""
+        arg = arg.strip()
+        if not arg:
+            print "output format : %s" % (self.outputFormat or 'raw')
+        elif arg == 'raw':
+            self.outputFormat = None
+        elif arg in recordoutput.FORMATS:
+            self.outputFormat = arg
+        else:
+            self.help_format()
+            return
+        return ['OK']
+
+    def do_stats(self, arg):
+        """print the connection counters"""
+        stats = self._frostbiteServer.stats()
+        for name in sorted(stats.keys()):
+            print "%-20s %s" % (name, stats[name])
+        return ['OK']
+
+    def help_time(self):
+        print """
+ Console command: time <command> [arguments]
+
+  Effect: Send the command to the server, print the response and the time
+          elapsed until the response was received.
+"""
+
+    def help_bench(self):
+        print """
+ Console command: bench [-p] <count> <command> [arguments]
+
+  Effect: Send the command <count> times and print the min, median, 99th
+          percentile and max response time, and the number of commands per
+          second. Each command waits for the previous response unless -p is
+          given, in which case all commands are sent at once (pipelined).
+"""
+
+    def help_events(self):
+        print """
+ Console command: events [on | off | show <pattern> | hide <pattern>]
+
+  Effect: Turn the display of game events on or off, or show/hide the events
+          whose name matches a pattern such as player.onKill or punkBuster.*
+          The last matching pattern wins. Without argument, print the
+          current settings.
+ Comment: When many events of a type are received, only the first ones are
+          printed and the others are summarized every few seconds.
+"""
+
+    def help_format(self):
+        print """
+ Console command: format [raw | json | csv | table]
+
+  Effect: Choose how command results are printed. raw prints the response
+          words. json, csv and table print one record per ban for
+          banList.list, per player for listPlayers and admin.listPlayers,
+          and per word for the other commands, as the response is decoded.
+          Without argument, print the current format.
+ Comment: json prints one JSON object per line. table sizes its columns on
+          the first page of records.
+"""
+
+    def help_stats(self):
+        print """
+ Console command: stats
+
+  Effect: Print the counters of the connection to the server : commands sent,
+          failed and timed out, events, packets and bytes exchanged.
+"""
     
     def get_undocumented_commands(self):
         undoc_cmds = []
         for bfbc2cmd in self._frosbitecmdList:
             command, arg, line = self.parseline(bfbc2cmd)
-            if not hasattr(self, 'help_' + command):
+            schemaCommand = self.schema.get(command) if self.schema is not None else None
+            if not hasattr(self, 'help_' + command) and (schemaCommand is None or schemaCommand.help is None):
                 undoc_cmds.append(bfbc2cmd)
         return undoc_cmds
 
@@ -434,1046 +824,83 @@ class BanlistContent:
             'time': tmp[3],
             'reason': tmp[4], # 80 chars max
         }
-        
-        
-    
-class Bfbc2Commander_R9(FrostbiteCommander):
-    _frostbiteUnprivilegedCmdList = ['login.hashed', 'login.plainText', 'logout', 'quit', 'serverInfo', 'listPlayers', 'version']
-    
-    def _complete_boolean(self, text, line, begidx, endidx):
-        #print "\n>%s\t%s[%s:%s] = %s" % (text, line, begidx, endidx, line[begidx:endidx])
-        completions = ['true', 'false']
-        return [a for a in completions if a.startswith(text.lower())]
-    
-    def _complete_player_subset(self, text, line, begidx, endidx):
-        args = re.split('\s+', line[:begidx].rstrip())
-        #print "text: '%s'; args: %s" % (text, args)
-        if len(args) == 1 and args[0] == '':
-            completions = ['all', 'team ', 'squad ', 'player ']
-        elif len(args) == 1 and args[0] == 'player':
-            completions = self._getConnectedPlayers()
-        else:
-            completions = []
-        return [a for a in completions if a.lower().startswith(text.lower())] 
-
-    def _complete_player(self, text, line, begidx, endidx):
-        args = re.split('\s+', line[:begidx].rstrip())
-        if len(args) == 1 and args[0] == '':
-            return [a for a in self._getConnectedPlayers() if a.lower().startswith(text.lower())]
-        else:
-            return []
-
-    def _complete_timeout(self, text, line, begidx, endidx):
-        args = re.split('\s+', line[:begidx].rstrip())
-        if len(args) == 1 and args[0] == '':
-            return [a for a in ['perm', 'round', 'seconds '] if a.lower().startswith(text.lower())]
-        else:
-            return []
-
-    def _complete_playlist(self, text, line, begidx, endidx):
-        return [a for a in self._getPlaylists() if a.lower().startswith(text.lower())]
-
-    
-    def help_login_plainText(self):
-        print """
- Request: login.plainText <password: string> 
-
-Response: OK - Login successful, you are now logged in regardless of prior 
-          status 
-Response: InvalidPassword - Login unsuccessful, logged-in status unchanged 
-Response: PasswordNotSet  - Login unsuccessful, logged-in status unchanged 
-Response: InvalidArguments
-
-  Effect: Attempt to login to game server with password <password> 
-Comments: If you are connecting to the admin interface over the internet, then 
-          use login.hashed instead to avoid having evildoers sniff the admin 
-          password
-"""
-
-    def help_login_hashed(self):
-        print """
- Request: login.hashed 
- 
-Response: OK <salt: HexString> - Retrieved salt for the current connection 
-Response: PasswordNotSet - No password set for server, login impossible 
-Response: InvalidArguments 
-  Effect: Retrieves the salt, used in the hashed 
-          password login process 
-
-Comments: This is step 1 in the 2-step hashed password process. When using this 
-          people cannot sniff your admin password.
-
-
- Request: login.hashed <passwordHash: HexString> 
- 
-Response: OK - Login successful, you are now logged in regardless of prior 
-          status 
-Response: PasswordNotSet - No password set for server, login impossible 
-Response: InvalidPasswordHash - Login unsuccessful, logged-in status unchanged 
-Response: InvalidArguments 
-  Effect: Sends a hashed password to the server, in an 
-          attempt to log in 
-          
-Comments: This is step 2 in the 2-step hashed password process. When using this 
-        people cannot sniff your admin password.
-"""
-
-    def help_logout(self):
-        print """
- Request: logout 
- 
-Response: OK - You are now logged out regardless of prior status 
-Response: InvalidArguments 
-
-  Effect: Logout from game server
-"""
-
-    def help_quit(self): 
-        print """
- Request: quit 
- 
-Response: OK 
-Response: InvalidArguments 
-
-  Effect: Disconnect from server
-"""
-
-    def help_version(self):
-        print """
- Request: version 
- 
-Response: OK BFBC2 <version> 
-Response: InvalidArguments 
-
-  Effect: Reports game server type, and build ID 
-Comments: Game server type and build ID uniquely identify the server, and the 
-          protocol it is running.
-"""
-   
-    def help_listPlayers(self):
-        print """\
- Request: listPlayers <players: player subset>
-  
-Response: OK <player info> 
-Response: InvalidArguments
- 
-  Effect: Return list of all players on the server, but with zeroed out GUIDs
-"""
-
-    def help_eventsEnabled(self): 
-        print """
- Request: eventsEnabled [enabled: boolean] 
- 
-Response: OK - for set operation 
-Response: OK <enabled: boolean> - for get operation 
-Response: InvalidArguments 
-
-  Effect: Set whether or not the server will send events to the current 
-          connection
-"""
-    complete_eventsEnabled = _complete_boolean
-
-    def help_help(self):
-        print """
- Request: help 
- 
-Response: OK <all commands available on server, as separate words> 
-Response: InvalidArguments 
-
-  Effect: Report which commands the server knows about
-"""
-
-    def help_admin_runScript(self):
-        print """
- Request: admin.runScript <filename: filename> 
- 
-Response: OK 
-Response: InvalidArguments 
-Response: InvalidFileName - The filename specified does not follow filename 
-          rules 
-Response: ScriptError <line> <original error...> - Script failed at line <line>, 
-          with the given error 
-
-  Effect: Process file, executing script lines one-by-one, aborting processing 
-          upon error
-"""
-
-    def help_punkBuster_pb_sv_command(self):
-        print """
- Request: punkBuster.pb_sv_command <command: string> 
- 
-Response: OK - Command sent to PunkBuster server module 
-Response: InvalidArguments 
-Response: InvalidPbServerCommand - Command does not begin with 'pb_sv_'
-
-  Effect: Send a raw PunkBuster command to the PunkBuster server 
- Comment: The entire command is to be sent as a single string. Don't split it 
-          into multiple words.
-"""
-
-    def help_serverInfo(self):
-        print """
- Request: serverInfo 
- 
-Response: OK <serverName> <current playercount> <max playercount> <current gamem
-			ode> <current map> <current round> <max rounds> 
-Response: InvalidArguments 
-
-  Effect: Query for brief server info. 
-Comments: This command can be performed without being logged in.
-"""
-
-    def help_admin_yell(self):
-        print """
- Request: admin.yell <message: string> <duration [in ms]: integer> 
-                                                        <players: player subset>
-Response: OK
-Response: InvalidArguments
-Response: TooLongMessage
-Response: InvalidDuration
-
-  Effect: Display a message, very visibly on players' screens, for a certain 
-          amount of time. The duration must be more than 0 and at most 60000 ms.
-          The message must be less than 100 characters long.
-"""
-    def complete_admin_yell(self, text, line, begidx, endidx):
-        reCmd1 = re.compile('^(admin\.yell\s+$)', re.IGNORECASE)
-        m = reCmd1.match(line)
-        if m:
-            return ['"'] # to force the user to put quotes around the message
-        else:
-            reCmd = re.compile('^(admin\.yell\s+"[^"]*"\s+\d+\s+)', re.IGNORECASE)
-            m = reCmd.search(line)
-            if m:
-                s = len(m.group(0))
-                return self._complete_player_subset(text, line[s:], begidx - s, endidx - s)
-            else:
-                return []
-
-    def help_admin_say(self):
-        print """
- Request: admin.say <message: string> <players: player subset>
- 
-Response: OK
-Response: InvalidArguments
-Response: TooLongMessage
-
-  Effect: Send a chat message to players. The message must be less 
-          than 100 characters long.
-"""
-
-    def help_admin_runNextLevel(self):
-        print """
- Request: admin.runNextLevel
- 
-Response: OK
-Response: InvalidArguments
-
-  Effect: Switch to next level
-Comments: Always successful.
-"""
-
-    def help_admin_currentLevel(self):
-        print """
- Request: admin.currentLevel
- 
-Response: OK <name>
-Response: InvalidArguments
-
-  Effect: Return current level name
-"""
-
-    def help_mapList_nextLevelIndex(self):
-        print """\
- Request:  mapList.nextLevelIndex  
-Response:  OK  
-  Effect:  Get index of next level to be run 
- 
- 
- Request:  mapList.nextLevelIndex <index: integer>  
-  
-Response:  OK  
-Response:  InvalidArguments  
-Response:  InvalidIndex  - Level index not available in server map list  
-
-  Effect:  Set index of next level to be run to <index>  
-"""
-
-    def help_admin_restartMap(self):
-        print """
- Request: admin.restartMap
- 
-Response: OK
-Response: InvalidArguments
-Response: LevelNotAvailable - server currently has no level loaded / level not 
-          available on server
-
-  Effect: End current round, and restart with the same map
-"""
-
-    def help_admin_supportedMaps(self):
-        print """
- Request: admin.supportedMaps <play list: string>
- 
-Response: OK <map names>
-Response: InvalidArguments
-Response: InvalidPlaylist <play list> - Play list doesn't exist. 
-
-  Effect: Retrieve maplist of maps supported in this play list
-"""
-
-    def help_admin_setPlaylist(self):
-        print """
- Request: admin.setPlaylist <name: string>
- 
-Response: OK - Play list was changed
-Response: InvalidArguments
-Response: InvalidPlaylist - Play list doesn't exist on server. Should be RUSH, 
-		  CONQUEST, SQDM or SQRUSH.
-
-  Effect: Set the play list on the server.
-Comments: Will only use maps supported for this play list. So the mapList might 
-          be invalid 
-   Delay: Change occurs after end of round
-"""
-    complete_admin_setPlaylist = _complete_playlist
-
-    def help_admin_getPlaylist(self):
-        print """
- Request: admin.getPlaylist
- 
-Response: OK <play list>
-Response: InvalidArguments
-
-  Effect: Get the current play list for the server
-"""
-
-    def help_admin_getPlaylists(self):
-        print """
- Request: admin.getPlaylists
- 
-Response: OK <play lists>
-Response: InvalidArguments
-
-  Effect: Get the play lists for the server
-"""
-
-    def help_admin_kickPlayer(self):
-        print """
- Request:  admin.kickPlayer  <soldier name: player name, reason: string>
- 
-Response:  OK - Player did exist, and got kicked  
-Response:  InvalidArguments  
-Response:  PlayerNotFound  - Player name doesn't exist on server 
-  
-  Effect:  Kick player <soldier name> from server  
-Comments:  Reason text is optional. Default reason is 'Kicked by administrator'.  
-"""
-    def complete_admin_kickPlayer(self, text, line, begidx, endidx):
-        reCmd = re.compile('^(admin\.kickPlayer\s*)$', re.IGNORECASE)
-        m = reCmd.search(line)
-        if m:
-            s = len(m.group(0))
-            return self._complete_player(text, line[s:], begidx - s, endidx - s)
-
-    def help_admin_killPlayer(self):
-        print """
- Request:  admin.killPlayer  <name: player name>
- 
-Response:  OK - Player did exist, and kill him 
-Response:  InvalidArguments  
-Response:  InvalidPlayerName  - Player name doesn't exist on server 
-Response:  SoldierNotAlive  
-  
-  Effect:  Kill a player without any stats effect
-"""
-    def complete_admin_killPlayer(self, text, line, begidx, endidx):
-        reCmd = re.compile('^(admin\.killPlayer\s*)$', re.IGNORECASE)
-        m = reCmd.search(line)
-        if m:
-            s = len(m.group(0))
-            return self._complete_player(text, line[s:], begidx - s, endidx - s)
-
-    def help_admin_listPlayers(self):
-        print """
- Request: admin.listPlayers <players: player subset>
- 
-Response: OK <player info> 
-Response: InvalidArguments
-
-  Effect: Return list of all players on the server
-"""
-    def complete_admin_listPlayers(self, text, line, begidx, endidx):
-        reCmd = re.compile('^(admin\.listPlayers\s+)', re.IGNORECASE)
-        m = reCmd.search(line)
-        if m:
-            s = len(m.group(0))
-            return self._complete_player_subset(text, line[s:], begidx - s, endidx - s)
-        else:
-            return []
-            
-
-    def help_admin_movePlayer(self):
-        print """
- Request:  admin.movePlayer <name: player name> <teamId: TeamID> <squadId: SquadID> <forceKill: boolean>
- 
-Response:  OK
-Response:  InvalidArguments
-Response:  InvalidTeamId
-Response:  InvalidSquadId
-Response:  InvalidPlayerName  - Player name doesn't exist on server 
-Response:  InvalidForceKill  - forceKill must be 'true' or 'false' 
-Response:  PlayerNotDead - Player is alive and forceKill is false
-Response:  SetTeamFailed
-Response:  SetSquadFailed
-  
-  Effect:  Move a player to another team and/or squad
- Comment:  Only works if player is dead. This command will kill player if forceKill is true
-"""
-    def complete_admin_movePlayer(self, text, line, begidx, endidx):
-        reCmd = re.compile('^(admin\.movePlayer\s*)$', re.IGNORECASE)
-        m = reCmd.search(line)
-        if m:
-            s = len(m.group(0))
-            return self._complete_player(text, line[s:], begidx - s, endidx - s)
-
-
-    def help_admin_shutDown(self):
-        print """
- Request:  admin.shutDown
- 
-Response:  OK
-Response:  InvalidArguments  
-  
-  Effect:  shutdown the server
-"""
-
-
-    def help_banList_load(self):
-        print """\
- Request: banList.load 
-
-Response: OK 
-Response: InvalidArguments 
-Response: InvalidIdType 
-Response: InvalidBanType 
-Response: InvalidTimeStamp - A time stamp could not be read 
-Response: IncompleteBan - Incomplete ban entry at end of file 
-Response: AccessError - Could not read from file 
-
-  Effect: Load list of banned players/IPs/GUIDs from file 
- Comment: 5 lines (Id-type, id, ban-type, time and reason) are retrieved for 
-          every ban in the list. Entries read before getting InvalidIdType, 
-          InvalidBanType, InvalidTimeStamp and IncompleteBan is still loaded.
-"""
-
-    def help_banList_save(self):
-        print """\
- Request: banList.save 
-
-Response: OK 
-Response: InvalidArguments 
-Response: AccessError - Could not save to file 
-
-  Effect: Save list of banned players/IPs/GUIDs to file 
- Comment: 5 lines (Id-type, id, ban-type, time and reason) are stored for every
-          ban in the list. Every line break has windows '\r\n' characters.
-"""
-
-    def help_banList_add(self):
-        print """\
- Request: banList.add <id-type: id-type> <id: string> <timeout: timeout> 
-                                                               <reason: string> 
-Response: OK 
-Response: InvalidArguments 
-Response: BanListFull 
-
-  Effect: Add player to ban list for a certain amount of time 
-Comments: Adding a new player/IP/GUID ban will replace any previous ban for that
-          player/IP/GUID 
-          Timeout can take three forms: 
-              perm - permanent [default] 
-              round - until end of round 
-              seconds <integer> - number of seconds until ban expires 
-          Id-type can be any of these :
-              name - A soldier name 
-              ip - An IP address 
-              guid - A player guid
-          Id could be either a soldier name, ip address or guid depending on 
-          id-type. Reason is optional and defaults to 'Banned by admin'; max 
-          length 80 chars. The ban list can contain at most 100 entries.
-"""
-
-    def help_banList_remove(self):
-        print """\
- Request: banList.remove <id-type: id-type> <id: string> 
-
-Response: OK 
-Response: InvalidArguments 
-Response: NotFound - Id not found in banlist; banlist unchanged 
-
-  Effect: Remove player/ip/guid from banlist
-"""
-    def complete_banList_remove(self, text, line, begidx, endidx):
-        reCmd = re.compile('^\s*banList\.remove\s+(?P<param>.*)$', re.IGNORECASE)
-        m = reCmd.search(line)
-        if m:
-            param = m.group('param')
-            return [a for a in self._getBans() if a.lower().startswith(param.lower())]
-
-    def help_banList_clear(self):
-        print """\
- Request: banList.clear 
-
-Response: OK 
-Response: InvalidArguments 
-
-Effect: Clears ban list
-"""
-
-    def help_banList_list(self):
-        print """\
- Request: banList.list 
- 
-Response: OK <player ban entries> 
-Response: InvalidArguments 
-
-  Effect: Return list of banned players/IPs/GUIDs. 
- Comment: The list starts with a number telling how many bans the list is 
-          holding. After that, 5 words (Id-type, id, ban-type, time and reason)
-          are received for every ban in the list.
-"""
-
-    def help_reservedSlots_configFile(self):
-        print """
- Request: reservedSlots.configFile [filename: filename] - disabled for security
-          reasons atm
-          
-Response: OK - for set option
-Response: OK <filename> - for get option
-Response: InvalidArguments
-Response: InvalidFileName - Filename does not follow filename rules
-
-  Effect: Set name of reserved slots configuration file
-"""
-
-    def help_reservedSlots_load(self):
-        print """
- Request: reservedSlots.load
- 
-Response: OK
-Response: InvalidArguments
-Response: AccessError - File not found; internal reserved slots list is now 
-          empty
-          
-  Effect: Load list of soldier names from file. This is a file with one soldier
-          name per line. If loading succeeds, the reserved slots list will get 
-          updated. If loading fails, the reserved slots list will remain 
-          unchanged.
-"""
-
-    def help_reservedSlots_save(self):
-        print """
- Request: reservedSlots.save
- 
-Response: OK
-Response: InvalidArguments
-Response: AccessError - Error while saving
-
-  Effect: Save list of reserved soldier names to file. This is a file with one 
-          soldier name per line.
-Comment: If saving fails, the output file may be unchanged or corrupt.
-"""
-
-    def help_reservedSlots_addPlayer(self):
-        print """
- Request: reservedSlots.addPlayer <soldier name: player name>
- 
-Response: OK
-Response: InvalidArguments
-Response: PlayerAlreadyInList - Player is already in the list; reserved slots 
-          list unchanged
-          
-  Effect: Add <soldier name> to list of players who can use the reserved slots.
-"""
-    def complete_reservedSlots_addPlayer(self, text, line, begidx, endidx):
-        reCmd = re.compile('^(\s*reservedSlots\.addPlayer\s*)', re.IGNORECASE)
-        m = reCmd.search(line)
-        if m:
-            s = len(m.group(0))
-            return self._complete_player(text, line[s:], begidx - s, endidx - s)
-
-    def help_reservedSlots_removePlayer(self):
-        print """
- Request: reservedSlots.removePlayer <soldier name: player name>
- 
-Response: OK
-Response: InvalidArguments
-Response: PlayerNotInList - Player does not exist in list; reserved slots list 
-          unchanged
-          
-  Effect: Remove <soldier name> from list of players who can use the reserved 
-          slots.
-"""
-    def complete_reservedSlots_removePlayer(self, text, line, begidx, endidx):
-        reCmd = re.compile('^\s*reservedSlots\.removePlayer\s+(?P<player>.*)$', re.IGNORECASE)
-        m = reCmd.search(line)
-        if m:
-            name = m.group('player')
-            return [a for a in self._getReservedSlots() if a.lower().startswith(name.lower())]
-
-    def help_reservedSlots_clear(self):
-        print """
- Request: reservedSlots.clear
- 
-Response: OK
-Response: InvalidArguments
-
-  Effect: Clear reserved slots list
-"""
-
-    def help_reservedSlots_list(self):
-        print """
- Request: reservedSlots.list
- 
-Response: OK <soldier names>
-Response: InvalidArguments
-
-  Effect: Retrieve list of players who can utilize the reserved slots
-"""
-
-    def help_mapList_configFile(self):
-        print """
- Request: mapList.configFile [filename: filename] - disabled for security 
-          reasons atm
-          
-Response: OK - for set option
-Response: OK <filename> - for get option
-Response: InvalidArguments
-Response: InvalidFileName - Filename does not follow filename rules
-
-  Effect: Set name of maplist configuration file
-"""
-
-    def help_mapList_load(self):
-        print """
- Request: mapList.load
- 
-Response: OK - Maplist loaded
-Response: InvalidArguments
-Response: AccessError - File not found, internal maplist is now empty
-Response: InvalidPlaylist - Play list doesn't exist. Should be RUSH, CONQUEST, 
-          SQDM or SQRUSH.
-Response: InvalidMapName <name> - Map with name <name> doesn't exist in 
-          playlist/gamemode
-
-  Effect: Load list of map names from file. This is a file with one map name 
-          per line.
-Comments: If loading succeeds, the maplist will get updated. 
-          If loading fails, the maplist will remain unchanged.
-"""
-
-    def help_mapList_save(self):
-        print """
- Request: mapList.save
- 
-Response: OK - Maplist saved
-Response: InvalidArguments
-Response: AccessError - Error while saving, on-disk maplist file possibly 
-          corrupted now
-          
-  Effect: Save maplist to file. This is a file with one map name per line.
-Comments: If saving fails, the output file may be unchanged or corrupt.
-          Every line break has windows '\r\n' characters.
-"""
-
-    def help_mapList_list(self):
-        print """
- Request: mapList.list
- 
-Response: OK <map names>
-Response: InvalidArguments
-
-  Effect: Retrieve current maplist
-"""
-
-    def help_mapList_clear(self):
-        print """
- Request: mapList.clear
- 
-Response: OK
-Response: InvalidArguments
-
-  Effect: Clears maplist
-Comments: If server attempts to switch level while maplist is cleared, nasty 
-          things will happen
-"""
-
-    def help_mapList_remove(self):
-        print """
- Request: mapList.remove <index: integer> 
- 
-Response: OK - Map removed from list 
-Response: InvalidArguments 
-Response: InvalidIndex - Index doesn't exist in server map list 
-
-  Effect: Remove map from list.
-"""
-
-    def help_mapList_append(self):
-        print """
- Request: mapList.append <name: string> 
-
-Response: OK - Map appended to list 
-Response: InvalidArguments 
-Response: InvalidMapName - Map doesn't exist on server 
-
-  Effect: Add map with name <name> to end of maplist 
- Comment: Remember to specify playlist before adding maps
-"""
-
-    def help_mapList_insert(self):
-        print """\
- Request: mapList.insert <index: integer, name: string> 
-
-Response: OK - Map inserted to list 
-Response: InvalidArguments 
-Response: InvalidMapName - Map doesn't exist on server or negative index 
-
-  Effect: Add map with name at the specified index to the maplist
-"""
-        
-    def help_vars_adminPassword(self):
-        print """
- Request: vars.adminPassword [password: password]
- 
-Response: OK - for set operation
-Response: OK <password> - for get operation
-Response: InvalidArguments
-Response: InvalidPassword - password does not conform to password format rules
-
-  Effect: Set the admin password for the server, use it with an empty string("") to reset
-"""
-
-    def help_vars_gamePassword(self):
-        print """
- Request: vars.gamePassword [password: password]
- 
-Response: OK - for set operation
-Response: OK <password> - for get operation
-Response: InvalidArguments
-Response: InvalidPassword - password does not conform to password format rules
-Response: InvalidConfig - password can't be set if ranked is enabled
-
-  Effect: Set the game password for the server, use it with an empty string("")
-          to reset
-"""
-
-    def help_vars_punkBuster(self):
-        print """
- Request: vars.punkBuster [enabled: boolean]
- 
-Response: OK - for set operation
-Response: OK <enabled: boolean> - for get operation
-Response: InvalidArguments
-Response: InvalidConfig - punkbuster can't be disabled if ranked is enabled 
-Response: StartupOnlyCallNotAllowed - this command can only be executed from 
-          startup.txt
-
-  Effect: Set if the server will use PunkBuster or not
-"""
-    complete_vars_punkBuster = _complete_boolean
-    
-    def help_vars_hardCore(self):
-        print """
- Request: vars.hardCore [enabled: boolean]
- 
-Response: OK - for set operation
-Response: OK <enabled: boolean> - for get operation
-Response: InvalidArguments
-
-  Effect: Set hardcore mode 
-   Delay: Works after map change
-"""
-    complete_vars_hardCore = _complete_boolean
-
-    def help_vars_ranked(self):
-        print """
- Request: vars.ranked [enabled: boolean]
- 
-Response: OK - for set operation
-Response: OK <enabled: boolean> - for get operation 
-Response: InvalidArguments
-Response: StartupOnlyCallNotAllowed - this command can only be executed from 
-          startup.txt 
-
-  Effect: Set ranked or not. If enabled: game password will be removed and 
-          punkbuster enabled
-"""
-    complete_vars_ranked = _complete_boolean
-
-    def help_vars_rankLimit(self):
-        print """
- Request: vars.rankLimit <rank: integer> ##QA: Says 'OK' but still allow higher
-          ranked players to join
-          
-Response: OK - for set operation
-Response: OK <rank: integer> - for get operation
-Response: InvalidArguments
-
-  Effect: Set the highest rank allowed on to the server (integer value).
- Comment: To disable rank limit use -1 as value
-"""
-
-    def help_vars_teamBalance(self):
-        print """
- Request: vars.teamBalance [enabled: boolean]
- 
-Response: OK - for set operation
-Response: OK <enabled: boolean> - for get operation
-Response: InvalidArguments
-
-  Effect: Set if the server should autobalance
-"""
-    complete_vars_teamBalance = _complete_boolean
-
-    def help_vars_friendlyFire(self):
-        print """
- Request: vars.friendlyFire [enabled: boolean]
- 
-Response: OK - for set operation
-Response: OK <enabled: boolean> - for get operation
-Response: InvalidArguments
-Response: LevelNotLoaded  - for set operation
-
-  Effect: Set if the server should allow team damage 
-   Delay: Works after round restart 
- Comment: Not available during level load.
-"""
-
-    def help_vars_currentPlayerLimit(self):
-        print """
- Request: vars.currentPlayerLimit
- 
-Response: OK <nr of players: integer> - for get operation
-Response: ReadOnly - if you try to send any arguments
-Response: InvalidArguments
-
-  Effect: Retrieve the current maximum number of players
- Comment: This value is computed from all the different player limits in effect 
-         at any given moment
-"""
-
-    def help_vars_maxPlayerLimit(self):
-        print """
- Request: vars.maxPlayerLimit
- 
-Response: OK <nr of players: integer> - for get operation
-Response: ReadOnly - if you try to send any arguments
-Response: InvalidArguments
-
-  Effect: Retrieve the server-enforced maximum number of players
- Comment: Setting the user-defined maximum number of players higher than this 
-          has no effect
-"""
-
-    def help_vars_playerLimit(self):
-        print """
- Request: vars.playerLimit [nr of players: integer]
- 
-Response: OK - for set operation
-Response: OK <nr of players: integer> - for get operation
-Response: InvalidArguments
-Response: InvalidNrOfPlayers - Player limit must be in the range 8..32
-
-  Effect: Set desired maximum number of players
- Comment: The effective maximum number of players is also effected by the server
-          provider, and the game engine
-"""
 
-    def help_vars_bannerUrl(self):
-        print """
- Request: vars.bannerUrl [url: string]
- 
-Response: OK - for set operation
-Response: OK <url: string> - for get operation
-Response: InvalidArguments
-Response: TooLongUrl - for set operation
-
-  Effect: Set banner url
- Comment: The banner url needs to be less than 64 characters long The banner 
-          needs to be a 512x64 picture smaller than 127kb 
- Example: admin.setBannerUrl http://www.example.com/banner.jpg
-"""
 
-    def help_vars_serverDescription(self):
-        print """
- Request: vars.serverDescription <description: string>
- 
-Response: OK - for set operation
-Response: OK <description: string> - for get operation
-Response: InvalidArguments
-Response: TooLongDescription - for set operation
-
-  Effect: Set server description
- Comment: The description needs to be less than 400 characters long
-"""
-
-    def help_vars_killCam(self):
-        print """
- Request: vars.killCam [enabled: boolean]
- 
-Response: OK - for set operation
-Response: OK <enabled: boolean> - for get operation
-Response: InvalidArguments
-
-  Effect: Set if killcam is enabled 
-   Delay: Works after map switch
-"""
-    complete_vars_killCam = _complete_boolean
-
-    def help_vars_miniMap(self):
-        print """
- Request: vars.miniMap [enabled: boolean]
- 
-Response: OK - for set operation
-Response: OK <enabled: boolean> - for get operation
-Response: InvalidArguments
-
-  Effect: Set if minimap is enabled 
-   Delay: Works after map switch
-"""
-    complete_vars_miniMap = _complete_boolean
-
-    def help_vars_crossHair(self):
-        print """
- Request: vars.crossHair [enabled: boolean]
- 
-Response: OK - for set operation
-Response: OK <enabled: boolean> - for get operation
-Response: InvalidArguments
-
-  Effect: Set if crosshair for all weapons is enabled 
-   Delay: Works after map 
-          switch
-"""
-    complete_vars_crossHair = _complete_boolean
-
-    def help_vars_3dSpotting(self):
-        print """
- Request: vars.3dSpotting [enabled: boolean]
- 
-Response: OK - for set operation
-Response: OK <enabled: boolean> - for get operation
-Response: InvalidArguments
-
-  Effect: Set if spotted targets are visible in the 3d-world 
-   Delay: Works after
-          map switch
-"""
-    complete_vars_3dSpotting = _complete_boolean
-
-    def help_vars_miniMapSpotting(self):
-        print """
- Request: vars.miniMapSpotting [enabled: boolean]
- 
-Response: OK - for set operation
-Response: OK <enabled: boolean> - for get operation
-Response: InvalidArguments
-
-  Effect: Set if spotted targets are visible on the minimap 
-   Delay: Works after 
-          map switch
-"""
-    complete_vars_miniMapSpotting = _complete_boolean
-
-    def help_vars_thirdPersonVehicleCameras(self):
-        print """
- Request: vars.thirdPersonVehicleCameras [enabled: boolean]
- 
-Response: OK - for set operation
-Response: OK <enabled: boolean> - for get operation
-Response: InvalidArguments
+class Bfbc2Commander_R9(FrostbiteCommander):
+    """console for BFBC2 and MOH game servers"""
 
-  Effect: <todo> 
-   Delay: Works after map switch
-##QA: Works but is bugged. If you change the setting and someone is in a vehicle in 3rd person view when at end of round, that player will be stuck in 3rd person view even though the setting should only allow 1st person view.
-"""
-    complete_vars_thirdPersonVehicleCameras = _complete_boolean
 
 
-    
 class BF3Commander_Rx(FrostbiteCommander):
-    _frostbiteUnprivilegedCmdList = ['login.hashed', 'login.plainText', 'logout', 'quit', 'serverInfo', 'listPlayers', 'version']
-    
-    def _initAvailableCmds(self):
-        """depending on the login status, build up the list of available commands"""
-        try:
-            self._frosbitecmdList = self._frostbiteServer.command('admin.help')
-            self._frosbitecmdList.sort()
-        except CommandFailedError, err:
-            print err.message
-            self._frosbitecmdList = self._frostbiteUnprivilegedCmdList
-            
+    """console for BF3 game servers"""
+    _helpCommand = 'admin.help'
 
-    def _complete_boolean(self, text, line, begidx, endidx):
-        #print "\n>%s\t%s[%s:%s] = %s" % (text, line, begidx, endidx, line[begidx:endidx])
-        completions = ['true', 'false']
-        return [a for a in completions if a.startswith(text.lower())]
-    
-    def _complete_player_subset(self, text, line, begidx, endidx):
-        args = re.split('\s+', line[:begidx].rstrip())
-        #print "text: '%s'; args: %s" % (text, args)
-        if len(args) == 1 and args[0] == '':
-            completions = ['all', 'team ', 'squad ', 'player ']
-        elif len(args) == 1 and args[0] == 'player':
-            completions = self._getConnectedPlayers()
-        else:
-            completions = []
-        return [a for a in completions if a.lower().startswith(text.lower())] 
 
-    def _complete_player(self, text, line, begidx, endidx):
-        args = re.split('\s+', line[:begidx].rstrip())
-        if len(args) == 1 and args[0] == '':
-            return [a for a in self._getConnectedPlayers() if a.lower().startswith(text.lower())]
-        else:
-            return []
+# game name reported by the version command -> (console class, PlayerInfoBlock class)
+GAME_CONSOLES = {
+    'BFBC2': (Bfbc2Commander_R9, PlayerInfoBlock1),
+    'MOH': (Bfbc2Commander_R9, PlayerInfoBlock1),
+    'BF3': (BF3Commander_Rx, PlayerInfoBlock2),
+}
 
-    def _complete_timeout(self, text, line, begidx, endidx):
-        args = re.split('\s+', line[:begidx].rstrip())
-        if len(args) == 1 and args[0] == '':
-            return [a for a in ['perm', 'round', 'seconds '] if a.lower().startswith(text.lower())]
-        else:
-            return []
+BANNER = """\
+   __               _   _     _ _        
+  / _|             | | | |   (_) |       
+ | |_ _ __ ___  ___| |_| |__  _| |_  ___ 
+ |  _| '__/ _ \\/ __| __| '_ \\| | __|/ _ \\
+ | | | | | (_) \\__ \ |_| |_) | | |_|  __/
+ |_| |_|  \___/|___/\\__|_.__/|_|\\__|\\___|  v%s
+  ____                                                _             
+ / ___| ___   _ __ ___   _ __ ___    __ _  _ __    __| |  ___  _ __ 
+| |    / _ \ | '_ ` _ \ | '_ ` _ \  / _` || '_ \  / _` | / _ \| '__|
+| |___| (_) || | | | | || | | | | || (_| || | | || (_| ||  __/| |   
+ \____|\___/ |_| |_| |_||_| |_| |_| \__,_||_| |_| \__,_| \___||_|  
+ 
+ Type 'help' to get the list of available commands
+ Type 'help <cmd>' to get help on a given command
+ Use the [TAB] key for command completion
+            """
 
-    def _complete_playlist(self, text, line, begidx, endidx):
-        return [a for a in self._getPlaylists() if a.lower().startswith(text.lower())]
 
-    def complete_admin_listPlayers(self, text, line, begidx, endidx):
-        reCmd = re.compile('^(admin\.listPlayers\s+)', re.IGNORECASE)
-        m = reCmd.search(line)
-        if m:
-            s = len(m.group(0))
-            return self._complete_player_subset(text, line[s:], begidx - s, endidx - s)
-        else:
-            return []
-    
-    complete_listPlayers = complete_admin_listPlayers
+def openConsole(frostbite_server, banner=True, cache=None):
+    """identify the game server and return the console suiting it.
+    version and the help commands are all sent at once and the banner is
+    printed while waiting for the replies, so this costs a single round trip.
+    If the capability cache knows the server, the console uses the cached
+    capabilities right away and they are revalidated in the background"""
+    global PlayerInfoBlock
 
-    def help_vars_killCam(self):
-        print """
- Request: vars.killCam [enabled: boolean]
- 
-Response: OK - for set operation
-Response: OK <enabled: boolean> - for get operation
-Response: InvalidArguments
+    entry = None
+    if cache is not None:
+        entry = cache.lookup(frostbite_server.host, frostbite_server.port)
+    if entry is not None and entry.get('commands') and frostbite_server.password:
+        if banner:
+            print BANNER % __version__
+            print "connected to %s game server. (version %s)" % (entry['game'], entry['version'])
+        consoleClass, PlayerInfoBlock = GAME_CONSOLES.get(entry['game'], (FrostbiteCommander, PlayerInfoBlock1))
+        console = consoleClass(frostbite_server, entry['game'], entry['version'], commandList=entry['commands'])
+        console._playlistsCache = entry.get('playlists')
+        console._supportedMapsCache = entry.get('maps')
+        console.refreshCapabilities(cache)
+        return console
+
+    pendingVersion = frostbite_server.command_async('version')
+    helpCommands = set([FrostbiteCommander._helpCommand])
+    for consoleClass, playerInfoBlockClass in GAME_CONSOLES.values():
+        helpCommands.add(consoleClass._helpCommand)
+    pendingHelps = dict([(c, frostbite_server.command_async(c)) for c in helpCommands])
+    if banner:
+        print BANNER % __version__
+
+    (game, version) = frostbite_server.get_response(pendingVersion)[:2]
+    if banner:
+        print "connected to %s game server. (version %s)" % (game, version)
+    consoleClass, PlayerInfoBlock = GAME_CONSOLES.get(game, (FrostbiteCommander, PlayerInfoBlock1))
+    console = consoleClass(frostbite_server, game, version, pendingHelps[consoleClass._helpCommand])
+    if cache is not None:
+        console.refreshCapabilities(cache)
+    return console
 
-  Effect: Set if killcam is enabled 
-   Delay: Works after map switch
-"""
-    complete_vars_killCam = _complete_boolean
-    complete_vars_friendlyFire = _complete_boolean
-    complete_vars_regenerateHealth = _complete_boolean
 
 
 def main_is_frozen():
@@ -1485,22 +912,20 @@ def main_is_frozen():
         imp.is_frozen("__main__")) # tools/freeze
 
 
-def print_event(event):
-    print ".:: Event received : %r" % event
-
 def main():
+    """usage : frostbiteCommander.py [-h <host>] [-p <port>] [-a <password>]
+                                     [-f json|csv|table] [<command> [<arguments>]]
+    Given a command, run it, print its result and return the exit status"""
     from getopt import getopt
-    
-    global PlayerInfoBlock
 
-    print "Frostbite Commander"
     frostbite_server = None
 
     host = None
     port = None
     pw = None
+    outputFormat = None
 
-    opts, args = getopt(sys.argv[1:], 'h:p:a:')
+    opts, args = getopt(sys.argv[1:], 'h:p:a:f:')
     for k, v in opts:
         if k == '-h':
             host = v
@@ -1508,64 +933,57 @@ def main():
             port = int(v)
         elif k == '-a':
             pw = v
+        elif k == '-f':
+            if v not in recordoutput.FORMATS:
+                print >> sys.stderr, "output format must be one of : %s" % ', '.join(recordoutput.FORMATS)
+                return 1
+            outputFormat = v
+
+    # keep the standard output for the result when running a single command
+    info = sys.stderr if args else sys.stdout
+    print >> info, "Frostbite Commander"
 
     if host is None:
         host = raw_input('Enter game server host IP/name: ')
     if port is None:
         port = int(raw_input('Enter host port: '))
     if pw is None:
-        print "Enter the password if you want to run privileged commands"
-        print "or just hit the Enter key"
+        print >> info, "Enter the password if you want to run privileged commands"
+        print >> info, "or just hit the Enter key"
         pw = getpass.getpass()
 
     try:
         try:
-            print 'Connecting to : %s:%d...' % ( host, port )
+            print >> info, 'Connecting to : %s:%d...' % ( host, port )
             frostbite_server = FrostbiteServer(host, port, pw)
-            time.sleep(.5)
             
-            frostbite_server.subscribe(print_event)
+            eventDisplay = EventDisplay()
+            if not args:
+                frostbite_server.subscribe(eventDisplay.post)
+            playerIndex = PlayerIndex()
+            frostbite_server.subscribe(playerIndex.observer("%s:%s" % (host, port)), events=PlayerIndex.EVENTS)
             
             if pw:
                 frostbite_server.auth()
 
-            print """\
-   __               _   _     _ _        
-  / _|             | | | |   (_) |       
- | |_ _ __ ___  ___| |_| |__  _| |_  ___ 
- |  _| '__/ _ \\/ __| __| '_ \\| | __|/ _ \\
- | | | | | (_) \\__ \ |_| |_) | | |_|  __/
- |_| |_|  \___/|___/\\__|_.__/|_|\\__|\\___|  v%s
-  ____                                                _             
- / ___| ___   _ __ ___   _ __ ___    __ _  _ __    __| |  ___  _ __ 
-| |    / _ \ | '_ ` _ \ | '_ ` _ \  / _` || '_ \  / _` | / _ \| '__|
-| |___| (_) || | | | | || | | | | || (_| || | | || (_| ||  __/| |   
- \____|\___/ |_| |_| |_||_| |_| |_| \__,_||_| |_| \__,_| \___||_|  
- 
- Type 'help' to get the list of available commands
- Type 'help <cmd>' to get help on a given command
- Use the [TAB] key for command completion
-            """ % __version__
-            
-            (game, version) = frostbite_server.command('version')
-            print "connected to %s game server. (version %s)" % (game, version)
-            
-            PlayerInfoBlock = PlayerInfoBlock1
-            if game == "BFBC2":
-                c = Bfbc2Commander_R9(frostbite_server)
-            elif game == "MOH":
-                c = Bfbc2Commander_R9(frostbite_server)
-            elif game == "BF3":
-                PlayerInfoBlock = PlayerInfoBlock2
-                c = BF3Commander_Rx(frostbite_server)
-            else:
-                c = FrostbiteCommander(frostbite_server)
-
+            c = openConsole(frostbite_server, banner=not args, cache=CapabilityCache())
+            c.outputFormat = outputFormat
+            c.playerIndex = playerIndex
+            if args:
+                words = c.onecmd(' '.join([pipes.quote(a) for a in args]))
+                if not words or words[0] != 'OK':
+                    return 1
+                return 0
+            if sys.stdout.isatty():
+                c.pageSize = 20
+            c.eventDisplay = eventDisplay
+            eventDisplay.start()
             c.cmdloop()
 
 
         except FrostbiteError, detail:
             print 'error: %r' % detail
+            return 1
 
         except (EOFError, KeyboardInterrupt):
             pass
@@ -1576,8 +994,8 @@ def main():
     finally:
         try:
             if frostbite_server is not None:
-                frostbite_server.close()
-            print "Bye"
+                frostbite_server.stop()
+            print >> info, "Bye"
         except:
             raise
 
@@ -1586,8 +1004,9 @@ if __name__ == '__main__':
 #    import logging
 #    logging.basicConfig(level=logging.NOTSET, format="%(levelname)-8s %(message)s")
     import traceback
+    status = 0
     try:
-        main()
+        status = main()
     except SystemExit:
         pass
     except KeyboardInterrupt:
@@ -1597,4 +1016,4 @@ if __name__ == '__main__':
         if main_is_frozen():
             raw_input('press the [Enter] key to exit')
         
-    sys.exit( 0 )
+    sys.exit( status or 0 )
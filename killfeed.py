@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Kill feed analytics : per player sliding window statistics of kills, with
+# threshold rules raising alerts
+#
+# usage :
+#     feed = KillFeed('eu1')
+#     feed.subscribe(on_alert)     # on_alert(server_name, player, rule, value)
+#     frostbiteServer.subscribe(feed.on_event, events=KillFeed.EVENTS)
+#     print feed.stats('Courgette')
+#
+# player.onKill events are <killer> <victim> [<weapon> <headshot> [<distance>]],
+# the weapon and the headshot flag being only sent by the games which have
+# them. The kills of each player within the last window seconds are kept in
+# ring buffers made of arrays, together with running totals, so that each
+# event updates and evaluates the statistics of its killer in constant time
+# instead of going over the window :
+#     kills_per_minute : kills in the window, per minute
+#     headshot_ratio   : share of the kills in the window that are headshots
+#     weapon_share     : share of the kills in the window made with the weapon
+#                        of the last kill
+#     mean_distance    : mean distance of the kills in the window which have one
+# A rule raises an alert when a statistic of the killer reaches its threshold
+# with at least min_kills kills in the window, then stays quiet for that
+# player for cooldown seconds.
+#
+# A feed tracks a single server ; use one feed per server.
+#
+from protocol import _monotonic
+from array import array
+import logging
+import threading
+
+STATISTICS = ('kills_per_minute', 'headshot_ratio', 'weapon_share', 'mean_distance')
+
+
+class Rule(object):
+    """alert when statistic reaches threshold for a player having at least
+    min_kills kills in the window"""
+
+    def __init__(self, name, statistic, threshold, min_kills=5, cooldown=60):
+        if statistic not in STATISTICS:
+            raise ValueError("unknown statistic %r" % statistic)
+        self.name = name
+        self.statistic = statistic
+        self.threshold = threshold
+        self.min_kills = min_kills
+        self.cooldown = cooldown
+
+    def __repr__(self):
+        return "Rule(%r, %r, %r)" % (self.name, self.statistic, self.threshold)
+
+
+DEFAULT_RULES = (
+    Rule('kill rate', 'kills_per_minute', 20),
+    Rule('headshots', 'headshot_ratio', 0.8, min_kills=10),
+    Rule('long range', 'mean_distance', 300, min_kills=5),
+)
+
+
+class KillWindow(object):
+    """the kills of one player within the last window seconds. Kills are kept
+    in fixed size ring buffers, oldest first from index start ; the totals
+    are updated as kills enter and leave the window"""
+    __slots__ = ('times', 'headshots', 'weapons', 'distances', 'start', 'count',
+                 'headshot_count', 'distance_sum', 'distance_count', 'weapon_counts',
+                 'last_alerts')
+
+    def __init__(self, capacity):
+        self.times = array('d', [0.0]) * capacity
+        self.headshots = array('B', [0]) * capacity
+        self.weapons = array('H', [0]) * capacity
+        # negative when the event has no distance
+        self.distances = array('f', [0.0]) * capacity
+        self.start = 0
+        self.count = 0
+        self.headshot_count = 0
+        self.distance_sum = 0.0
+        self.distance_count = 0
+        # weapon id -> kills in the window
+        self.weapon_counts = {}
+        # rule name -> time of the last alert
+        self.last_alerts = {}
+
+    def add(self, now, headshot, weapon, distance):
+        capacity = len(self.times)
+        if self.count == capacity:
+            # more kills than the buffers hold : forget the oldest one early
+            self._pop()
+        i = (self.start + self.count) % capacity
+        self.times[i] = now
+        self.headshots[i] = headshot
+        self.weapons[i] = weapon
+        self.distances[i] = distance
+        self.count += 1
+        self.headshot_count += headshot
+        self.weapon_counts[weapon] = self.weapon_counts.get(weapon, 0) + 1
+        if distance >= 0:
+            self.distance_sum += distance
+            self.distance_count += 1
+
+    def expire(self, oldest):
+        """forget the kills older than oldest. Each kill is forgotten once,
+        which keeps the cost per event constant on average"""
+        times = self.times
+        while self.count and times[self.start] < oldest:
+            self._pop()
+
+    def _pop(self):
+        i = self.start
+        self.start = (i + 1) % len(self.times)
+        self.count -= 1
+        self.headshot_count -= self.headshots[i]
+        weapon = self.weapons[i]
+        left = self.weapon_counts[weapon] - 1
+        if left:
+            self.weapon_counts[weapon] = left
+        else:
+            del self.weapon_counts[weapon]
+        distance = self.distances[i]
+        if distance >= 0:
+            self.distance_sum -= distance
+            self.distance_count -= 1
+
+    def statistic(self, name, window, weapon):
+        """value of a statistic, None if unknown. window is the length of
+        the window in seconds, weapon the weapon id of the last kill"""
+        if not self.count:
+            return None
+        if name == 'kills_per_minute':
+            return self.count * 60.0 / window
+        elif name == 'headshot_ratio':
+            return float(self.headshot_count) / self.count
+        elif name == 'weapon_share':
+            return float(self.weapon_counts.get(weapon, 0)) / self.count
+        elif name == 'mean_distance':
+            if not self.distance_count:
+                return None
+            return self.distance_sum / self.distance_count
+
+
+class KillFeed(object):
+    """sliding window kill statistics of the players of a server"""
+
+    EVENTS = ('player.onKill', 'player.onLeave')
+
+    def __init__(self, server_name=None, rules=DEFAULT_RULES, window=60, capacity=256):
+        self.server_name = server_name
+        self.rules = list(rules)
+        self.window = window
+        self.capacity = capacity
+        self.kills = 0
+        self.alerts = 0
+        self.observers = set()
+        # player name -> KillWindow
+        self._windows = {}
+        # weapon name -> id stored in the ring buffers, and back
+        self._weapon_ids = {'': 0}
+        self._weapon_names = ['']
+        self._lock = threading.Lock()
+
+    #===============================================================================
+    #
+    #    Public API
+    #
+    #===============================================================================
+
+    def subscribe(self, func):
+        """call func(server_name, player, rule, value) on each alert"""
+        self.observers = self.observers | set([func])
+
+    def unsubscribe(self, func):
+        self.observers = self.observers - set([func])
+
+    def on_event(self, words):
+        """event observer, to subscribe to the EVENTS of a server"""
+        if words[0] == 'player.onKill':
+            self.on_kill(words)
+        elif words[0] == 'player.onLeave' and len(words) > 1:
+            self._lock.acquire()
+            try:
+                self._windows.pop(words[1], None)
+            finally:
+                self._lock.release()
+
+    def on_kill(self, words, now=None):
+        """account for a player.onKill event and raise the alerts it triggers"""
+        if len(words) < 3 or not words[1] or words[1] == words[2]:
+            # suicide or death without a killer
+            return
+        if now is None:
+            now = _monotonic()
+        killer = words[1]
+        weapon = self._weapon_id(words[3] if len(words) > 3 else '')
+        headshot = 1 if len(words) > 4 and words[4] == 'true' else 0
+        distance = -1.0
+        if len(words) > 5:
+            try:
+                distance = float(words[5])
+            except ValueError:
+                pass
+        alerts = []
+        self._lock.acquire()
+        try:
+            self.kills += 1
+            kill_window = self._windows.get(killer)
+            if kill_window is None:
+                kill_window = self._windows[killer] = KillWindow(self.capacity)
+            kill_window.expire(now - self.window)
+            kill_window.add(now, headshot, weapon, distance)
+            for rule in self.rules:
+                if kill_window.count < rule.min_kills:
+                    continue
+                value = kill_window.statistic(rule.statistic, self.window, weapon)
+                if value is None or value < rule.threshold:
+                    continue
+                last_alert = kill_window.last_alerts.get(rule.name)
+                if last_alert is not None and now - last_alert < rule.cooldown:
+                    continue
+                kill_window.last_alerts[rule.name] = now
+                alerts.append((rule, value))
+            self.alerts += len(alerts)
+        finally:
+            self._lock.release()
+        for rule, value in alerts:
+            self.getLogger().info("%s : %s %s = %.2f" % (killer, rule.name, rule.statistic, value))
+            for func in self.observers:
+                func(self.server_name, killer, rule, value)
+
+    def stats(self, player, now=None):
+        """return the statistics of a player as a dict, None if the player
+        has no kill in the window"""
+        if now is None:
+            now = _monotonic()
+        self._lock.acquire()
+        try:
+            kill_window = self._windows.get(player)
+            if kill_window is None:
+                return None
+            kill_window.expire(now - self.window)
+            if not kill_window.count:
+                return None
+            stats = {'kills': kill_window.count}
+            for name in STATISTICS:
+                if name != 'weapon_share':
+                    stats[name] = kill_window.statistic(name, self.window, None)
+            stats['weapons'] = dict([(self._weapon_names[w], n) for w, n in kill_window.weapon_counts.iteritems()])
+            return stats
+        finally:
+            self._lock.release()
+
+    def players(self):
+        return self._windows.keys()
+
+    #===============================================================================
+    #
+    # Other methods
+    #
+    #===============================================================================
+
+    def getLogger(self):
+        return logging.getLogger("KillFeed")
+
+    def _weapon_id(self, weapon):
+        weapon_id = self._weapon_ids.get(weapon)
+        if weapon_id is None:
+            self._lock.acquire()
+            try:
+                weapon_id = self._weapon_ids.get(weapon)
+                if weapon_id is None:
+                    weapon_id = self._weapon_ids[weapon] = len(self._weapon_names)
+                    self._weapon_names.append(weapon)
+            finally:
+                self._lock.release()
+        return weapon_id
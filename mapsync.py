@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Minimal-edit mapList synchronization
+#
+# usage : python mapsync.py [-s] <server list file> <map rotation file>
+#     -s : save the maplist on each server once synchronized
+#
+# The map rotation file has one map name per line. For each server, the
+# current mapList.list is compared to the target rotation and only the
+# mapList.remove / mapList.insert / mapList.append commands needed to turn
+# one into the other are sent, all pipelined. The rotation is never cleared.
+#
+from protocol import FrostbiteError
+from fleet import read_server_list, pipeline, run_on_fleet, connect_fleet, close_fleet
+import sys
+
+
+def mapListEdits(current, target):
+    """return the shortest list of mapList commands turning the current map
+    list into the target one, keeping the longest common subsequence of maps
+    in place"""
+    n, m = len(current), len(target)
+    # lcs[i][j] = length of the longest common subsequence of current[i:] and target[j:]
+    lcs = [[0] * (m + 1) for i in range(n + 1)]
+    for i in range(n - 1, -1, -1):
+        for j in range(m - 1, -1, -1):
+            if current[i] == target[j]:
+                lcs[i][j] = lcs[i + 1][j + 1] + 1
+            else:
+                lcs[i][j] = max(lcs[i + 1][j], lcs[i][j + 1])
+    kept_current = set()
+    kept_target = set()
+    i = j = 0
+    while i < n and j < m:
+        if current[i] == target[j]:
+            kept_current.add(i)
+            kept_target.add(j)
+            i += 1
+            j += 1
+        elif lcs[i + 1][j] >= lcs[i][j + 1]:
+            i += 1
+        else:
+            j += 1
+
+    commands = []
+    # remove from the end so the remaining indexes stay valid
+    for i in range(n - 1, -1, -1):
+        if i not in kept_current:
+            commands.append(('mapList.remove', str(i)))
+    # the kept maps are now in target order ; insert the others at their place
+    size = len(kept_current)
+    for j in range(m):
+        if j not in kept_target:
+            if j == size:
+                commands.append(('mapList.append', target[j]))
+            else:
+                commands.append(('mapList.insert', str(j), target[j]))
+            size += 1
+    return commands
+
+
+def syncMapList(server, target, save=False):
+    """synchronize the map list of a FrostbiteServer with target. Cost two
+    round trips : one to read the current list, one for all the edits, the
+    optional save and a final read to check the result.
+    Return the list of commands sent"""
+    target = list(target)
+    current = server.command('mapList.list')
+    commands = mapListEdits(current, target)
+    if not commands and not save:
+        return commands
+    batch = list(commands)
+    if save:
+        batch.append(('mapList.save',))
+    batch.append(('mapList.list',))
+    results = pipeline(server, batch)
+    for command, result in zip(batch, results):
+        if isinstance(result, Exception):
+            raise FrostbiteError("%r failed : %r" % (command, result))
+    if list(results[-1]) != target:
+        raise FrostbiteError("maplist differs from target after sync : %r" % (results[-1],))
+    return commands
+
+
+def main():
+    from getopt import getopt
+
+    save = False
+    opts, args = getopt(sys.argv[1:], 's')
+    for k, v in opts:
+        if k == '-s':
+            save = True
+    if len(args) != 2:
+        print "usage : python mapsync.py [-s] <server list file> <map rotation file>"
+        sys.exit(1)
+
+    f = open(args[1])
+    try:
+        target = [line.strip() for line in f if line.strip()]
+    finally:
+        f.close()
+
+    connections, errors = connect_fleet(read_server_list(args[0]))
+    try:
+        results = run_on_fleet(sorted(connections.keys()),
+            lambda name: syncMapList(connections[name], target, save))
+        for name in sorted(errors.keys()):
+            print "%-24s connection failed : %s" % (name, errors[name])
+        for name in sorted(results.keys()):
+            result, elapsed = results[name]
+            if isinstance(result, Exception):
+                print "%-24s %6.3fs  failed : %s" % (name, elapsed, result)
+            else:
+                print "%-24s %6.3fs  %s edits" % (name, elapsed, len(result))
+    finally:
+        close_fleet(connections)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Synthesize player change events from successive admin.listPlayers replies
+#
+# usage :
+#     diff = PlayerListDiff(ping_threshold=50)
+#     for change in diff.update(frostbiteServer.command('admin.listPlayers', 'all')):
+#         print change.change, change.name, change.old, change.new
+#
+# or, with a polling engine :
+#     tracker = PlayerListTracker(polling_engine, on_changes)  # on_changes(server_name, changes)
+#
+from playerindex import iter_player_info
+from collections import namedtuple
+
+# change is one of 'joined', 'left' or the name of the field that changed
+# ('teamId', 'squadId', 'kills', 'deaths', 'score', 'ping'). For 'joined' and
+# 'left', new/old is a dict of all the player fields. For kills, deaths and
+# score, delta is new - old
+PlayerChange = namedtuple('PlayerChange', 'change name guid old new delta')
+
+TRACKED_FIELDS = ('teamId', 'squadId', 'kills', 'deaths', 'score', 'ping')
+COUNTER_FIELDS = ('kills', 'deaths', 'score')
+
+
+class PlayerListDiff(object):
+    """keep the previous player list as player key -> tuple of field values
+    and return the minimal list of changes for each new player list.
+    Players are identified by guid or, while their guid is unknown, by name
+    and rank among the players of that name without a guid."""
+
+    def __init__(self, fields=TRACKED_FIELDS, ping_threshold=50):
+        self.fields = tuple(fields)
+        self.ping_threshold = ping_threshold
+        # player key -> (name, guid, tuple of values of self.fields)
+        self._players = {}
+
+    def __len__(self):
+        return len(self._players)
+
+    def update(self, words):
+        """compare a Player Info Block (the words of an admin.listPlayers reply
+        following 'OK') to the previous one and return a list of PlayerChange"""
+        fields = self.fields
+        previous = self._players
+        playerList = list(iter_player_info(words))
+        # name -> keys of the previous players of that name without a guid, in order
+        unknown = {}
+        for key in sorted([k for k in previous if isinstance(k, tuple)]):
+            unknown.setdefault(key[0], []).append(key)
+        # players are matched with the previous list first by guid, then the
+        # players without a guid by name, in order
+        keys = []
+        olds = []
+        for player in playerList:
+            guid = player.get('guid', '')
+            old = None
+            if guid:
+                old = previous.pop(guid, None)
+                if old is None and unknown.get(player['name']):
+                    # the guid has become known since the last list
+                    old = previous.pop(unknown[player['name']].pop(0))
+            keys.append(guid)
+            olds.append(old)
+        ranks = {}
+        for i, player in enumerate(playerList):
+            if not keys[i]:
+                name = player['name']
+                rank = ranks[name] = ranks.get(name, -1) + 1
+                keys[i] = (name, rank)
+                if unknown.get(name):
+                    olds[i] = previous.pop(unknown[name].pop(0))
+        players = {}
+        changes = []
+        for player, key, old in zip(playerList, keys, olds):
+            name = player['name']
+            guid = player.get('guid', '')
+            values = tuple([player.get(f) for f in fields])
+            if old is None:
+                changes.append(PlayerChange('joined', name, guid, None, player, None))
+            else:
+                oldValues = old[2]
+                if oldValues != values:
+                    values = self._compare(changes, name, guid, oldValues, values)
+            players[key] = (name, guid, values)
+        for name, guid, values in previous.itervalues():
+            old = dict([(f, v) for f, v in zip(fields, values) if v is not None])
+            changes.append(PlayerChange('left', name, guid, old, None, None))
+        self._players = players
+        return changes
+
+    def _compare(self, changes, name, guid, oldValues, values):
+        """append the changes between two players values and return the values
+        to remember"""
+        remembered = list(values)
+        for field, old, new in zip(self.fields, oldValues, values):
+            if old == new:
+                continue
+            if field == 'ping':
+                try:
+                    if abs(int(new) - int(old)) < self.ping_threshold:
+                        # keep the last reported ping so slow drifts are reported too
+                        remembered[self.fields.index('ping')] = old
+                        continue
+                except (TypeError, ValueError):
+                    pass
+            delta = None
+            if field in COUNTER_FIELDS:
+                try:
+                    delta = int(new) - int(old)
+                except (TypeError, ValueError):
+                    pass
+            changes.append(PlayerChange(field, name, guid, old, new, delta))
+        return tuple(remembered)
+
+
+class PlayerListTracker(object):
+    """feed the admin.listPlayers replies of a polling.PollingEngine to one
+    PlayerListDiff per server and call func(server_name, changes) when a
+    player list changed"""
+
+    def __init__(self, engine, func, **kwargs):
+        self.func = func
+        self._kwargs = kwargs
+        self._diffs = {}
+        engine.subscribe(self._on_poll)
+
+    def _on_poll(self, server_name, query, old, new):
+        if query[0] not in ('admin.listPlayers', 'listPlayers') or new is None:
+            return
+        diff = self._diffs.get(server_name)
+        if diff is None:
+            diff = self._diffs[server_name] = PlayerListDiff(**self._kwargs)
+        changes = diff.update(new)
+        if changes:
+            self.func(server_name, changes)
@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Cross-server player index : which server a player is on, and was on, by
+# guid, name or IP
+#
+# usage :
+#     index = PlayerIndex()
+#     for name, server in connections.items():
+#         index.watch(name, server)    # player list, then join/leave events
+#     record = index.by_guid('EA_0123456789ABCDEF')
+#     print record.name, record.server, record.history
+#     print [r.name for r in index.resolve('cour')]
+#
+# or, with a polling engine :
+#     engine.subscribe(index.on_poll)
+#
+# The index is fed with player lists (admin.listPlayers replies, as
+# PlayerInfoBlock or dicts) and with player.onJoin, player.onAuthenticated,
+# player.onLeave and punkBuster.onMessage events, the latter giving the IP of
+# new connections. It never queries the servers by itself.
+#
+# Players are identified by guid, or by name until their guid is known.
+# Names, guids, IPs and server names are interned, so that the strings
+# repeated over records and histories are stored once. Lowercase names are
+# kept sorted for prefix lookups ; resolve() goes from exact name to prefix,
+# and then, optionally, substring and fuzzy matching, and is meant to turn
+# what an admin typed into a player name. Substring and fuzzy matches are
+# only suggestions when acting on a player.
+#
+from protocol import FrostbiteError
+from bisect import bisect_left, insort
+import difflib
+import logging
+import re
+import threading
+import time
+
+# PunkBuster Server: New Connection (slot #1) 11.22.33.44:3659 [OK] "Courgette" (seq 13)
+_pb_new_connection = re.compile(r'New Connection \(slot #\d+\) ([0-9.]+):\d+ \[[^\]]*\] "(.+)"')
+
+
+def _intern(s):
+    if type(s) is str:
+        return intern(s)
+    return s
+
+
+def iter_player_info(words):
+    """yield the players of a Player Info Block (the words of an
+    admin.listPlayers reply following 'OK') as dicts"""
+    numOfParameters = int(words[0])
+    parameters = words[1:1 + numOfParameters]
+    numOfPlayers = int(words[1 + numOfParameters])
+    data = words[2 + numOfParameters:]
+    for i in xrange(numOfPlayers):
+        yield dict(zip(parameters, data[i * numOfParameters:(i + 1) * numOfParameters]))
+
+
+class PlayerRecord(object):
+    """what is known of a player. server is None while the player is not
+    connected to any of the indexed servers. history lists (server, join
+    time, leave time) of the previous sessions, the most recent last"""
+    __slots__ = ('name', 'guid', 'ip', 'server', 'joined', 'last_seen', 'history')
+
+    def __init__(self, name, guid=None):
+        self.name = name
+        self.guid = guid
+        self.ip = None
+        self.server = None
+        self.joined = None
+        self.last_seen = None
+        self.history = []
+
+    def __repr__(self):
+        return "PlayerRecord(%r, guid=%r, ip=%r, server=%r)" % (self.name, self.guid, self.ip, self.server)
+
+
+class PlayerIndex(object):
+    """players of a fleet of servers by guid, name and IP"""
+
+    EVENTS = ('player.onJoin', 'player.onAuthenticated', 'player.onLeave', 'punkBuster.onMessage')
+
+    def __init__(self, history_size=20):
+        self.history_size = history_size
+        self._by_guid = {}
+        # lowercase name -> record
+        self._by_name = {}
+        # IP -> list of records
+        self._by_ip = {}
+        # server name -> set of the records of the connected players
+        self._online = {}
+        # sorted lowercase names of all the known players
+        self._names = []
+        self._lock = threading.RLock()
+
+    #===============================================================================
+    #
+    #    Public API
+    #
+    #===============================================================================
+
+    def watch(self, server_name, frostbite_server):
+        """index the players of a server : subscribe to its events then load
+        its current player list"""
+        frostbite_server.subscribe(self.observer(server_name), events=self.EVENTS)
+        try:
+            self.update(server_name, iter_player_info(frostbite_server.command('admin.listPlayers', 'all')))
+        except FrostbiteError, err:
+            self.getLogger().warn("could not list the players of %s : %r" % (server_name, err))
+
+    def observer(self, server_name):
+        """return an event observer feeding the index with the events of a
+        server, to subscribe to the EVENTS of that server"""
+        def on_event(words):
+            self.on_event(server_name, words)
+        return on_event
+
+    def on_event(self, server_name, words):
+        name = words[0]
+        if name in ('player.onJoin', 'player.onAuthenticated') and len(words) > 1:
+            self.joined(server_name, words[1], words[2] if len(words) > 2 else None)
+        elif name == 'player.onLeave' and len(words) > 1:
+            self.left(server_name, words[1])
+        elif name == 'punkBuster.onMessage' and len(words) > 1:
+            match = _pb_new_connection.search(words[1])
+            if match:
+                self.joined(server_name, match.group(2), ip=match.group(1))
+
+    def on_poll(self, server_name, query, old, new):
+        """polling.PollingEngine subscriber"""
+        if query[0] in ('admin.listPlayers', 'listPlayers') and query[1:] == ('all',) and new is not None:
+            self.update(server_name, iter_player_info(new))
+
+    def update(self, server_name, players):
+        """set the players connected to a server from a player list, such as
+        a PlayerInfoBlock. Players no longer listed are marked as gone"""
+        now = time.time()
+        self._lock.acquire()
+        try:
+            listed = set()
+            for player in players:
+                record = self._join(server_name, player['name'], player.get('guid'), player.get('ip'), now)
+                listed.add(record)
+            for record in list(self._online.get(server_name, ())):
+                if record not in listed:
+                    self._leave(record, now)
+        finally:
+            self._lock.release()
+
+    def joined(self, server_name, name, guid=None, ip=None):
+        self._lock.acquire()
+        try:
+            self._join(server_name, name, guid, ip, time.time())
+        finally:
+            self._lock.release()
+
+    def left(self, server_name, name):
+        self._lock.acquire()
+        try:
+            record = self._by_name.get(name.lower())
+            if record is not None and record.server == server_name:
+                self._leave(record, time.time())
+        finally:
+            self._lock.release()
+
+    def by_guid(self, guid):
+        return self._by_guid.get(guid)
+
+    def by_name(self, name):
+        """record of the player of that name, ignoring case, or None"""
+        return self._by_name.get(name.lower())
+
+    def by_ip(self, ip):
+        """records of the players seen with that IP"""
+        return list(self._by_ip.get(ip, ()))
+
+    def online(self, server_name=None):
+        """records of the connected players, of one server or of all"""
+        self._lock.acquire()
+        try:
+            if server_name is not None:
+                return list(self._online.get(server_name, ()))
+            records = []
+            for server_records in self._online.itervalues():
+                records.extend(server_records)
+            return records
+        finally:
+            self._lock.release()
+
+    def prefix(self, prefix, online=False):
+        """records of the players whose name starts with prefix, ignoring
+        case, in name order"""
+        prefix = prefix.lower()
+        self._lock.acquire()
+        try:
+            records = []
+            i = bisect_left(self._names, prefix)
+            while i < len(self._names) and self._names[i].startswith(prefix):
+                # names given up by players who changed name have no record
+                record = self._by_name.get(self._names[i])
+                if record is not None and (not online or record.server is not None):
+                    records.append(record)
+                i += 1
+            return records
+        finally:
+            self._lock.release()
+
+    def fuzzy(self, text, online=False, n=5, cutoff=0.6):
+        """records of the players whose name is close to text, the closest first"""
+        self._lock.acquire()
+        try:
+            if online:
+                names = [k for k, r in self._by_name.iteritems() if r.server is not None]
+            else:
+                names = self._by_name.keys()
+            return [self._by_name[k] for k in difflib.get_close_matches(text.lower(), names, n, cutoff)]
+        finally:
+            self._lock.release()
+
+    def resolve(self, partial, server_name=None, substring=True, fuzzy=True):
+        """connected players, of one server or of all, matching what an admin
+        typed : the player of that exact name, ignoring case, else those
+        whose name starts with it, else, if substring, those whose name
+        contains it, else, if fuzzy, the closest names. Substring and fuzzy
+        matches may well be other players : do not act on them without
+        confirmation"""
+        candidates = self.online(server_name)
+        text = partial.lower()
+        for record in candidates:
+            if record.name.lower() == text:
+                return [record]
+        found = [r for r in candidates if r.name.lower().startswith(text)]
+        if not found and substring:
+            found = [r for r in candidates if text in r.name.lower()]
+        if found:
+            return sorted(found, key=lambda r: r.name.lower())
+        if fuzzy:
+            return self._close(partial, candidates, 5, 0.6)
+        return []
+
+    def suggest(self, partial, server_name=None, n=5, cutoff=0.6):
+        """connected players, of one server or of all, whose name contains or
+        is close to what an admin typed, the closest first"""
+        candidates = self.online(server_name)
+        text = partial.lower()
+        found = sorted([r for r in candidates if text in r.name.lower()], key=lambda r: r.name.lower())
+        for record in self._close(partial, candidates, n, cutoff):
+            if record not in found:
+                found.append(record)
+        return found[:n]
+
+    def __len__(self):
+        return len(self._by_name)
+
+    #===============================================================================
+    #
+    # Other methods
+    #
+    #===============================================================================
+
+    def getLogger(self):
+        return logging.getLogger("PlayerIndex")
+
+    def _close(self, partial, records, n, cutoff):
+        names = dict([(r.name.lower(), r) for r in records])
+        return [names[k] for k in difflib.get_close_matches(partial.lower(), names.keys(), n, cutoff)]
+
+    def _join(self, server_name, name, guid, ip, now):
+        """update the record of a player seen on a server and return it"""
+        name = _intern(name)
+        key = _intern(name.lower())
+        guid = _intern(guid) if guid else None
+        record = self._by_guid.get(guid) if guid else None
+        if record is None:
+            record = self._by_name.get(key)
+            if record is not None and guid and record.guid and record.guid != guid:
+                # another player who used to have that name
+                record = None
+        if record is None:
+            record = PlayerRecord(name, guid)
+        if record.name != name:
+            # the player changed name
+            if self._by_name.get(record.name.lower()) is record:
+                del self._by_name[record.name.lower()]
+            record.name = name
+        if key not in self._by_name:
+            insort(self._names, key)
+        self._by_name[key] = record
+        if guid and record.guid != guid:
+            record.guid = guid
+        if record.guid:
+            self._by_guid[record.guid] = record
+        if ip and ip != record.ip:
+            record.ip = ip = _intern(ip)
+            records = self._by_ip.setdefault(ip, [])
+            if record not in records:
+                records.append(record)
+        server_name = _intern(server_name)
+        if record.server != server_name:
+            if record.server is not None:
+                self._leave(record, now)
+            record.server = server_name
+            record.joined = now
+            self._online.setdefault(server_name, set()).add(record)
+        record.last_seen = now
+        return record
+
+    def _leave(self, record, now):
+        self._online.get(record.server, set()).discard(record)
+        record.history.append((record.server, record.joined, now))
+        if len(record.history) > self.history_size:
+            del record.history[0]
+        record.server = None
+        record.joined = None
+        record.last_seen = now
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Fleet-wide adaptive polling of Frostbite servers
+#
+# usage :
+#     engine = PollingEngine({'eu1': server1, 'eu2': server2})
+#     engine.subscribe(on_change)     # on_change(server_name, query, old, new)
+#     engine.start()
+#     info = engine.get('eu1', ('serverInfo',), max_age=5)
+#
+# Each server is polled with serverInfo and admin.listPlayers all. A query
+# whose reply does not change is polled less and less often, down to
+# max_interval, and empty servers without events go straight to
+# idle_interval. Any change brings the query back to min_interval, and any
+# game event brings the polls of the server due later than min_interval
+# forward to min_interval. Subscribers are only called when a reply changes,
+# leaving out the fields which change all the time, such as the scores and
+# round time of serverInfo.
+#
+from protocol import FrostbiteError, _monotonic
+from collections import deque
+import heapq
+import logging
+import random
+import threading
+
+DEFAULT_QUERIES = (('serverInfo',), ('admin.listPlayers', 'all'))
+
+# events showing that something is happening on a server
+ACTIVITY_EVENTS = ('player.onJoin', 'player.onLeave', 'player.onKill',
+                   'player.onChat', 'player.onSpawn', 'player.onTeamChange',
+                   'player.onSquadChange')
+
+
+def _stable_server_info(words):
+    """serverInfo reply without the team scores, server up time and round
+    time : <serverName> <players> <max players> <game mode> <map>
+    <rounds played> <rounds total> <team scores> <online state> <ranked>
+    <punkBuster> <has password> <server up time> <round time> ..."""
+    try:
+        scores_end = 9 + int(words[7])
+    except (IndexError, ValueError):
+        return words[:7]
+    # keep the target score, the last word of the team scores
+    return words[:7] + words[scores_end - 1:scores_end + 4] + words[scores_end + 6:]
+
+# query name -> function returning the words of a reply which are compared
+# to tell whether the reply changed
+STABLE_WORDS = {
+    'serverInfo': _stable_server_info,
+}
+
+
+class PollTask(object):
+    """one query polled on one server"""
+
+    def __init__(self, server_name, query, interval):
+        self.server_name = server_name
+        self.query = query
+        self.interval = interval
+        self.next_time = 0
+        self.result = None
+        self.result_time = None
+        # True from the time a poll is claimed until its reply is handled
+        self.in_flight = None
+        # number of activity events the server had sent at the previous poll
+        self.event_count = 0
+        # threads blocked in PollingEngine.get() until the poll in flight completes
+        self.waiters = []
+
+
+class _Waiter(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PollingEngine(threading.Thread):
+    """thread scheduling polls over a fleet of FrostbiteServer, adapting each
+    poll interval to the activity of the server"""
+
+    def __init__(self, servers, queries=DEFAULT_QUERIES, min_interval=2.0,
+                 max_interval=30.0, idle_interval=60.0, backoff=1.5, jitter=0.1):
+        threading.Thread.__init__(self, name="PollingEngineThread")
+        self.daemon = True
+        self.servers = dict(servers)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.idle_interval = idle_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.observers = set()
+        self.polls_sent = 0
+        # reentrant as replies may be handled by a thread holding it
+        self._condition = threading.Condition(threading.RLock())
+        self._stopEvent = threading.Event()
+        self._tasks = {}
+        self._heap = []
+        self._completed = deque()
+        self._event_counts = dict((name, 0) for name in self.servers)
+        self._player_counts = {}
+        # server name -> scheduled tasks of the server
+        self._server_tasks = {}
+        for name, server in self.servers.items():
+            server.subscribe(self._event_counter(name), events=ACTIVITY_EVENTS)
+            for query in queries:
+                task = PollTask(name, tuple(query), min_interval)
+                # spread the first polls over the first interval
+                task.next_time = _monotonic() + random.uniform(0, min_interval)
+                self._tasks[(name, task.query)] = task
+                self._server_tasks.setdefault(name, []).append(task)
+                heapq.heappush(self._heap, (task.next_time, id(task), task))
+
+    #===============================================================================
+    #
+    #    Public API
+    #
+    #===============================================================================
+
+    def subscribe(self, func):
+        """func(server_name, query, old words, new words) is called from the
+        engine thread each time a polled reply changes, ignoring the changes
+        of the fields left out by STABLE_WORDS"""
+        self.observers = self.observers | set([func])
+
+    def unsubscribe(self, func):
+        self.observers = self.observers - set([func])
+
+    def get(self, server_name, query, max_age=None, timeout=10):
+        """return the last reply to query on server_name if younger than
+        max_age seconds, else poll now. Concurrent calls for the same query
+        share the same request"""
+        query = tuple(query)
+        if server_name not in self.servers:
+            # checked before claiming the task, which nothing would release
+            raise FrostbiteError("unknown server %r" % server_name)
+        self._condition.acquire()
+        try:
+            task = self._tasks.get((server_name, query))
+            if task is None:
+                task = PollTask(server_name, query, self.min_interval)
+                task.next_time = float('inf')
+                self._tasks[(server_name, query)] = task
+            if task.result is not None and max_age is not None \
+                    and _monotonic() - task.result_time <= max_age:
+                return task.result
+            waiter = _Waiter()
+            task.waiters.append(waiter)
+            send = task.in_flight is None
+            if send:
+                self._claim(task)
+        finally:
+            self._condition.release()
+        if send:
+            self._send(task)
+        waiter.event.wait(timeout)
+        if not waiter.event.is_set():
+            raise FrostbiteError("no reply to %r from %s" % (query, server_name))
+        if waiter.error is not None:
+            raise waiter.error
+        return waiter.result
+
+    def stop(self):
+        self._stopEvent.set()
+        self._condition.acquire()
+        try:
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+    #===============================================================================
+    #
+    # Other methods
+    #
+    #===============================================================================
+
+    def getLogger(self):
+        return logging.getLogger("PollingEngine")
+
+    def run(self):
+        """Threaded code"""
+        while not self._stopEvent.is_set():
+            due = []
+            self._condition.acquire()
+            try:
+                now = _monotonic()
+                while self._heap and self._heap[0][0] <= now:
+                    next_time, key, task = heapq.heappop(self._heap)
+                    if next_time == task.next_time and task.in_flight is None:
+                        self._claim(task)
+                        due.append(task)
+                completed = list(self._completed)
+                self._completed.clear()
+                if not completed and not due:
+                    delay = self._heap[0][0] - now if self._heap else 1
+                    self._condition.wait(max(0.01, min(delay, 1)))
+            finally:
+                self._condition.release()
+            # sending may block on a server whose outgoing queue is full, which
+            # must not hold up the replies of the other servers
+            for task in due:
+                self._send(task)
+            for task, old, new in completed:
+                for func in self.observers:
+                    try:
+                        func(task.server_name, task.query, old, new)
+                    except Exception:
+                        self.getLogger().exception("error in polling observer %r" % func)
+
+    def _event_counter(self, server_name):
+        def count_event(words):
+            self._condition.acquire()
+            try:
+                self._event_counts[server_name] += 1
+                soon = _monotonic() + self.min_interval
+                rescheduled = False
+                for task in self._server_tasks.get(server_name, ()):
+                    if task.in_flight is None and task.next_time > soon:
+                        # the heap entry of the previous time is skipped by run()
+                        task.interval = self.min_interval
+                        task.next_time = soon
+                        heapq.heappush(self._heap, (task.next_time, id(task), task))
+                        rescheduled = True
+                if rescheduled:
+                    self._condition.notify()
+            finally:
+                self._condition.release()
+        return count_event
+
+    def _claim(self, task):
+        """mark the task as polled, so that no other thread sends it. Called
+        with the condition acquired"""
+        task.in_flight = True
+        self.polls_sent += 1
+
+    def _send(self, task):
+        """send the query of a claimed task. Called without the condition"""
+        server = self.servers[task.server_name]
+        try:
+            pending = server.command_async(task.query)
+        except FrostbiteError, err:
+            self._condition.acquire()
+            try:
+                self._on_reply(task, None, err)
+                self._condition.notify()
+            finally:
+                self._condition.release()
+            return
+        pending.add_done_callback(lambda p: self._on_done(task, p))
+
+    def _on_done(self, task, pending):
+        words = pending.response
+        error = pending.error
+        if error is None and words[0] != 'OK':
+            error = FrostbiteError("%r failed on %s : %r" % (task.query, task.server_name, words))
+        self._condition.acquire()
+        try:
+            self._on_reply(task, words[1:] if error is None else None, error)
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+    def _on_reply(self, task, result, error):
+        """record a reply and schedule the next poll. Called with the condition acquired"""
+        task.in_flight = None
+        waiters, task.waiters = task.waiters, []
+        for waiter in waiters:
+            waiter.result = result
+            waiter.error = error
+            waiter.event.set()
+        if error is not None:
+            self.getLogger().warn("polling %r on %s failed : %r" % (task.query, task.server_name, error))
+            task.interval = self.max_interval
+        else:
+            old = task.result
+            task.result = result
+            task.result_time = _monotonic()
+            stable = STABLE_WORDS.get(task.query[0])
+            if stable is None or old is None:
+                changed = old != result
+            else:
+                changed = stable(old) != stable(result)
+            task.interval = self._next_interval(task, changed)
+            if changed:
+                self._completed.append((task, old, result))
+        if task.next_time != float('inf'):
+            task.next_time = _monotonic() + task.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            heapq.heappush(self._heap, (task.next_time, id(task), task))
+
+    def _next_interval(self, task, changed):
+        server_name = task.server_name
+        event_count = self._event_counts.get(server_name, 0)
+        events = event_count - task.event_count
+        task.event_count = event_count
+        if task.query[0] == 'serverInfo' and task.result:
+            try:
+                self._player_counts[server_name] = int(task.result[1])
+            except (IndexError, ValueError):
+                pass
+        # an empty server is idle whatever changed, such as a map rotation
+        if self._player_counts.get(server_name) == 0 and not events:
+            return self.idle_interval
+        if changed or events:
+            return self.min_interval
+        return min(self.max_interval, task.interval * self.backoff)
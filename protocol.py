@@ -7,12 +7,68 @@
 __version__ = '1.0.1'
 
 import logging
-from struct import pack, unpack
+from struct import pack, unpack, Struct
 import time
 import asyncore
 import socket
 import threading
 import hashlib
+import heapq
+import errno
+from collections import deque
+
+# CLOCK_MONOTONIC by platform
+_CLOCK_MONOTONIC = {'linux': 1, 'freebsd': 4, 'darwin': 6}
+
+def _find_monotonic():
+    """return a function giving the time in seconds of a clock which does not
+    jump with the system clock. Python 2 has none in its standard library :
+    use clock_gettime(CLOCK_MONOTONIC) on unix and GetTickCount64 on windows
+    through ctypes, and only fall back to time.time when neither is there"""
+    try:
+        import ctypes
+        import sys
+    except ImportError:
+        return time.time
+    if sys.platform == 'win32':
+        try:
+            get_tick_count = ctypes.windll.kernel32.GetTickCount64
+        except AttributeError:
+            # windows XP
+            return time.time
+        get_tick_count.restype = ctypes.c_ulonglong
+        def monotonic():
+            return get_tick_count() / 1000.0
+        return monotonic
+    clock_id = None
+    for platform, platform_clock_id in _CLOCK_MONOTONIC.items():
+        if sys.platform.startswith(platform):
+            clock_id = platform_clock_id
+    if clock_id is None:
+        return time.time
+
+    class timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    # clock_gettime is in the C library since glibc 2.17, in librt before
+    for library in (None, 'librt.so.1'):
+        try:
+            clock_gettime = ctypes.CDLL(library).clock_gettime
+        except (OSError, AttributeError):
+            continue
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+        ts = timespec()
+        if clock_gettime(clock_id, ctypes.byref(ts)) != 0:
+            continue
+        def monotonic():
+            # a timespec per call, as the call releases the GIL
+            ts = timespec()
+            clock_gettime(clock_id, ctypes.byref(ts))
+            return ts.tv_sec + ts.tv_nsec * 1e-9
+        return monotonic
+    return time.time
+
+_monotonic = _find_monotonic()
 
 def EncodeHeader(isFromServer, isResponse, sequence):
     header = sequence & 0x3fffffff
@@ -57,6 +113,50 @@ def DecodeWords(size, data):
 
     return words
 
+# Yield the words of an encoded packet one at a time, without building the
+# whole list of words
+
+def IterWords(packet):
+    packetSize = len(packet)
+    offset = 12
+    while offset < packetSize:
+        wordLen = DecodeInt32(packet[offset : offset + 4])
+        yield packet[offset + 4 : offset + 4 + wordLen]
+        offset += wordLen + 5
+
+# Largest packet accepted from a server. A bigger size field can only come
+# from corrupted data and would make us buffer forever
+MAX_PACKET_SIZE = 16 * 1024 * 1024
+
+# Split a receive buffer into the complete packets it contains and the
+# remaining incomplete data
+
+def SplitPackets(data, maxSize=MAX_PACKET_SIZE):
+    packets = []
+    offset = 0
+    dataLen = len(data)
+    while dataLen - offset >= 8:
+        packetSize = DecodeInt32(data[offset + 4 : offset + 8])
+        if packetSize < 12 or packetSize > maxSize:
+            raise ValueError("invalid packet size %i" % packetSize)
+        if dataLen - offset < packetSize:
+            break
+        packets.append(data[offset : offset + packetSize])
+        offset += packetSize
+    return packets, data[offset:]
+
+# Use the C implementation of the codec when it has been built (see
+# setupSpeedups.py). The pure python functions stay available as Py*
+PyEncodeWords = EncodeWords
+PyDecodeWords = DecodeWords
+PySplitPackets = SplitPackets
+try:
+    from _frostbitespeedups import encode_words as EncodeWords, \
+        decode_words as DecodeWords, split_packets as SplitPackets
+    speedups_available = True
+except ImportError:
+    speedups_available = False
+
 def EncodePacket(isFromServer, isResponse, sequence, words):
     encodedHeader = EncodeHeader(isFromServer, isResponse, sequence)
     encodedNumWords = EncodeInt32(len(words))
@@ -64,6 +164,34 @@ def EncodePacket(isFromServer, isResponse, sequence, words):
     encodedSize = EncodeInt32(wordsSize + 12)
     return encodedHeader + encodedSize + encodedNumWords + encodedWords
 
+_headerAndSize = Struct('<II')
+
+class PacketTemplate(object):
+    """pre-encoded packet for a fixed list of words. Only the header and size
+    are encoded each time the packet is sent.
+    
+    usage :
+        ok = PacketTemplate(("OK",))
+        packet = ok.encode(True, True, sequence)
+    """
+
+    def __init__(self, words):
+        self.words = tuple(words)
+        [wordsSize, encodedWords] = EncodeWords(self.words)
+        self._size = wordsSize + 12
+        self._body = EncodeInt32(len(self.words)) + encodedWords
+
+    def encode(self, isFromServer, isResponse, sequence):
+        header = sequence & 0x3fffffff
+        if isFromServer:
+            header += 0x80000000
+        if isResponse:
+            header += 0x40000000
+        return _headerAndSize.pack(header, self._size) + self._body
+
+# acknowledgement sent for every event the server sends us
+OK_RESPONSE = PacketTemplate(("OK",))
+
 # Decode a request or response packet
 # Return format is:
 # [isFromServer, isResponse, sequence, words]
@@ -79,21 +207,107 @@ def DecodePacket(data):
     words = DecodeWords(wordsSize, data[12:])
     return [isFromServer, isResponse, sequence, words]
 
+class PacketView(object):
+    """received packet whose words are only decoded when needed.
+    
+    The header is decoded right away, the first word (the event name for
+    server events) on first access to name and the other words on first
+    access to words.
+    """
+
+    def __init__(self, packet):
+        self.packet = packet
+        [self.isFromServer, self.isResponse, self.sequence] = DecodeHeader(packet)
+        self._name = None
+        self._words = None
+
+    @property
+    def name(self):
+        """first word of the packet, or None if the packet has no word"""
+        if self._name is None and self._words is None:
+            if DecodeInt32(self.packet[8:12]) == 0:
+                return None
+            wordLen = DecodeInt32(self.packet[12:16])
+            self._name = self.packet[16 : 16 + wordLen]
+        elif self._name is None:
+            self._name = self._words[0] if self._words else None
+        return self._name
+
+    @property
+    def words(self):
+        if self._words is None:
+            self._words = DecodeWords(len(self.packet) - 12, self.packet[12:])
+        return self._words
+
+    def iterwords(self):
+        """yield the words one at a time instead of decoding them all at once"""
+        if self._words is not None:
+            return iter(self._words)
+        return IterWords(self.packet)
+
+    def __repr__(self):
+        return "PacketView(%r)" % ([self.isFromServer, self.isResponse, self.sequence, self.words],)
+
 ###############################################################################
 
-clientSequenceNr = 0
+SEQUENCE_MASK = 0x3fffffff
+
+class SequenceCounter(object):
+    """thread safe allocator of client request sequence numbers.
+    
+    Sequence numbers are 30 bits wide and wrap around to 0. When given the
+    collection of sequence numbers still waiting for a reply, allocate() skips
+    them so that a long lived pending command can never share its sequence
+    number with a newer one after a wraparound."""
+
+    def __init__(self, start=0):
+        self._lock = threading.Lock()
+        self._next = start & SEQUENCE_MASK
+
+    def allocate(self, in_use=None):
+        """return the next free sequence number"""
+        self._lock.acquire()
+        try:
+            sequence = self._next
+            if in_use:
+                if len(in_use) >= SEQUENCE_MASK + 1:
+                    raise FrostbiteError("no free sequence number left")
+                # bounded, in case in_use holds numbers out of the sequence range
+                for i in xrange(SEQUENCE_MASK + 1):
+                    if sequence not in in_use:
+                        break
+                    sequence = (sequence + 1) & SEQUENCE_MASK
+                else:
+                    raise FrostbiteError("no free sequence number left")
+            self._next = (sequence + 1) & SEQUENCE_MASK
+            return sequence
+        finally:
+            self._lock.release()
+
+_clientSequence = SequenceCounter()
+
+# commands frequently sent by polling tools, kept pre-encoded
+_requestTemplates = {}
+for _words in (('serverInfo',), ('version',), ('help',), ('admin.help',),
+               ('listPlayers', 'all'), ('admin.listPlayers', 'all')):
+    _requestTemplates[_words] = PacketTemplate(_words)
+del _words
 
 # Encode a request packet
 
-def EncodeClientRequest(words):
-    global clientSequenceNr
-    packet = EncodePacket(False, False, clientSequenceNr, words)
-    clientSequenceNr = (clientSequenceNr + 1) & 0x3fffffff
-    return packet
+def EncodeClientRequest(words, sequence=None):
+    if sequence is None:
+        sequence = _clientSequence.allocate()
+    template = _requestTemplates.get(tuple(words))
+    if template is not None:
+        return template.encode(False, False, sequence)
+    return EncodePacket(False, False, sequence, words)
 
 # Encode a response packet
     
 def EncodeClientResponse(sequence, words):
+    if len(words) == 1 and words[0] == "OK":
+        return OK_RESPONSE.encode(True, True, sequence)
     return EncodePacket(True, True, sequence, words)
 
 
@@ -131,10 +345,13 @@ def generatePasswordHash(salt, password):
     
 ###################################################################################
 
-def containsCompletePacket(data):
+def containsCompletePacket(data, maxSize=MAX_PACKET_SIZE):
     if len(data) < 8:
         return False
-    if len(data) < DecodeInt32(data[4:8]):
+    packetSize = DecodeInt32(data[4:8])
+    if packetSize < 12 or packetSize > maxSize:
+        raise ValueError("invalid packet size %i" % packetSize)
+    if len(data) < packetSize:
         return False
     return True
 
@@ -158,6 +375,7 @@ def receivePacket(_socket, receiveBuffer):
     return [packet, receiveBuffer]
 
 #####################################################################################
+
 class FrostbiteError(Exception): pass
 
 class CommandError(FrostbiteError): pass
@@ -166,15 +384,188 @@ class CommandFailedError(CommandError): pass
 
 class NetworkError(FrostbiteError): pass
 
-class FrostbiteDispatcher(asyncore.dispatcher_with_send):
+class PacketChannel(asyncore.dispatcher):
+    """asyncore channel exchanging Frostbite packets. Received data is cooked
+    into packets given to handle_packet(); outgoing packets are queued and
+    written in batches."""
+
+    # number of queued outgoing bytes above which wait_for_send_room() blocks
+    high_water_mark = 256 * 1024
+    # max number of bytes handed to the socket in one send call
+    send_batch_size = 64 * 1024
+    # max number of bytes read from the socket in one recv call
+    recv_size = 64 * 1024
+    max_packet_size = MAX_PACKET_SIZE
+
+    def __init__(self, sock=None, map=None):
+        asyncore.dispatcher.__init__(self, sock=sock, map=map)
+        # received data not yet cooked into packets, kept as a list of chunks
+        # so that a large packet is not copied again on every read
+        self._chunks_in = []
+        self._chunks_in_size = 0
+        self._needed_in = 0
+        # outgoing packets are queued and written in batches by flush()
+        self._out_queue = deque()
+        self._out_size = 0
+        self._out_condition = threading.Condition(threading.RLock())
+        # traffic counters
+        self.packets_sent = 0
+        self.packets_received = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def send_packet(self, packet, flush=True):
+        """Queue an encoded packet for sending. Unless flush is False, try to
+        write the outgoing queue right away."""
+        self._out_condition.acquire()
+        try:
+            self._out_queue.append(packet)
+            self._out_size += len(packet)
+            self.packets_sent += 1
+        finally:
+            self._out_condition.release()
+        if flush:
+            self.flush()
+
+    def wait_for_send_room(self, timeout=None):
+        """block while more than high_water_mark bytes are waiting to be sent.
+        Return False if the outgoing queue is still above the mark after timeout"""
+        deadline = None if timeout is None else _monotonic() + timeout
+        self._out_condition.acquire()
+        try:
+            while self._out_size > self.high_water_mark and self.connected:
+                if deadline is None:
+                    self._out_condition.wait(1)
+                else:
+                    remaining = deadline - _monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._out_condition.wait(min(remaining, 1))
+            return True
+        finally:
+            self._out_condition.release()
+
+    def flush(self):
+        """write as much of the outgoing queue as the socket accepts, batching
+        queued packets into as few send calls as possible"""
+        self._out_condition.acquire()
+        try:
+            queue = self._out_queue
+            while queue and self.connected:
+                batch = []
+                batch_size = 0
+                for packet in queue:
+                    batch.append(packet)
+                    batch_size += len(packet)
+                    if batch_size >= self.send_batch_size:
+                        break
+                sent = self._send_buffers(batch)
+                if not sent:
+                    break
+                self._out_size -= sent
+                self.bytes_sent += sent
+                while sent:
+                    packet = queue[0]
+                    if sent >= len(packet):
+                        queue.popleft()
+                        sent -= len(packet)
+                    else:
+                        queue[0] = packet[sent:]
+                        sent = 0
+                if self._out_size <= self.high_water_mark:
+                    self._out_condition.notify_all()
+        finally:
+            self._out_condition.release()
 
-    def __init__(self, host, port):
-        asyncore.dispatcher_with_send.__init__(self)
-        self._buffer_in = ''
+    def _send_buffers(self, buffers):
+        """send the given list of strings using a single system call. Return
+        the number of bytes sent"""
+        try:
+            if len(buffers) == 1:
+                return self.socket.send(buffers[0])
+            else:
+                return self.socket.send(''.join(buffers))
+        except socket.error, why:
+            if why.args[0] in (errno.EWOULDBLOCK, errno.EAGAIN):
+                return 0
+            elif why.args[0] in asyncore._DISCONNECTED:
+                self.handle_close()
+                return 0
+            else:
+                raise
+
+    def getLogger(self):
+        return logging.getLogger("PacketChannel")
+
+    def writable(self):
+        return (not self.connected) or len(self._out_queue) > 0
+
+    def handle_write(self):
+        self.flush()
+    
+    def handle_close(self):
+        """Called when the socket is closed."""
+        self.getLogger().debug("handle_close")
+        self.close()
+        # wake up callers blocked on a full outgoing queue
+        self._out_condition.acquire()
+        try:
+            self._out_condition.notify_all()
+        finally:
+            self._out_condition.release()
+
+    def handle_read(self):
+        """Called when the asynchronous loop detects that a read() call on the channel's socket will succeed."""
+        # received raw data
+        data = self.recv(self.recv_size)
+        self.getLogger().debug('read %s char', len(data))
+        self.bytes_received += len(data)
+        self._chunks_in.append(data)
+        self._chunks_in_size += len(data)
+        if self._chunks_in_size < self._needed_in:
+            # still waiting for the end of a large packet
+            return
+        if len(self._chunks_in) == 1:
+            buffer_in = self._chunks_in[0]
+        else:
+            buffer_in = ''.join(self._chunks_in)
+
+        # cook it into Frosbite packets
+        try:
+            packets, buffer_in = SplitPackets(buffer_in, self.max_packet_size)
+        except ValueError, err:
+            self.getLogger().error("corrupted data received : %s" % err)
+            self.handle_close()
+            return
+        self._chunks_in = [buffer_in] if buffer_in else []
+        self._chunks_in_size = len(buffer_in)
+        if len(buffer_in) >= 8:
+            self._needed_in = DecodeInt32(buffer_in[4:8])
+        else:
+            self._needed_in = 0
+        self.packets_received += len(packets)
+        for packet in packets:
+            self.handle_packet(packet)
+        # send the replies queued while handling those packets at once
+        self.flush()
+            
+    def handle_packet(self, packet):
+        """Called when a full Frosbite packet has been received."""
+        raise NotImplementedError
+
+
+class FrostbiteDispatcher(PacketChannel):
+
+    def __init__(self, host, port, map=None):
+        PacketChannel.__init__(self, map=map)
+        self.sequence = SequenceCounter()
+        # set once the connection is established
+        self.connected_event = threading.Event()
         self.getLogger().info("connecting")
         self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
-        asyncore.dispatcher_with_send.connect(self, (host, port))
+        asyncore.dispatcher.connect(self, (host, port))
         self._frostbite_event_handler = None
+        self._frostbite_event_filter = None
         self._frostbite_command_response_handler = None
 
     #===============================================================================
@@ -188,9 +579,17 @@ class FrostbiteDispatcher(asyncore.dispatcher_with_send):
         sends us a game event."""
         self._frostbite_event_handler = func
 
+    def set_frostbite_event_filter(self, func):
+        """register a function that, given an event name, tells whether that
+        event must be decoded and given to the event handler. Events refused
+        by the filter are only acknowledged."""
+        self._frostbite_event_filter = func
+
     def set_frostbite_command_response_handler(self, func):
         """register a function that will be called when the Frosbite server
-        sends us a command reply."""
+        sends us a command reply. func receives the command id and the reply
+        as a PacketView, leaving it free to decode the words at once or
+        streaming them with PacketView.iterwords()."""
         self._frostbite_command_response_handler = func
         
     def send_command(self, *command):
@@ -201,13 +600,15 @@ class FrostbiteDispatcher(asyncore.dispatcher_with_send):
             words = command[0]
         else:
             words = command
-        request = EncodeClientRequest(words)
-        [sequence, words] = DecodePacket(request)[2:]
+        sequence = self.sequence.allocate()
+        self.send_request(sequence, words)
+        return sequence
 
+    def send_request(self, sequence, words):
+        """Send a command to the Frosbite server using a sequence number
+        previously obtained from self.sequence"""
         self.getLogger().debug("sending command request #%i: %s " % (sequence, words))
-        asyncore.dispatcher_with_send.send(self, request)
-
-        return sequence
+        self.send_packet(EncodeClientRequest(words, sequence))
 
     #===========================================================================
     # 
@@ -220,76 +621,154 @@ class FrostbiteDispatcher(asyncore.dispatcher_with_send):
     
     def handle_connect(self):
         self.getLogger().debug("handle_connect")
-    
-    def handle_close(self):
-        """Called when the socket is closed."""
-        self.getLogger().debug("handle_close")
-        self.close()
+        self.connected_event.set()
+        self.flush()
 
-    def handle_read(self):
-        """Called when the asynchronous loop detects that a read() call on the channel's socket will succeed."""
-        # received raw data
-        data = self.recv(8192)
-        self._buffer_in += data
-        self.getLogger().debug('read %s char from Frostbite2 gameserver' % len(data))
-
-        # cook it into Frosbite packets
-        while containsCompletePacket(self._buffer_in):
-            packetSize = DecodeInt32(self._buffer_in[4:8])
-            packet = self._buffer_in[0:packetSize]
-            self._buffer_in = self._buffer_in[packetSize:len(self._buffer_in)]
-            self.handle_packet(packet)
-            
     def handle_packet(self, packet):
         """Called when a full Frosbite packet has been received."""
-        [originServer, isResponse, sequence, words] = DecodePacket(packet)
-        self.getLogger().info("handle_packet(%s)" % repr([originServer, isResponse, sequence, words]))
+        view = PacketView(packet)
+        originServer, isResponse, sequence = view.isFromServer, view.isResponse, view.sequence
+        self.getLogger().debug("handle_packet(%r)", view)
         if not isResponse:
             # acknowledge the server
-            self.send(EncodePacket(originServer, True, sequence, ("OK",)))
+            self.send_packet(OK_RESPONSE.encode(originServer, True, sequence), flush=False)
         if originServer:
             if isResponse:
                 self.getLogger().warn("received a bad packet from frosbite server pretending being a response for a server request. %s" % repr(packet))
-            else:
-                self.handle_frostbite_event(words)
+            elif self._frostbite_event_filter is None or self._frostbite_event_filter(view.name):
+                self.handle_frostbite_event(view.words)
         else:
             if isResponse:
-                self.handle_frostbite_command_response(sequence, words)
+                self.handle_frostbite_command_response(sequence, view)
             else:
                 self.getLogger().warn("received a bad packet from frosbite server pretending being a request from us. %s" % repr(DecodePacket(packet)))
 
     def handle_frostbite_event(self, words):
-        self.getLogger().debug("received a game event from frosbite server. %s" % repr(words))
+        self.getLogger().debug("received a game event from frosbite server. %r", words)
         if self._frostbite_event_handler is not None:
             self._frostbite_event_handler(words)
 
-    def handle_frostbite_command_response(self, command_id, words):
-        self.getLogger().debug("received a response for command #%i from frosbite server. %s" % (command_id, repr(words)))
+    def handle_frostbite_command_response(self, command_id, packet):
+        self.getLogger().debug("received a response for command #%i from frosbite server. %r", command_id, packet)
         if self._frostbite_command_response_handler is not None:
-            self._frostbite_command_response_handler(command_id, words)
+            self._frostbite_command_response_handler(command_id, packet)
     
     
 
+class PendingCommand(object):
+    """a command sent to the Frostbite server and still waiting for its reply"""
+
+    def __init__(self, command_id, words, deadline):
+        self.command_id = command_id
+        self.words = words
+        self.deadline = deadline
+        self.sent_time = _monotonic()
+        self.done_time = None
+        # reply as a PacketView, decoded by whoever reads response
+        self.packet = None
+        self.error = None
+        self._done = threading.Event()
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    @property
+    def response(self):
+        """words of the reply, or None if not received yet"""
+        if self.packet is None:
+            return None
+        return self.packet.words
+
+    @property
+    def elapsed(self):
+        """seconds between sending the command and receiving its reply or
+        error, or None if still pending"""
+        if self.done_time is None:
+            return None
+        return self.done_time - self.sent_time
+
+    def set_response(self, packet):
+        self.packet = packet
+        self._set_done()
+
+    def set_error(self, error):
+        self.error = error
+        self._set_done()
+
+    def add_done_callback(self, func):
+        """call func(pending_command) once the reply or an error is received.
+        func is called from the connection thread, or right away if the
+        command is already done"""
+        self._callbacks_lock.acquire()
+        try:
+            if not self._done.is_set():
+                self._callbacks.append(func)
+                return
+        finally:
+            self._callbacks_lock.release()
+        func(self)
+
+    def _set_done(self):
+        self.done_time = _monotonic()
+        self._callbacks_lock.acquire()
+        try:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        finally:
+            self._callbacks_lock.release()
+        for func in callbacks:
+            try:
+                func(self)
+            except Exception:
+                logging.getLogger("FrostbiteServer").exception("error in callback of command #%i" % self.command_id)
+
+    def is_done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """block until the reply or an error is received. Return True if done"""
+        self._done.wait(timeout)
+        return self._done.is_set()
+
+
 class FrostbiteServer(threading.Thread):
     """thread opening a connection to a Frostbite game server and providing
     means of observing Frostbite events and sending commands"""
     def __init__(self, host, port, password=None, command_timeout=5.0):
         threading.Thread.__init__(self, name="FrosbiteServerThread")
-        self.frostbite_dispatcher = FrostbiteDispatcher(host, port)
+        # each connection gets its own socket map so that several FrostbiteServer
+        # threads never service each other's dispatcher
+        self._socket_map = {}
+        self.host = host
+        self.port = port
+        self.frostbite_dispatcher = FrostbiteDispatcher(host, port, map=self._socket_map)
         self._stopEvent = threading.Event()
         self.password = password
         self.command_timeout = command_timeout
         self.frostbite_dispatcher.set_frostbite_event_hander(self._on_event)
+        self.frostbite_dispatcher.set_frostbite_event_filter(self._is_observed_event)
         self.frostbite_dispatcher.set_frostbite_command_response_handler(self._on_command_response)
+        # command_id -> PendingCommand
         self.pending_commands = {}
-        self.__command_reply_event = threading.Event()
+        self._pending_lock = threading.Lock()
+        # heap of (deadline, command_id, PendingCommand) used by the connection
+        # thread to expire commands the server never replied to
+        self._pending_timeouts = []
+        # observers of all events, and observers of given events by event name.
+        # Both are replaced rather than modified so they can be iterated from
+        # the connection thread while other threads subscribe
         self.observers = set()
+        self.event_observers = {}
+        # command and event counters, see stats()
+        self.commands_sent = 0
+        self.commands_failed = 0
+        self.commands_timed_out = 0
+        self.events_received = 0
         # test connection
         sock = socket.create_connection((host, port), timeout=2)
         sock.close()
         # ok start working
         self.start()
-        time.sleep(1.5)
+        self.frostbite_dispatcher.connected_event.wait(1.5)
 
     #===============================================================================
     # 
@@ -297,36 +776,105 @@ class FrostbiteServer(threading.Thread):
     #
     #===============================================================================
 
-    def subscribe(self, func):
-        """Add func from Frosbite events listeners."""
-        self.observers.add(func)
+    def subscribe(self, func, events=None):
+        """Add func from Frosbite events listeners.
+        If events is given, func is only called for events with those names
+        and other events are not even decoded unless someone else wants them.
+        
+        usage :
+            server.subscribe(onChat, events=('player.onChat',))
+        """
+        if events is None:
+            self.observers = self.observers | set([func])
+        else:
+            event_observers = dict(self.event_observers)
+            for name in events:
+                event_observers[name] = event_observers.get(name, frozenset()) | set([func])
+            self.event_observers = event_observers
         
-    def unsubscribe(self, func):
+    def unsubscribe(self, func, events=None):
         """Remove func from Frosbite events listeners."""
-        self.observers.remove(func)
+        if events is None:
+            if func not in self.observers:
+                raise KeyError(func)
+            self.observers = self.observers - set([func])
+        else:
+            event_observers = dict(self.event_observers)
+            for name in events:
+                observers = event_observers[name] - set([func])
+                if observers:
+                    event_observers[name] = observers
+                else:
+                    del event_observers[name]
+            self.event_observers = event_observers
 
     def command(self, *command):
         """send command to the Frostbite server in a synchronous way.
         Calling this method will block until we receive the reply packet from the
         game server or until we reach the timeout.
         """
+        if command is None:
+            return None
+        return self.get_response(self.command_async(*command))
+
+    def command_async(self, *command, **options):
+        """send command to the Frostbite server without waiting for the reply.
+        Return a PendingCommand to be given to get_response() later on.
+        Calling this method blocks while the outgoing queue is full, for at
+        most the send_timeout option (command_timeout by default) after which
+        CommandTimeoutError is raised. send_timeout=0 never blocks.
+        """
         if not self.connected:
             raise NetworkError("not connected")
         
         self.getLogger().info("command : %s " % repr(command))
-        if command is None:
-            return None
-
-        command_id = self.frostbite_dispatcher.send_command(*command)
-        self.pending_commands[command_id] = None
+        if len(command) == 1 and type(command[0]) == tuple:
+            words = command[0]
+        else:
+            words = command
+        if not self.frostbite_dispatcher.wait_for_send_room(options.get('send_timeout', self.command_timeout)):
+            raise CommandTimeoutError("Outgoing queue is full, could not send %r" % (words,))
+        # register the command before sending it so a fast reply cannot be
+        # dropped, and never reuse the sequence number of a pending command
+        self._pending_lock.acquire()
+        try:
+            command_id = self.frostbite_dispatcher.sequence.allocate(self.pending_commands)
+            pending = PendingCommand(command_id, words, _monotonic() + self.command_timeout)
+            self.pending_commands[command_id] = pending
+            self.commands_sent += 1
+            heapq.heappush(self._pending_timeouts, (pending.deadline, command_id, pending))
+        finally:
+            self._pending_lock.release()
+        self.frostbite_dispatcher.send_request(command_id, words)
         self.getLogger().debug("command #%i sent. %s " % (command_id, repr(command)))
-        
-        response = self._wait_for_response(command_id)
+        return pending
+
+    def get_response(self, pending):
+        """block until the reply to a command sent with command_async() is
+        received and return its words following 'OK'.
+        Raise CommandFailedError if the server did not reply 'OK'"""
+        response = self._wait_for_response(pending)
         if response[0] != "OK":
+            self.commands_failed += 1
             raise CommandFailedError(response)
         else:
             return response[1:]
 
+    def command_iter(self, *command):
+        """send command to the Frostbite server in a synchronous way and return
+        an iterator over the words following 'OK'. Words are decoded as they are
+        consumed, which saves building huge lists for large responses such as
+        banList.list or reservedSlots.list.
+        Raise CommandFailedError if the server did not reply 'OK'
+        """
+        packet = self._wait_for_packet(self.command_async(*command))
+        if packet.name != "OK":
+            self.commands_failed += 1
+            raise CommandFailedError(packet.words)
+        words = packet.iterwords()
+        next(words)
+        return words
+
     def auth(self):
         """authenticate on the Frosbite server with given password"""
         self.getLogger().info("starting authentication")
@@ -339,6 +887,23 @@ class FrostbiteServer(threading.Thread):
         self.command("login.hashed", passwordHashHexString)
         self.getLogger().info("authentication done")
 
+    def stats(self):
+        """return a dict of the connection counters"""
+        dispatcher = self.frostbite_dispatcher
+        return {
+            'connected': self.connected,
+            'commands_sent': self.commands_sent,
+            'commands_pending': len(self.pending_commands),
+            'commands_failed': self.commands_failed,
+            'commands_timed_out': self.commands_timed_out,
+            'events_received': self.events_received,
+            'packets_sent': dispatcher.packets_sent,
+            'packets_received': dispatcher.packets_received,
+            'bytes_sent': dispatcher.bytes_sent,
+            'bytes_received': dispatcher.bytes_received,
+            'bytes_queued': dispatcher._out_size,
+        }
+
     def close(self):
         self.frostbite_dispatcher.close()
 
@@ -369,45 +934,126 @@ class FrostbiteServer(threading.Thread):
         self.getLogger().info('start loop')
         try:
             while not self.isStopped():
-                asyncore.loop(count=1, timeout=1)
+                timeout = self._expire_pending_commands()
+                if self._socket_map:
+                    asyncore.loop(count=1, timeout=timeout, map=self._socket_map)
+                else:
+                    self._fail_pending_commands(NetworkError("Lost connection to Frostbite2 server"))
+                    self._stopEvent.wait(timeout)
         except KeyboardInterrupt:
             pass
         finally:
             self.frostbite_dispatcher.close()
+            self._fail_pending_commands(NetworkError("Lost connection to Frostbite2 server"))
         self.getLogger().info('end loop')
 
+    def _is_observed_event(self, name):
+        return bool(self.observers) or name in self.event_observers
+
     def _on_event(self, words):
-        self.getLogger().debug("received Frostbite event : %s" % repr(words))
+        self.getLogger().debug("received Frostbite event : %r", words)
+        self.events_received += 1
         for func in self.observers:
             func(words)
+        if words:
+            for func in self.event_observers.get(words[0], ()):
+                func(words)
 
-    def _on_command_response(self, command_id, words):
-        self.getLogger().debug("received Frostbite command #%i response : %s" % (command_id, repr(words)))
-        if command_id not in self.pending_commands:
-            self.getLogger().warn("dropping Frostbite command #%i response as we are not waiting for it anymore" % command_id)
-        else:
-            self.pending_commands[command_id] = words
-            self.__command_reply_event.set()
+    def _on_command_response(self, command_id, packet):
+        self._pending_lock.acquire()
+        try:
+            pending = self.pending_commands.pop(command_id, None)
+        finally:
+            self._pending_lock.release()
+        if pending is None:
+            self.getLogger().debug("dropping Frostbite command #%i response as we are not waiting for it anymore", command_id)
+            return
+        self.getLogger().debug("received Frostbite command #%i response : %r", command_id, packet)
+        pending.set_response(packet)
+
+    def _expire_pending_commands(self):
+        """fail the pending commands which reached their deadline and return
+        the number of seconds until the next deadline (at most 1s)"""
+        now = _monotonic()
+        expired = []
+        self._pending_lock.acquire()
+        try:
+            heap = self._pending_timeouts
+            while heap and heap[0][0] <= now:
+                deadline, command_id, pending = heapq.heappop(heap)
+                if self.pending_commands.get(command_id) is pending:
+                    del self.pending_commands[command_id]
+                    expired.append(pending)
+            timeout = heap[0][0] - now if heap else 1
+            self.commands_timed_out += len(expired)
+        finally:
+            self._pending_lock.release()
+        for pending in expired:
+            pending.set_error(CommandTimeoutError("Did not receive any response for sequence #%i." % pending.command_id))
+        return max(0, min(timeout, 1))
+
+    def _fail_pending_commands(self, error):
+        self._pending_lock.acquire()
+        try:
+            pendings = self.pending_commands.values()
+            self.pending_commands.clear()
+            del self._pending_timeouts[:]
+        finally:
+            self._pending_lock.release()
+        for pending in pendings:
+            pending.set_error(error)
 
 
-    def _wait_for_response(self, command_id):
-        """block until response to for given command_id has been received or until timeout is reached."""
-        expire_time = time.time() + self.command_timeout
-        while not self.isStopped() and command_id in self.pending_commands and self.pending_commands[command_id] is None:
-            if not self.connected:
+    def _wait_for_response(self, pending):
+        """block until the response to the given pending command has been
+        received or until the connection thread expires it."""
+        while not pending.wait(1):
+            if self.isStopped() or not self.connected:
                 raise NetworkError("Lost connection to Frostbite2 server")
-            if time.time() >= expire_time:
-                del self.pending_commands[command_id]
-                raise CommandTimeoutError("Did not receive any response for sequence #%i." % command_id)
-            self.getLogger().debug("waiting for some command reply #%i : %r " % (command_id, self.pending_commands))
-            self.__command_reply_event.clear()
-            self.__command_reply_event.wait(self.command_timeout)
-        try:
-            response = self.pending_commands[command_id]
-            del self.pending_commands[command_id]
-            return response
-        except KeyError:
-            raise CommandTimeoutError("Did not receive any response for sequence #%i." % command_id)
+        if pending.error is not None:
+            raise pending.error
+        return pending.response
+
+    def _wait_for_packet(self, pending):
+        """same as _wait_for_response but return the reply as a PacketView"""
+        self._wait_for_response(pending)
+        return pending.packet
+
+
+###################################################################################
+
+BANLIST_FIELDS = ('idType', 'id', 'banType', 'time', 'reason')
+
+
+def iterBanlistContent(words):
+    """
+    yield the bans of a banList.list response one at a time, with the same
+    keys as frostbiteCommander.BanlistContent. words can be any iterable of words, such as the
+    iterator returned by FrostbiteServer.command_iter('banList.list'), so that
+    large banlists are never held in memory as a whole. Raise FrostbiteError
+    if the response holds fewer bans than it announces.
+
+    usage :
+        for b in iterBanlistContent(frostbiteServer.command_iter('banList.list')):
+            print b
+    """
+    words = iter(words)
+    try:
+        numOfBans = int(next(words))
+    except StopIteration:
+        return
+    for i in xrange(numOfBans):
+        tmp = [w for j, w in zip(xrange(5), words)]
+        if len(tmp) < 5:
+            # a StopIteration would silently end the iteration
+            raise FrostbiteError("banList.list response truncated after %s of %s bans" % (i, numOfBans))
+        yield {
+            'idType': tmp[0],
+            'id': tmp[1],
+            'banType': tmp[2],
+            'time': tmp[3],
+            'reason': tmp[4],
+        }
 
 
 
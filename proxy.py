@@ -0,0 +1,396 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# RCON multiplexing proxy : share one authenticated connection to a Frostbite
+# game server among many local RCON clients.
+#
+# usage : python proxy.py [-b <bind address>] [-L <local password>] <host>:<port>:<password>:<local port> ...
+#
+# Each local client talks to the proxy as it would to the game server. The
+# proxy answers login, logout and event subscription commands itself, serves
+# read-only queries from a short lived cache and forwards everything else
+# over the single upstream connection, remapping sequence numbers.
+#
+# The proxy thread never waits on the upstream connection : when its
+# outgoing queue is full, commands are answered with an UpstreamError reply.
+# Replies and events coming from the upstream connection thread are handed
+# over to the proxy thread, which alone writes to the client connections.
+#
+from protocol import FrostbiteServer, FrostbiteError, CommandFailedError, \
+    PacketChannel, PacketView, PacketTemplate, SequenceCounter, EncodePacket, \
+    generatePasswordHash, _monotonic
+from collections import deque
+import asyncore
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+
+__version__ = "1.0"
+
+# commands answered from the cache and how long (in seconds) their replies stay valid
+CACHE_TTL = {
+    'serverInfo': 2,
+    'listPlayers': 2,
+    'admin.listPlayers': 2,
+    'version': 300,
+    'help': 300,
+    'admin.help': 300,
+    'admin.getPlaylists': 300,
+    'banList.list': 10,
+    'reservedSlots.list': 10,
+    'mapList.list': 10,
+}
+
+# commands a client can run before logging in to the proxy
+UNPRIVILEGED_COMMANDS = ('login.plainText', 'login.hashed', 'logout', 'quit',
+                         'serverInfo', 'version', 'listPlayers')
+
+
+def _socketpair():
+    """pair of connected sockets. socket.socketpair() is only available on unix"""
+    if hasattr(socket, 'socketpair'):
+        return socket.socketpair()
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        a = socket.create_connection(listener.getsockname())
+        b, address = listener.accept()
+        return a, b
+    finally:
+        listener.close()
+
+
+class ProxyWaker(asyncore.dispatcher):
+    """wake the proxy thread up from other threads"""
+
+    def __init__(self, map):
+        reader, self._writer = _socketpair()
+        asyncore.dispatcher.__init__(self, sock=reader, map=map)
+        self._writer.setblocking(0)
+
+    def wake(self):
+        try:
+            self._writer.send('x')
+        except socket.error:
+            # the buffer is full, the proxy thread has not woken up yet
+            pass
+
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        self.recv(4096)
+
+    def close(self):
+        asyncore.dispatcher.close(self)
+        self._writer.close()
+
+
+class ProxyClient(PacketChannel):
+    """connection from a local RCON client to the proxy"""
+
+    def __init__(self, proxy, sock, map):
+        PacketChannel.__init__(self, sock=sock, map=map)
+        self.proxy = proxy
+        self.logged_in = False
+        self.events_enabled = False
+        self.salt = None
+        self.event_sequence = SequenceCounter()
+
+    def getLogger(self):
+        return logging.getLogger("ProxyClient")
+
+    def reply(self, sequence, words, flush=True):
+        self.send_packet(EncodePacket(False, True, sequence, words), flush)
+
+    def handle_packet(self, packet):
+        view = PacketView(packet)
+        if view.isResponse:
+            # acknowledgement of an event we forwarded
+            return
+        if view.isFromServer:
+            self.getLogger().warn("received a bad packet from client pretending being a request from server. %r", view)
+            return
+        self.proxy.handle_request(self, view.sequence, view.words)
+
+    def handle_close(self):
+        PacketChannel.handle_close(self)
+        self.proxy.remove_client(self)
+
+
+class ProxyListener(asyncore.dispatcher):
+    """accept local RCON clients"""
+
+    def __init__(self, proxy, address, map):
+        asyncore.dispatcher.__init__(self, map=map)
+        self.proxy = proxy
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind(address)
+        self.listen(16)
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            sock, address = pair
+            logging.getLogger("FrostbiteProxy").info("client connected from %s:%s" % address)
+            self.proxy.add_client(ProxyClient(self.proxy, sock, self._map))
+
+
+class FrostbiteProxy(threading.Thread):
+    """thread accepting local RCON clients on local_port and multiplexing them
+    over the already authenticated upstream FrostbiteServer"""
+
+    def __init__(self, upstream, local_port, local_password, bind_address='127.0.0.1'):
+        threading.Thread.__init__(self, name="FrostbiteProxyThread")
+        self.upstream = upstream
+        self.local_password = local_password
+        self._socket_map = {}
+        self._stopEvent = threading.Event()
+        self._lock = threading.Lock()
+        self._clients = set()
+        # command words -> (expire time, PacketTemplate of the reply)
+        self._cache = {}
+        # command words -> list of (client, sequence) waiting for the same reply
+        self._in_flight = {}
+        # incremented by each command which may change what cached queries
+        # return, so that replies to queries sent before are not cached
+        self._cache_generation = 0
+        # (client, PacketTemplate, reply sequence or None for an event) to be
+        # sent by the proxy thread
+        self._outbox = deque()
+        self._waker = ProxyWaker(self._socket_map)
+        self.listener = ProxyListener(self, (bind_address, local_port), self._socket_map)
+        upstream.subscribe(self._on_event)
+
+    #===============================================================================
+    #
+    #    Public API
+    #
+    #===============================================================================
+
+    def stop(self):
+        self._stopEvent.set()
+        self._waker.wake()
+
+    def add_client(self, client):
+        self._lock.acquire()
+        try:
+            self._clients = self._clients | set([client])
+        finally:
+            self._lock.release()
+
+    def remove_client(self, client):
+        self._lock.acquire()
+        try:
+            self._clients = self._clients - set([client])
+        finally:
+            self._lock.release()
+
+    def handle_request(self, client, sequence, words):
+        """called from the proxy thread for each request sent by a client"""
+        if not words:
+            client.reply(sequence, ['InvalidArguments'], flush=False)
+            return
+        name = words[0]
+        if name == 'login.plainText':
+            if len(words) != 2:
+                client.reply(sequence, ['InvalidArguments'], flush=False)
+            elif words[1] == self.local_password:
+                client.logged_in = True
+                client.reply(sequence, ['OK'], flush=False)
+            else:
+                client.reply(sequence, ['InvalidPassword'], flush=False)
+        elif name == 'login.hashed':
+            self._login_hashed(client, sequence, words)
+        elif name == 'logout':
+            client.logged_in = False
+            client.reply(sequence, ['OK'], flush=False)
+        elif name == 'quit':
+            client.reply(sequence, ['OK'])
+            client.handle_close()
+        elif not client.logged_in and name not in UNPRIVILEGED_COMMANDS:
+            client.reply(sequence, ['LogInRequired'], flush=False)
+        elif name in ('eventsEnabled', 'admin.eventsEnabled'):
+            if len(words) == 1:
+                client.reply(sequence, ['OK', str(client.events_enabled).lower()], flush=False)
+            elif len(words) == 2 and words[1].lower() in ('true', 'false'):
+                client.events_enabled = words[1].lower() == 'true'
+                client.reply(sequence, ['OK'], flush=False)
+            else:
+                client.reply(sequence, ['InvalidArguments'], flush=False)
+        else:
+            self._forward(client, sequence, tuple(words))
+
+    #===============================================================================
+    #
+    # Other methods
+    #
+    #===============================================================================
+
+    def getLogger(self):
+        return logging.getLogger("FrostbiteProxy")
+
+    def isStopped(self):
+        return self._stopEvent.is_set()
+
+    def run(self):
+        """Threaded code"""
+        self.getLogger().info('start loop')
+        try:
+            while not self.isStopped():
+                asyncore.loop(count=1, timeout=1, map=self._socket_map)
+                self._send_outbox()
+        finally:
+            asyncore.close_all(map=self._socket_map)
+        self.getLogger().info('end loop')
+
+    def _login_hashed(self, client, sequence, words):
+        if len(words) == 1:
+            client.salt = os.urandom(16)
+            client.reply(sequence, ['OK', client.salt.encode("hex").upper()], flush=False)
+        elif len(words) == 2:
+            if client.salt is not None and words[1].upper() == \
+                    generatePasswordHash(client.salt, self.local_password).encode("hex").upper():
+                client.logged_in = True
+                client.reply(sequence, ['OK'], flush=False)
+            else:
+                client.reply(sequence, ['InvalidPasswordHash'], flush=False)
+        else:
+            client.reply(sequence, ['InvalidArguments'], flush=False)
+
+    def _forward(self, client, sequence, words):
+        ttl = CACHE_TTL.get(words[0])
+        waiters = [(client, sequence)]
+        self._lock.acquire()
+        try:
+            if ttl:
+                cached = self._cache.get(words)
+                if cached is not None and cached[0] > _monotonic():
+                    client.send_packet(cached[1].encode(False, True, sequence), flush=False)
+                    return
+                if words in self._in_flight:
+                    # same query already sent upstream, share its reply
+                    self._in_flight[words].append((client, sequence))
+                    return
+                self._in_flight[words] = waiters
+            else:
+                # the command may change what cached queries would return,
+                # including the replies to the queries in flight
+                self._cache.clear()
+                self._in_flight.clear()
+                self._cache_generation += 1
+            generation = self._cache_generation
+        finally:
+            self._lock.release()
+        try:
+            # never block the proxy thread on a full upstream queue
+            pending = self.upstream.command_async(words, send_timeout=0)
+        except FrostbiteError, err:
+            self._on_upstream_response(words, ttl, waiters, generation, None, err)
+            return
+        pending.add_done_callback(lambda p: self._on_upstream_response(words, ttl, waiters, generation, p.response, p.error))
+
+    def _on_upstream_response(self, words, ttl, waiters, generation, response, error):
+        if error is not None:
+            self.getLogger().warn("upstream error for %r : %r" % (words, error))
+            response = ['UpstreamError', str(error)]
+        reply = PacketTemplate(response)
+        self._lock.acquire()
+        try:
+            if ttl:
+                if self._in_flight.get(words) is waiters:
+                    del self._in_flight[words]
+                if response[0] == 'OK' and generation == self._cache_generation:
+                    self._cache[words] = (_monotonic() + ttl, reply)
+            for waiting_client, waiting_sequence in waiters:
+                self._outbox.append((waiting_client, reply, waiting_sequence))
+        finally:
+            self._lock.release()
+        self._waker.wake()
+
+    def _on_event(self, words):
+        """fan out upstream events to the clients which enabled them"""
+        event = PacketTemplate(words)
+        self._lock.acquire()
+        try:
+            for client in self._clients:
+                if client.events_enabled:
+                    self._outbox.append((client, event, None))
+        finally:
+            self._lock.release()
+        self._waker.wake()
+
+    def _send_outbox(self):
+        """queue the replies and events handed over by the upstream thread.
+        They are written by handle_write() on the next loop"""
+        self._lock.acquire()
+        try:
+            outbox, self._outbox = self._outbox, deque()
+        finally:
+            self._lock.release()
+        for client, template, sequence in outbox:
+            if not client.connected:
+                continue
+            if sequence is None:
+                client.send_packet(template.encode(True, False, client.event_sequence.allocate()), flush=False)
+            else:
+                client.send_packet(template.encode(False, True, sequence), flush=False)
+
+
+def connect_upstream(host, port, password):
+    """open, authenticate and enable events on the upstream connection"""
+    upstream = FrostbiteServer(host, port, password)
+    upstream.auth()
+    try:
+        upstream.command('admin.eventsEnabled', 'true')
+    except CommandFailedError:
+        # BFBC2 servers
+        upstream.command('eventsEnabled', 'true')
+    return upstream
+
+
+def main():
+    from getopt import getopt
+
+    bind_address = '127.0.0.1'
+    local_password = None
+
+    opts, args = getopt(sys.argv[1:], 'b:L:')
+    for k, v in opts:
+        if k == '-b':
+            bind_address = v
+        elif k == '-L':
+            local_password = v
+    if not args:
+        print "usage : python proxy.py [-b <bind address>] [-L <local password>] <host>:<port>:<password>:<local port> ..."
+        sys.exit(1)
+
+    proxies = []
+    try:
+        for arg in args:
+            host, port, password, local_port = arg.rsplit(':', 3)
+            print "connecting to %s:%s" % (host, port)
+            upstream = connect_upstream(host, int(port), password)
+            proxy = FrostbiteProxy(upstream, int(local_port),
+                local_password if local_password is not None else password, bind_address)
+            proxy.start()
+            proxies.append(proxy)
+            print "proxying %s:%s on %s:%s" % (host, port, bind_address, local_port)
+        while True:
+            time.sleep(1)
+    except (KeyboardInterrupt, FrostbiteError), err:
+        if isinstance(err, FrostbiteError):
+            print 'error: %r' % err
+    finally:
+        for proxy in proxies:
+            proxy.stop()
+            proxy.upstream.stop()
+
+
+if __name__ == '__main__':
+    main()
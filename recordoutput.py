@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Streamed output of command results as json, csv or table
+#
+# usage :
+#     bans = iterBanlistContent(frostbiteServer.command_iter('banList.list'))
+#     write_records(bans, ('idType', 'id', 'banType', 'time', 'reason'), 'csv')
+#
+# Records are dicts and are written one at a time as they are decoded, so
+# that large results never have to be held as a whole :
+#     json  : one JSON object per line
+#     csv   : a header line, then one line per record
+#     table : aligned columns, sized on the first page of records
+# With a page size, the output pauses every page for the user to ask for more.
+#
+from collections import OrderedDict
+import csv
+import json
+import sys
+
+FORMATS = ('json', 'csv', 'table')
+
+
+class JsonWriter(object):
+    def __init__(self, out, fields):
+        self.out = out
+        self.fields = fields
+
+    def write(self, record):
+        self.out.write(json.dumps(OrderedDict([(f, record.get(f)) for f in self.fields]),
+                                  encoding='latin-1') + '\n')
+
+    def close(self):
+        pass
+
+
+class CsvWriter(object):
+    def __init__(self, out, fields):
+        self.fields = fields
+        self._writer = csv.writer(out)
+        self._writer.writerow(fields)
+
+    def write(self, record):
+        self._writer.writerow([record.get(f, '') for f in self.fields])
+
+    def close(self):
+        pass
+
+
+class TableWriter(object):
+    """columns are as wide as the header and the values of the first
+    sample_size records. Wider values later on just push the next columns"""
+
+    def __init__(self, out, fields, sample_size=50):
+        self.out = out
+        self.fields = fields
+        self.sample_size = sample_size
+        self._sample = []
+        self._widths = None
+
+    def write(self, record):
+        if self._widths is not None:
+            self._write_row([record.get(f, '') for f in self.fields])
+            return
+        self._sample.append(record)
+        if len(self._sample) >= self.sample_size:
+            self._flush_sample()
+
+    def close(self):
+        if self._widths is None:
+            self._flush_sample()
+
+    def _flush_sample(self):
+        rows = [[str(r.get(f, '')) for f in self.fields] for r in self._sample]
+        self._widths = [max([len(f)] + [len(row[i]) for row in rows]) for i, f in enumerate(self.fields)]
+        self._write_row(self.fields)
+        self._write_row(['-' * w for w in self._widths])
+        for row in rows:
+            self._write_row(row)
+        self._sample = []
+
+    def _write_row(self, values):
+        self.out.write('  '.join([str(v).ljust(w) for v, w in zip(values, self._widths)]).rstrip() + '\n')
+
+
+WRITERS = {
+    'json': JsonWriter,
+    'csv': CsvWriter,
+    'table': TableWriter,
+}
+
+
+def ask_more():
+    """ask the user whether to go on with the next page"""
+    try:
+        answer = raw_input('-- more -- [Enter] next page, [q] stop ')
+    except EOFError:
+        return False
+    return not answer.strip().lower().startswith('q')
+
+
+def write_records(records, fields, format='table', out=None, page_size=None, more=ask_more):
+    """write records (an iterable of dicts) with the given fields in the
+    given format. If page_size is given, call more() every page_size records
+    and stop if it returns False. Return the number of records written"""
+    out = out or sys.stdout
+    writer = WRITERS[format](out, list(fields))
+    count = 0
+    try:
+        for record in records:
+            writer.write(record)
+            count += 1
+            if page_size and count % page_size == 0:
+                writer.close()
+                out.flush()
+                if not more():
+                    break
+    finally:
+        writer.close()
+        out.flush()
+    return count
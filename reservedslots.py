@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Reserved slots reconciliation
+#
+# usage : python reservedslots.py [-k] <server list file> <VIP file>
+#     -k : keep the players reserved on a server but missing from the VIP file
+#
+# The VIP file has one player name per line ; empty lines and lines starting
+# with '#' are ignored. For each server, reservedSlots.list is compared to the
+# VIP file and only the reservedSlots.removePlayer / reservedSlots.addPlayer
+# commands needed are sent, pipelined and followed by reservedSlots.save.
+# All servers are reconciled concurrently.
+#
+from protocol import FrostbiteError
+from fleet import read_server_list, pipeline, run_on_fleet, connect_fleet, close_fleet
+import sys
+
+
+def read_vip_file(filename):
+    """return the list of player names found in a VIP file"""
+    names = []
+    f = open(filename)
+    try:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                names.append(line)
+    finally:
+        f.close()
+    return names
+
+
+def reservedSlotsEdits(current, target, keepExtra=False):
+    """return the reservedSlots commands turning the current list of names
+    into the target one"""
+    current = set(current)
+    target = set(target)
+    commands = []
+    if not keepExtra:
+        commands.extend([('reservedSlots.removePlayer', name) for name in sorted(current - target)])
+    commands.extend([('reservedSlots.addPlayer', name) for name in sorted(target - current)])
+    return commands
+
+
+def reconcileReservedSlots(server, target, keepExtra=False):
+    """make the reserved slots of a FrostbiteServer match target. Return the
+    commands sent"""
+    commands = reservedSlotsEdits(server.command('reservedSlots.list'), target, keepExtra)
+    if not commands:
+        return commands
+    batch = commands + [('reservedSlots.save',)]
+    results = pipeline(server, batch)
+    for command, result in zip(batch, results):
+        if isinstance(result, Exception):
+            raise FrostbiteError("%r failed : %r" % (command, result))
+    return commands
+
+
+def main():
+    from getopt import getopt
+
+    keepExtra = False
+    opts, args = getopt(sys.argv[1:], 'k')
+    for k, v in opts:
+        if k == '-k':
+            keepExtra = True
+    if len(args) != 2:
+        print "usage : python reservedslots.py [-k] <server list file> <VIP file>"
+        sys.exit(1)
+
+    target = read_vip_file(args[1])
+    connections, errors = connect_fleet(read_server_list(args[0]))
+    try:
+        results = run_on_fleet(sorted(connections.keys()),
+            lambda name: reconcileReservedSlots(connections[name], target, keepExtra))
+        for name in sorted(errors.keys()):
+            print "%-24s connection failed : %s" % (name, errors[name])
+        for name in sorted(results.keys()):
+            result, elapsed = results[name]
+            if isinstance(result, Exception):
+                print "%-24s %6.3fs  failed : %s" % (name, elapsed, result)
+            else:
+                added = len([c for c in result if c[0] == 'reservedSlots.addPlayer'])
+                print "%-24s %6.3fs  +%s -%s" % (name, elapsed, added, len(result) - added)
+    finally:
+        close_fleet(connections)
+
+
+if __name__ == '__main__':
+    main()
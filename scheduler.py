@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Priority command scheduler with rate limiting for a FrostbiteServer
+#
+# usage :
+#     scheduler = CommandScheduler(frostbite_server, rate=(20, 40),
+#                                  family_rates={'messages': (2, 5)})
+#     scheduler.start()
+#     scheduler.command('admin.kickPlayer', 'Cheater')        # high priority
+#     scheduler.command('serverInfo', caller='dashboard')      # low priority
+#     print scheduler.metrics()
+#
+from protocol import CommandTimeoutError, FrostbiteError, _monotonic
+from collections import deque
+import logging
+import threading
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITY_NAMES = ('high', 'normal', 'low')
+
+# commands which must not wait behind routine traffic, and cheap polling
+# commands which can wait. Other commands get PRIORITY_NORMAL
+COMMAND_PRIORITIES = {
+    'admin.kickPlayer': PRIORITY_HIGH,
+    'admin.killPlayer': PRIORITY_HIGH,
+    'admin.movePlayer': PRIORITY_HIGH,
+    'banList.add': PRIORITY_HIGH,
+    'banList.remove': PRIORITY_HIGH,
+    'punkBuster.pb_sv_command': PRIORITY_HIGH,
+    'serverInfo': PRIORITY_LOW,
+    'version': PRIORITY_LOW,
+    'listPlayers': PRIORITY_LOW,
+    'admin.listPlayers': PRIORITY_LOW,
+    'banList.list': PRIORITY_LOW,
+    'reservedSlots.list': PRIORITY_LOW,
+    'mapList.list': PRIORITY_LOW,
+}
+
+# commands sharing a rate limit. Other commands are in the family named after
+# their first word
+COMMAND_FAMILIES = {
+    'admin.say': 'messages',
+    'admin.yell': 'messages',
+    'serverInfo': 'polling',
+    'listPlayers': 'polling',
+    'admin.listPlayers': 'polling',
+    'banList.list': 'polling',
+    'reservedSlots.list': 'polling',
+    'mapList.list': 'polling',
+}
+
+
+class TokenBucket(object):
+    """allow rate events per second on average, with bursts of up to capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._time = _monotonic()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._time) * self.rate)
+        self._time = now
+
+    def delay(self, now):
+        """number of seconds until a token is available"""
+        self._refill(now)
+        if self._tokens >= 1:
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def consume(self, now):
+        self._refill(now)
+        self._tokens -= 1
+
+
+class LatencyStats(object):
+    """count, mean, max and percentiles of the last samples"""
+
+    def __init__(self, size=1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=size)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self._recent.append(value)
+
+    def percentile(self, p):
+        if not self._recent:
+            return 0.0
+        values = sorted(self._recent)
+        return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+
+class ScheduledCommand(object):
+    """a command waiting in the scheduler queue, then sent to the server"""
+
+    def __init__(self, scheduler, words, priority, family, caller):
+        self.scheduler = scheduler
+        self.words = words
+        self.priority = priority
+        self.family = family
+        self.caller = caller
+        self.submit_time = _monotonic()
+        self.dispatch_time = None
+        self.pending = None
+        self.error = None
+        self._dispatched = threading.Event()
+
+    def result(self, timeout=None):
+        """block until the command is sent and replied to. Return the words
+        following 'OK' like FrostbiteServer.command().
+        timeout limits the time spent waiting in the scheduler queue"""
+        self._dispatched.wait(timeout)
+        if not self._dispatched.is_set():
+            if self.scheduler.cancel(self):
+                raise CommandTimeoutError("%r waited more than %ss in the scheduler queue" % (self.words, timeout))
+            self._dispatched.wait()
+        if self.error is not None:
+            raise self.error
+        return self.scheduler.server.get_response(self.pending)
+
+
+class CommandScheduler(threading.Thread):
+    """thread sending the commands submitted by many callers to a FrostbiteServer
+    by order of priority, sharing each priority class fairly between callers
+    and respecting token bucket rate limits for the server and for each command
+    family"""
+
+    def __init__(self, server, rate=None, family_rates=None):
+        """rate and the values of family_rates are (commands per second, burst size)"""
+        threading.Thread.__init__(self, name="CommandSchedulerThread")
+        self.daemon = True
+        self.server = server
+        self._server_bucket = TokenBucket(*rate) if rate else None
+        self._family_buckets = {}
+        for family, family_rate in (family_rates or {}).items():
+            self._family_buckets[family] = TokenBucket(*family_rate)
+        self._condition = threading.Condition(threading.Lock())
+        self._stopEvent = threading.Event()
+        # for each priority : caller -> deque of ScheduledCommand, and the
+        # round robin order of callers having queued commands
+        self._queues = [{} for name in PRIORITY_NAMES]
+        self._callers = [deque() for name in PRIORITY_NAMES]
+        self._queue_wait = [LatencyStats() for name in PRIORITY_NAMES]
+        self._round_trip = [LatencyStats() for name in PRIORITY_NAMES]
+
+    #===============================================================================
+    #
+    #    Public API
+    #
+    #===============================================================================
+
+    def submit(self, words, priority=None, caller=None):
+        """queue a command and return its ScheduledCommand.
+        priority defaults to COMMAND_PRIORITIES, caller to the calling thread"""
+        words = tuple(words)
+        if priority is None:
+            priority = COMMAND_PRIORITIES.get(words[0], PRIORITY_NORMAL)
+        if caller is None:
+            caller = threading.current_thread().name
+        family = COMMAND_FAMILIES.get(words[0], words[0].split('.')[0])
+        scheduled = ScheduledCommand(self, words, priority, family, caller)
+        self._condition.acquire()
+        try:
+            queues = self._queues[priority]
+            if caller not in queues:
+                queues[caller] = deque()
+                self._callers[priority].append(caller)
+            queues[caller].append(scheduled)
+            self._condition.notify()
+        finally:
+            self._condition.release()
+        return scheduled
+
+    def command(self, *command, **kwargs):
+        """send a command through the scheduler in a synchronous way.
+        Accept the priority, caller and timeout keyword arguments"""
+        if len(command) == 1 and type(command[0]) == tuple:
+            command = command[0]
+        scheduled = self.submit(command, kwargs.get('priority'), kwargs.get('caller'))
+        return scheduled.result(kwargs.get('timeout'))
+
+    def cancel(self, scheduled):
+        """remove a command not yet sent from the queue. Return False if it
+        was already sent"""
+        self._condition.acquire()
+        try:
+            queue = self._queues[scheduled.priority].get(scheduled.caller)
+            if queue is None or scheduled not in queue:
+                return False
+            queue.remove(scheduled)
+            if not queue:
+                self._remove_caller(scheduled.priority, scheduled.caller)
+            return True
+        finally:
+            self._condition.release()
+
+    def metrics(self):
+        """queue wait time (time spent in the scheduler) and round trip time
+        (time spent waiting for the server) per priority, in seconds"""
+        self._condition.acquire()
+        try:
+            metrics = {}
+            for priority, name in enumerate(PRIORITY_NAMES):
+                metrics[name] = {
+                    'queued': sum(len(q) for q in self._queues[priority].values()),
+                    'queue_wait': self._queue_wait[priority].as_dict(),
+                    'round_trip': self._round_trip[priority].as_dict(),
+                }
+            return metrics
+        finally:
+            self._condition.release()
+
+    def stop(self):
+        self._stopEvent.set()
+        self._condition.acquire()
+        try:
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+    #===============================================================================
+    #
+    # Other methods
+    #
+    #===============================================================================
+
+    def getLogger(self):
+        return logging.getLogger("CommandScheduler")
+
+    def run(self):
+        """Threaded code"""
+        while not self._stopEvent.is_set():
+            self._condition.acquire()
+            try:
+                scheduled, delay = self._next_command()
+                if scheduled is None:
+                    self._condition.wait(delay)
+                    continue
+                scheduled.dispatch_time = _monotonic()
+                self._queue_wait[scheduled.priority].add(scheduled.dispatch_time - scheduled.submit_time)
+            finally:
+                self._condition.release()
+            self._dispatch(scheduled)
+
+    def _next_command(self):
+        """pop the next command allowed to be sent. Return (None, seconds to
+        wait) if no command can be sent right now"""
+        now = _monotonic()
+        if self._server_bucket is not None:
+            delay = self._server_bucket.delay(now)
+            if delay > 0:
+                return None, delay
+        delay = 1
+        for priority in range(len(PRIORITY_NAMES)):
+            callers = self._callers[priority]
+            for i in range(len(callers)):
+                caller = callers[0]
+                callers.rotate(-1)
+                queue = self._queues[priority][caller]
+                bucket = self._family_buckets.get(queue[0].family)
+                if bucket is not None:
+                    family_delay = bucket.delay(now)
+                    if family_delay > 0:
+                        # rate limited, give the turn to the next caller
+                        delay = min(delay, family_delay)
+                        continue
+                    bucket.consume(now)
+                if self._server_bucket is not None:
+                    self._server_bucket.consume(now)
+                scheduled = queue.popleft()
+                if not queue:
+                    self._remove_caller(priority, caller)
+                return scheduled, 0
+        return None, delay
+
+    def _remove_caller(self, priority, caller):
+        del self._queues[priority][caller]
+        self._callers[priority].remove(caller)
+
+    def _dispatch(self, scheduled):
+        try:
+            scheduled.pending = self.server.command_async(scheduled.words)
+            scheduled.pending.add_done_callback(lambda p: self._on_done(scheduled))
+        except FrostbiteError, err:
+            scheduled.error = err
+        scheduled._dispatched.set()
+
+    def _on_done(self, scheduled):
+        rtt = _monotonic() - scheduled.dispatch_time
+        self._condition.acquire()
+        try:
+            self._round_trip[scheduled.priority].add(rtt)
+        finally:
+            self._condition.release()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Commands of BF3 game servers
+#
+# see commandschema.py for the format of this module
+#
+
+COMMANDS = (
+    # name, arguments, flags
+    ('login.plainText',       '<password: password>', 'u'),
+    ('login.hashed',          '[passwordHash: hex]', 'u'),
+    ('logout',                '', 'u'),
+    ('quit',                  '', 'u'),
+    ('version',               '', 'u'),
+    ('serverInfo',            '', 'u'),
+    ('listPlayers',           '<players: player subset>', 'u'),
+    ('admin.help',            '', ''),
+    ('admin.listPlayers',     '<players: player subset>', ''),
+    ('vars.killCam',          '[enabled: boolean]', 'm'),
+    ('vars.friendlyFire',     '[enabled: boolean]', 'm'),
+    ('vars.regenerateHealth', '[enabled: boolean]', 'm'),
+)
+
+HELP = {}
+
+HELP['vars.killCam'] = """
+ Request: vars.killCam [enabled: boolean]
+ 
+Response: OK - for set operation
+Response: OK <enabled: boolean> - for get operation
+Response: InvalidArguments
+
+  Effect: Set if killcam is enabled 
+   Delay: Works after map switch
+"""
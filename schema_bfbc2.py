@@ -0,0 +1,868 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Commands of BFBC2 (R9 protocol) and MOH game servers
+#
+# see commandschema.py for the format of this module
+#
+
+COMMANDS = (
+    # name, arguments, flags
+    ('login.plainText',                '<password: password>', 'u'),
+    ('login.hashed',                   '[passwordHash: hex]', 'u'),
+    ('logout',                         '', 'u'),
+    ('quit',                           '', 'u'),
+    ('version',                        '', 'u'),
+    ('listPlayers',                    '<players: player subset>', 'u'),
+    ('eventsEnabled',                  '[enabled: boolean]', ''),
+    ('help',                           '', ''),
+    ('admin.runScript',                '<filename: filename>', 'm'),
+    ('punkBuster.pb_sv_command',       '<command: string>', 'm'),
+    ('serverInfo',                     '', 'u'),
+    ('admin.yell',                     '<message: string> <duration: integer> <players: player subset>', 'm'),
+    ('admin.say',                      '<message: string> <players: player subset>', 'm'),
+    ('admin.runNextLevel',             '', 'm'),
+    ('admin.currentLevel',             '', ''),
+    ('mapList.nextLevelIndex',         '[index: integer]', 'm'),
+    ('admin.restartMap',               '', 'm'),
+    ('admin.supportedMaps',            '<play list: playlist>', ''),
+    ('admin.setPlaylist',              '<name: playlist>', 'm'),
+    ('admin.getPlaylist',              '', ''),
+    ('admin.getPlaylists',             '', ''),
+    ('admin.kickPlayer',               '<soldier name: player> [reason: string]', 'm'),
+    ('admin.killPlayer',               '<name: player>', 'm'),
+    ('admin.listPlayers',              '<players: player subset>', ''),
+    ('admin.movePlayer',               '<name: player> <teamId: team> <squadId: squad> <forceKill: boolean>', 'm'),
+    ('admin.shutDown',                 '', 'm'),
+    ('banList.load',                   '', 'm'),
+    ('banList.save',                   '', 'm'),
+    ('banList.add',                    '<id-type: id-type> <id: string> <timeout: timeout> [reason: string]', 'm'),
+    ('banList.remove',                 '<id-type: id-type> <id: banned id>', 'm'),
+    ('banList.clear',                  '', 'm'),
+    ('banList.list',                   '', ''),
+    ('reservedSlots.configFile',       '[filename: filename]', 'm'),
+    ('reservedSlots.load',             '', 'm'),
+    ('reservedSlots.save',             '', 'm'),
+    ('reservedSlots.addPlayer',        '<soldier name: string>', 'm'),
+    ('reservedSlots.removePlayer',     '<soldier name: reserved slot>', 'm'),
+    ('reservedSlots.clear',            '', 'm'),
+    ('reservedSlots.list',             '', ''),
+    ('mapList.configFile',             '[filename: filename]', 'm'),
+    ('mapList.load',                   '', 'm'),
+    ('mapList.save',                   '', 'm'),
+    ('mapList.list',                   '', ''),
+    ('mapList.clear',                  '', 'm'),
+    ('mapList.remove',                 '<index: integer>', 'm'),
+    ('mapList.append',                 '<name: map>', 'm'),
+    ('mapList.insert',                 '<index: integer> <name: map>', 'm'),
+    ('vars.adminPassword',             '[password: password]', 'm'),
+    ('vars.gamePassword',              '[password: password]', 'm'),
+    ('vars.punkBuster',                '[enabled: boolean]', 'm'),
+    ('vars.hardCore',                  '[enabled: boolean]', 'm'),
+    ('vars.ranked',                    '[enabled: boolean]', 'm'),
+    ('vars.rankLimit',                 '[rank: integer]', 'm'),
+    ('vars.teamBalance',               '[enabled: boolean]', 'm'),
+    ('vars.friendlyFire',              '[enabled: boolean]', 'm'),
+    ('vars.currentPlayerLimit',        '', ''),
+    ('vars.maxPlayerLimit',            '', ''),
+    ('vars.playerLimit',               '[nr of players: integer]', 'm'),
+    ('vars.bannerUrl',                 '[url: string]', 'm'),
+    ('vars.serverDescription',         '[description: string]', 'm'),
+    ('vars.killCam',                   '[enabled: boolean]', 'm'),
+    ('vars.miniMap',                   '[enabled: boolean]', 'm'),
+    ('vars.crossHair',                 '[enabled: boolean]', 'm'),
+    ('vars.3dSpotting',                '[enabled: boolean]', 'm'),
+    ('vars.miniMapSpotting',           '[enabled: boolean]', 'm'),
+    ('vars.thirdPersonVehicleCameras', '[enabled: boolean]', 'm'),
+)
+
+HELP = {}
+
+HELP['login.plainText'] = """
+ Request: login.plainText <password: string> 
+
+Response: OK - Login successful, you are now logged in regardless of prior 
+          status 
+Response: InvalidPassword - Login unsuccessful, logged-in status unchanged 
+Response: PasswordNotSet  - Login unsuccessful, logged-in status unchanged 
+Response: InvalidArguments
+
+  Effect: Attempt to login to game server with password <password> 
+Comments: If you are connecting to the admin interface over the internet, then 
+          use login.hashed instead to avoid having evildoers sniff the admin 
+          password
+"""
+
+HELP['login.hashed'] = """
+ Request: login.hashed 
+ 
+Response: OK <salt: HexString> - Retrieved salt for the current connection 
+Response: PasswordNotSet - No password set for server, login impossible 
+Response: InvalidArguments 
+  Effect: Retrieves the salt, used in the hashed 
+          password login process 
+
+Comments: This is step 1 in the 2-step hashed password process. When using this 
+          people cannot sniff your admin password.
+
+
+ Request: login.hashed <passwordHash: HexString> 
+ 
+Response: OK - Login successful, you are now logged in regardless of prior 
+          status 
+Response: PasswordNotSet - No password set for server, login impossible 
+Response: InvalidPasswordHash - Login unsuccessful, logged-in status unchanged 
+Response: InvalidArguments 
+  Effect: Sends a hashed password to the server, in an 
+          attempt to log in 
+          
+Comments: This is step 2 in the 2-step hashed password process. When using this 
+        people cannot sniff your admin password.
+"""
+
+HELP['logout'] = """
+ Request: logout 
+ 
+Response: OK - You are now logged out regardless of prior status 
+Response: InvalidArguments 
+
+  Effect: Logout from game server
+"""
+
+HELP['quit'] = """
+ Request: quit 
+ 
+Response: OK 
+Response: InvalidArguments 
+
+  Effect: Disconnect from server
+"""
+
+HELP['version'] = """
+ Request: version 
+ 
+Response: OK BFBC2 <version> 
+Response: InvalidArguments 
+
+  Effect: Reports game server type, and build ID 
+Comments: Game server type and build ID uniquely identify the server, and the 
+          protocol it is running.
+"""
+
+HELP['listPlayers'] = """\
+ Request: listPlayers <players: player subset>
+  
+Response: OK <player info> 
+Response: InvalidArguments
+ 
+  Effect: Return list of all players on the server, but with zeroed out GUIDs
+"""
+
+HELP['eventsEnabled'] = """
+ Request: eventsEnabled [enabled: boolean] 
+ 
+Response: OK - for set operation 
+Response: OK <enabled: boolean> - for get operation 
+Response: InvalidArguments 
+
+  Effect: Set whether or not the server will send events to the current 
+          connection
+"""
+
+HELP['help'] = """
+ Request: help 
+ 
+Response: OK <all commands available on server, as separate words> 
+Response: InvalidArguments 
+
+  Effect: Report which commands the server knows about
+"""
+
+HELP['admin.runScript'] = """
+ Request: admin.runScript <filename: filename> 
+ 
+Response: OK 
+Response: InvalidArguments 
+Response: InvalidFileName - The filename specified does not follow filename 
+          rules 
+Response: ScriptError <line> <original error...> - Script failed at line <line>, 
+          with the given error 
+
+  Effect: Process file, executing script lines one-by-one, aborting processing 
+          upon error
+"""
+
+HELP['punkBuster.pb_sv_command'] = """
+ Request: punkBuster.pb_sv_command <command: string> 
+ 
+Response: OK - Command sent to PunkBuster server module 
+Response: InvalidArguments 
+Response: InvalidPbServerCommand - Command does not begin with 'pb_sv_'
+
+  Effect: Send a raw PunkBuster command to the PunkBuster server 
+ Comment: The entire command is to be sent as a single string. Don't split it 
+          into multiple words.
+"""
+
+HELP['serverInfo'] = """
+ Request: serverInfo 
+ 
+Response: OK <serverName> <current playercount> <max playercount> <current gamem
+			ode> <current map> <current round> <max rounds> 
+Response: InvalidArguments 
+
+  Effect: Query for brief server info. 
+Comments: This command can be performed without being logged in.
+"""
+
+HELP['admin.yell'] = """
+ Request: admin.yell <message: string> <duration [in ms]: integer> 
+                                                        <players: player subset>
+Response: OK
+Response: InvalidArguments
+Response: TooLongMessage
+Response: InvalidDuration
+
+  Effect: Display a message, very visibly on players' screens, for a certain 
+          amount of time. The duration must be more than 0 and at most 60000 ms.
+          The message must be less than 100 characters long.
+"""
+
+HELP['admin.say'] = """
+ Request: admin.say <message: string> <players: player subset>
+ 
+Response: OK
+Response: InvalidArguments
+Response: TooLongMessage
+
+  Effect: Send a chat message to players. The message must be less 
+          than 100 characters long.
+"""
+
+HELP['admin.runNextLevel'] = """
+ Request: admin.runNextLevel
+ 
+Response: OK
+Response: InvalidArguments
+
+  Effect: Switch to next level
+Comments: Always successful.
+"""
+
+HELP['admin.currentLevel'] = """
+ Request: admin.currentLevel
+ 
+Response: OK <name>
+Response: InvalidArguments
+
+  Effect: Return current level name
+"""
+
+HELP['mapList.nextLevelIndex'] = """\
+ Request:  mapList.nextLevelIndex  
+Response:  OK  
+  Effect:  Get index of next level to be run 
+ 
+ 
+ Request:  mapList.nextLevelIndex <index: integer>  
+  
+Response:  OK  
+Response:  InvalidArguments  
+Response:  InvalidIndex  - Level index not available in server map list  
+
+  Effect:  Set index of next level to be run to <index>  
+"""
+
+HELP['admin.restartMap'] = """
+ Request: admin.restartMap
+ 
+Response: OK
+Response: InvalidArguments
+Response: LevelNotAvailable - server currently has no level loaded / level not 
+          available on server
+
+  Effect: End current round, and restart with the same map
+"""
+
+HELP['admin.supportedMaps'] = """
+ Request: admin.supportedMaps <play list: string>
+ 
+Response: OK <map names>
+Response: InvalidArguments
+Response: InvalidPlaylist <play list> - Play list doesn't exist. 
+
+  Effect: Retrieve maplist of maps supported in this play list
+"""
+
+HELP['admin.setPlaylist'] = """
+ Request: admin.setPlaylist <name: string>
+ 
+Response: OK - Play list was changed
+Response: InvalidArguments
+Response: InvalidPlaylist - Play list doesn't exist on server. Should be RUSH, 
+		  CONQUEST, SQDM or SQRUSH.
+
+  Effect: Set the play list on the server.
+Comments: Will only use maps supported for this play list. So the mapList might 
+          be invalid 
+   Delay: Change occurs after end of round
+"""
+
+HELP['admin.getPlaylist'] = """
+ Request: admin.getPlaylist
+ 
+Response: OK <play list>
+Response: InvalidArguments
+
+  Effect: Get the current play list for the server
+"""
+
+HELP['admin.getPlaylists'] = """
+ Request: admin.getPlaylists
+ 
+Response: OK <play lists>
+Response: InvalidArguments
+
+  Effect: Get the play lists for the server
+"""
+
+HELP['admin.kickPlayer'] = """
+ Request:  admin.kickPlayer  <soldier name: player name, reason: string>
+ 
+Response:  OK - Player did exist, and got kicked  
+Response:  InvalidArguments  
+Response:  PlayerNotFound  - Player name doesn't exist on server 
+  
+  Effect:  Kick player <soldier name> from server  
+Comments:  Reason text is optional. Default reason is 'Kicked by administrator'.  
+"""
+
+HELP['admin.killPlayer'] = """
+ Request:  admin.killPlayer  <name: player name>
+ 
+Response:  OK - Player did exist, and kill him 
+Response:  InvalidArguments  
+Response:  InvalidPlayerName  - Player name doesn't exist on server 
+Response:  SoldierNotAlive  
+  
+  Effect:  Kill a player without any stats effect
+"""
+
+HELP['admin.listPlayers'] = """
+ Request: admin.listPlayers <players: player subset>
+ 
+Response: OK <player info> 
+Response: InvalidArguments
+
+  Effect: Return list of all players on the server
+"""
+
+HELP['admin.movePlayer'] = """
+ Request:  admin.movePlayer <name: player name> <teamId: TeamID> <squadId: SquadID> <forceKill: boolean>
+ 
+Response:  OK
+Response:  InvalidArguments
+Response:  InvalidTeamId
+Response:  InvalidSquadId
+Response:  InvalidPlayerName  - Player name doesn't exist on server 
+Response:  InvalidForceKill  - forceKill must be 'true' or 'false' 
+Response:  PlayerNotDead - Player is alive and forceKill is false
+Response:  SetTeamFailed
+Response:  SetSquadFailed
+  
+  Effect:  Move a player to another team and/or squad
+ Comment:  Only works if player is dead. This command will kill player if forceKill is true
+"""
+
+HELP['admin.shutDown'] = """
+ Request:  admin.shutDown
+ 
+Response:  OK
+Response:  InvalidArguments  
+  
+  Effect:  shutdown the server
+"""
+
+HELP['banList.load'] = """\
+ Request: banList.load 
+
+Response: OK 
+Response: InvalidArguments 
+Response: InvalidIdType 
+Response: InvalidBanType 
+Response: InvalidTimeStamp - A time stamp could not be read 
+Response: IncompleteBan - Incomplete ban entry at end of file 
+Response: AccessError - Could not read from file 
+
+  Effect: Load list of banned players/IPs/GUIDs from file 
+ Comment: 5 lines (Id-type, id, ban-type, time and reason) are retrieved for 
+          every ban in the list. Entries read before getting InvalidIdType, 
+          InvalidBanType, InvalidTimeStamp and IncompleteBan is still loaded.
+"""
+
+HELP['banList.save'] = """\
+ Request: banList.save 
+
+Response: OK 
+Response: InvalidArguments 
+Response: AccessError - Could not save to file 
+
+  Effect: Save list of banned players/IPs/GUIDs to file 
+ Comment: 5 lines (Id-type, id, ban-type, time and reason) are stored for every
+          ban in the list. Every line break has windows '\r\n' characters.
+"""
+
+HELP['banList.add'] = """\
+ Request: banList.add <id-type: id-type> <id: string> <timeout: timeout> 
+                                                               <reason: string> 
+Response: OK 
+Response: InvalidArguments 
+Response: BanListFull 
+
+  Effect: Add player to ban list for a certain amount of time 
+Comments: Adding a new player/IP/GUID ban will replace any previous ban for that
+          player/IP/GUID 
+          Timeout can take three forms: 
+              perm - permanent [default] 
+              round - until end of round 
+              seconds <integer> - number of seconds until ban expires 
+          Id-type can be any of these :
+              name - A soldier name 
+              ip - An IP address 
+              guid - A player guid
+          Id could be either a soldier name, ip address or guid depending on 
+          id-type. Reason is optional and defaults to 'Banned by admin'; max 
+          length 80 chars. The ban list can contain at most 100 entries.
+"""
+
+HELP['banList.remove'] = """\
+ Request: banList.remove <id-type: id-type> <id: string> 
+
+Response: OK 
+Response: InvalidArguments 
+Response: NotFound - Id not found in banlist; banlist unchanged 
+
+  Effect: Remove player/ip/guid from banlist
+"""
+
+HELP['banList.clear'] = """\
+ Request: banList.clear 
+
+Response: OK 
+Response: InvalidArguments 
+
+Effect: Clears ban list
+"""
+
+HELP['banList.list'] = """\
+ Request: banList.list 
+ 
+Response: OK <player ban entries> 
+Response: InvalidArguments 
+
+  Effect: Return list of banned players/IPs/GUIDs. 
+ Comment: The list starts with a number telling how many bans the list is 
+          holding. After that, 5 words (Id-type, id, ban-type, time and reason)
+          are received for every ban in the list.
+"""
+
+HELP['reservedSlots.configFile'] = """
+ Request: reservedSlots.configFile [filename: filename] - disabled for security
+          reasons atm
+          
+Response: OK - for set option
+Response: OK <filename> - for get option
+Response: InvalidArguments
+Response: InvalidFileName - Filename does not follow filename rules
+
+  Effect: Set name of reserved slots configuration file
+"""
+
+HELP['reservedSlots.load'] = """
+ Request: reservedSlots.load
+ 
+Response: OK
+Response: InvalidArguments
+Response: AccessError - File not found; internal reserved slots list is now 
+          empty
+          
+  Effect: Load list of soldier names from file. This is a file with one soldier
+          name per line. If loading succeeds, the reserved slots list will get 
+          updated. If loading fails, the reserved slots list will remain 
+          unchanged.
+"""
+
+HELP['reservedSlots.save'] = """
+ Request: reservedSlots.save
+ 
+Response: OK
+Response: InvalidArguments
+Response: AccessError - Error while saving
+
+  Effect: Save list of reserved soldier names to file. This is a file with one 
+          soldier name per line.
+Comment: If saving fails, the output file may be unchanged or corrupt.
+"""
+
+HELP['reservedSlots.addPlayer'] = """
+ Request: reservedSlots.addPlayer <soldier name: player name>
+ 
+Response: OK
+Response: InvalidArguments
+Response: PlayerAlreadyInList - Player is already in the list; reserved slots 
+          list unchanged
+          
+  Effect: Add <soldier name> to list of players who can use the reserved slots.
+"""
+
+HELP['reservedSlots.removePlayer'] = """
+ Request: reservedSlots.removePlayer <soldier name: player name>
+ 
+Response: OK
+Response: InvalidArguments
+Response: PlayerNotInList - Player does not exist in list; reserved slots list 
+          unchanged
+          
+  Effect: Remove <soldier name> from list of players who can use the reserved 
+          slots.
+"""
+
+HELP['reservedSlots.clear'] = """
+ Request: reservedSlots.clear
+ 
+Response: OK
+Response: InvalidArguments
+
+  Effect: Clear reserved slots list
+"""
+
+HELP['reservedSlots.list'] = """
+ Request: reservedSlots.list
+ 
+Response: OK <soldier names>
+Response: InvalidArguments
+
+  Effect: Retrieve list of players who can utilize the reserved slots
+"""
+
+HELP['mapList.configFile'] = """
+ Request: mapList.configFile [filename: filename] - disabled for security 
+          reasons atm
+          
+Response: OK - for set option
+Response: OK <filename> - for get option
+Response: InvalidArguments
+Response: InvalidFileName - Filename does not follow filename rules
+
+  Effect: Set name of maplist configuration file
+"""
+
+HELP['mapList.load'] = """
+ Request: mapList.load
+ 
+Response: OK - Maplist loaded
+Response: InvalidArguments
+Response: AccessError - File not found, internal maplist is now empty
+Response: InvalidPlaylist - Play list doesn't exist. Should be RUSH, CONQUEST, 
+          SQDM or SQRUSH.
+Response: InvalidMapName <name> - Map with name <name> doesn't exist in 
+          playlist/gamemode
+
+  Effect: Load list of map names from file. This is a file with one map name 
+          per line.
+Comments: If loading succeeds, the maplist will get updated. 
+          If loading fails, the maplist will remain unchanged.
+"""
+
+HELP['mapList.save'] = """
+ Request: mapList.save
+ 
+Response: OK - Maplist saved
+Response: InvalidArguments
+Response: AccessError - Error while saving, on-disk maplist file possibly 
+          corrupted now
+          
+  Effect: Save maplist to file. This is a file with one map name per line.
+Comments: If saving fails, the output file may be unchanged or corrupt.
+          Every line break has windows '\r\n' characters.
+"""
+
+HELP['mapList.list'] = """
+ Request: mapList.list
+ 
+Response: OK <map names>
+Response: InvalidArguments
+
+  Effect: Retrieve current maplist
+"""
+
+HELP['mapList.clear'] = """
+ Request: mapList.clear
+ 
+Response: OK
+Response: InvalidArguments
+
+  Effect: Clears maplist
+Comments: If server attempts to switch level while maplist is cleared, nasty 
+          things will happen
+"""
+
+HELP['mapList.remove'] = """
+ Request: mapList.remove <index: integer> 
+ 
+Response: OK - Map removed from list 
+Response: InvalidArguments 
+Response: InvalidIndex - Index doesn't exist in server map list 
+
+  Effect: Remove map from list.
+"""
+
+HELP['mapList.append'] = """
+ Request: mapList.append <name: string> 
+
+Response: OK - Map appended to list 
+Response: InvalidArguments 
+Response: InvalidMapName - Map doesn't exist on server 
+
+  Effect: Add map with name <name> to end of maplist 
+ Comment: Remember to specify playlist before adding maps
+"""
+
+HELP['mapList.insert'] = """\
+ Request: mapList.insert <index: integer, name: string> 
+
+Response: OK - Map inserted to list 
+Response: InvalidArguments 
+Response: InvalidMapName - Map doesn't exist on server or negative index 
+
+  Effect: Add map with name at the specified index to the maplist
+"""
+
+HELP['vars.adminPassword'] = """
+ Request: vars.adminPassword [password: password]
+ 
+Response: OK - for set operation
+Response: OK <password> - for get operation
+Response: InvalidArguments
+Response: InvalidPassword - password does not conform to password format rules
+
+  Effect: Set the admin password for the server, use it with an empty string("") to reset
+"""
+
+HELP['vars.gamePassword'] = """
+ Request: vars.gamePassword [password: password]
+ 
+Response: OK - for set operation
+Response: OK <password> - for get operation
+Response: InvalidArguments
+Response: InvalidPassword - password does not conform to password format rules
+Response: InvalidConfig - password can't be set if ranked is enabled
+
+  Effect: Set the game password for the server, use it with an empty string("")
+          to reset
+"""
+
+HELP['vars.punkBuster'] = """
+ Request: vars.punkBuster [enabled: boolean]
+ 
+Response: OK - for set operation
+Response: OK <enabled: boolean> - for get operation
+Response: InvalidArguments
+Response: InvalidConfig - punkbuster can't be disabled if ranked is enabled 
+Response: StartupOnlyCallNotAllowed - this command can only be executed from 
+          startup.txt
+
+  Effect: Set if the server will use PunkBuster or not
+"""
+
+HELP['vars.hardCore'] = """
+ Request: vars.hardCore [enabled: boolean]
+ 
+Response: OK - for set operation
+Response: OK <enabled: boolean> - for get operation
+Response: InvalidArguments
+
+  Effect: Set hardcore mode 
+   Delay: Works after map change
+"""
+
+HELP['vars.ranked'] = """
+ Request: vars.ranked [enabled: boolean]
+ 
+Response: OK - for set operation
+Response: OK <enabled: boolean> - for get operation 
+Response: InvalidArguments
+Response: StartupOnlyCallNotAllowed - this command can only be executed from 
+          startup.txt 
+
+  Effect: Set ranked or not. If enabled: game password will be removed and 
+          punkbuster enabled
+"""
+
+HELP['vars.rankLimit'] = """
+ Request: vars.rankLimit <rank: integer> ##QA: Says 'OK' but still allow higher
+          ranked players to join
+          
+Response: OK - for set operation
+Response: OK <rank: integer> - for get operation
+Response: InvalidArguments
+
+  Effect: Set the highest rank allowed on to the server (integer value).
+ Comment: To disable rank limit use -1 as value
+"""
+
+HELP['vars.teamBalance'] = """
+ Request: vars.teamBalance [enabled: boolean]
+ 
+Response: OK - for set operation
+Response: OK <enabled: boolean> - for get operation
+Response: InvalidArguments
+
+  Effect: Set if the server should autobalance
+"""
+
+HELP['vars.friendlyFire'] = """
+ Request: vars.friendlyFire [enabled: boolean]
+ 
+Response: OK - for set operation
+Response: OK <enabled: boolean> - for get operation
+Response: InvalidArguments
+Response: LevelNotLoaded  - for set operation
+
+  Effect: Set if the server should allow team damage 
+   Delay: Works after round restart 
+ Comment: Not available during level load.
+"""
+
+HELP['vars.currentPlayerLimit'] = """
+ Request: vars.currentPlayerLimit
+ 
+Response: OK <nr of players: integer> - for get operation
+Response: ReadOnly - if you try to send any arguments
+Response: InvalidArguments
+
+  Effect: Retrieve the current maximum number of players
+ Comment: This value is computed from all the different player limits in effect 
+         at any given moment
+"""
+
+HELP['vars.maxPlayerLimit'] = """
+ Request: vars.maxPlayerLimit
+ 
+Response: OK <nr of players: integer> - for get operation
+Response: ReadOnly - if you try to send any arguments
+Response: InvalidArguments
+
+  Effect: Retrieve the server-enforced maximum number of players
+ Comment: Setting the user-defined maximum number of players higher than this 
+          has no effect
+"""
+
+HELP['vars.playerLimit'] = """
+ Request: vars.playerLimit [nr of players: integer]
+ 
+Response: OK - for set operation
+Response: OK <nr of players: integer> - for get operation
+Response: InvalidArguments
+Response: InvalidNrOfPlayers - Player limit must be in the range 8..32
+
+  Effect: Set desired maximum number of players
+ Comment: The effective maximum number of players is also effected by the server
+          provider, and the game engine
+"""
+
+HELP['vars.bannerUrl'] = """
+ Request: vars.bannerUrl [url: string]
+ 
+Response: OK - for set operation
+Response: OK <url: string> - for get operation
+Response: InvalidArguments
+Response: TooLongUrl - for set operation
+
+  Effect: Set banner url
+ Comment: The banner url needs to be less than 64 characters long The banner 
+          needs to be a 512x64 picture smaller than 127kb 
+ Example: admin.setBannerUrl http://www.example.com/banner.jpg
+"""
+
+HELP['vars.serverDescription'] = """
+ Request: vars.serverDescription <description: string>
+ 
+Response: OK - for set operation
+Response: OK <description: string> - for get operation
+Response: InvalidArguments
+Response: TooLongDescription - for set operation
+
+  Effect: Set server description
+ Comment: The description needs to be less than 400 characters long
+"""
+
+HELP['vars.killCam'] = """
+ Request: vars.killCam [enabled: boolean]
+ 
+Response: OK - for set operation
+Response: OK <enabled: boolean> - for get operation
+Response: InvalidArguments
+
+  Effect: Set if killcam is enabled 
+   Delay: Works after map switch
+"""
+
+HELP['vars.miniMap'] = """
+ Request: vars.miniMap [enabled: boolean]
+ 
+Response: OK - for set operation
+Response: OK <enabled: boolean> - for get operation
+Response: InvalidArguments
+
+  Effect: Set if minimap is enabled 
+   Delay: Works after map switch
+"""
+
+HELP['vars.crossHair'] = """
+ Request: vars.crossHair [enabled: boolean]
+ 
+Response: OK - for set operation
+Response: OK <enabled: boolean> - for get operation
+Response: InvalidArguments
+
+  Effect: Set if crosshair for all weapons is enabled 
+   Delay: Works after map 
+          switch
+"""
+
+HELP['vars.3dSpotting'] = """
+ Request: vars.3dSpotting [enabled: boolean]
+ 
+Response: OK - for set operation
+Response: OK <enabled: boolean> - for get operation
+Response: InvalidArguments
+
+  Effect: Set if spotted targets are visible in the 3d-world 
+   Delay: Works after
+          map switch
+"""
+
+HELP['vars.miniMapSpotting'] = """
+ Request: vars.miniMapSpotting [enabled: boolean]
+ 
+Response: OK - for set operation
+Response: OK <enabled: boolean> - for get operation
+Response: InvalidArguments
+
+  Effect: Set if spotted targets are visible on the minimap 
+   Delay: Works after 
+          map switch
+"""
+
+HELP['vars.thirdPersonVehicleCameras'] = """
+ Request: vars.thirdPersonVehicleCameras [enabled: boolean]
+ 
+Response: OK - for set operation
+Response: OK <enabled: boolean> - for get operation
+Response: InvalidArguments
+
+  Effect: <todo> 
+   Delay: Works after map switch
+##QA: Works but is bugged. If you change the setting and someone is in a vehicle in 3rd person view when at end of round, that player will be stuck in 3rd person view even though the setting should only allow 1st person view.
+"""
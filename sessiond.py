@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Session daemon : keep authenticated connections to Frostbite game servers
+# warm for short lived scripts
+#
+# usage :
+#     python sessiond.py [-s <socket path>] [-i <idle timeout>] serve
+#         run the daemon
+#     python sessiond.py [-s <socket path>] run <host>:<port>:<password> <command> [<arguments>]
+#         run a command through the daemon and print the words following 'OK'
+#     python sessiond.py [-s <socket path>] fleet <server list file> <command> [<arguments>]
+#         run a command on every server of a server list file (see fleet.py)
+#
+# or, from a script :
+#     client = SessionClient(host, port, password)
+#     print client.command('serverInfo')
+#
+# Clients talk to the daemon over a Unix domain socket, one JSON object per
+# line. A request is {"server": [host, port, password], "commands": [[words],
+# ...]} and the daemon replies {"results": [...]} with for each command
+# either {"ok": [words following 'OK']}, {"failed": [words]} if the server
+# did not reply 'OK', or {"error": message}. The commands of a request are
+# pipelined. Sessions are keyed by host, port and password, so a client can
+# only use a session by knowing its password, and are closed once idle for
+# a while. The socket is only accessible to the user running the daemon.
+#
+# Unix domain sockets are not available on Windows, where this daemon
+# cannot run.
+#
+from protocol import FrostbiteError, CommandFailedError, NetworkError, _monotonic
+from fleet import read_server_list, pipeline, run_on_fleet, connect
+import SocketServer
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+
+DEFAULT_SOCKET = os.path.join(os.path.expanduser('~'), '.frostbite-sessiond.sock')
+
+
+def _latin1(obj):
+    """words are byte strings, carried as latin-1 in JSON"""
+    if isinstance(obj, unicode):
+        return obj.encode('latin-1')
+    elif isinstance(obj, list):
+        return [_latin1(o) for o in obj]
+    elif isinstance(obj, dict):
+        return dict([(_latin1(k), _latin1(v)) for k, v in obj.iteritems()])
+    return obj
+
+
+class SessionPool(object):
+    """authenticated FrostbiteServer connections by (host, port, password)"""
+
+    # number of locks the keys are spread over
+    key_lock_count = 64
+
+    def __init__(self, idle_timeout=600):
+        self.idle_timeout = idle_timeout
+        self._sessions = {}
+        self._last_used = {}
+        # a lock per group of keys so that concurrent requests open a single
+        # connection. A fixed set, as a lock per key would be kept for every
+        # server and password ever asked for
+        self._key_locks = [threading.Lock() for i in xrange(self.key_lock_count)]
+
+    def get(self, host, port, password):
+        key = (host, port, password)
+        key_lock = self._key_lock(key)
+        key_lock.acquire()
+        try:
+            server = self._sessions.get(key)
+            if server is not None and not server.connected:
+                self._discard(key)
+                server = None
+            if server is None:
+                self.getLogger().info("opening session to %s:%s" % (host, port))
+                server = connect(key)
+                self._sessions[key] = server
+            self._last_used[key] = _monotonic()
+            return server
+        finally:
+            key_lock.release()
+
+    def discard(self, key, server=None):
+        """close the session of key. Given server, only if it is still the
+        session of key and not one opened since"""
+        key_lock = self._key_lock(key)
+        key_lock.acquire()
+        try:
+            if server is None or self._sessions.get(key) is server:
+                self._discard(key)
+        finally:
+            key_lock.release()
+
+    def expire_idle(self):
+        for key, last_used in self._last_used.items():
+            if _monotonic() - last_used <= self.idle_timeout:
+                continue
+            key_lock = self._key_lock(key)
+            key_lock.acquire()
+            try:
+                # get() may have handed the session out since
+                last_used = self._last_used.get(key)
+                if last_used is not None and _monotonic() - last_used > self.idle_timeout:
+                    self.getLogger().info("closing idle session to %s:%s" % key[:2])
+                    self._discard(key)
+            finally:
+                key_lock.release()
+
+    def close_all(self):
+        for key in self._sessions.keys():
+            self.discard(key)
+
+    def getLogger(self):
+        return logging.getLogger("SessionPool")
+
+    def _key_lock(self, key):
+        return self._key_locks[hash(key) % len(self._key_locks)]
+
+    def _discard(self, key):
+        """called with the lock of key held"""
+        server = self._sessions.pop(key, None)
+        self._last_used.pop(key, None)
+        if server is not None:
+            server.stop()
+
+
+class SessionRequestHandler(SocketServer.StreamRequestHandler):
+    """serve the requests of one client connection"""
+
+    def handle(self):
+        for line in iter(self.rfile.readline, ''):
+            try:
+                request = _latin1(json.loads(line))
+                response = self.server.execute(request)
+            except (ValueError, KeyError, TypeError), err:
+                response = {'error': "bad request : %s" % err}
+            self.wfile.write(json.dumps(response, encoding='latin-1') + '\n')
+            self.wfile.flush()
+
+
+class SessionDaemon(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    """Unix domain socket server running commands over pooled sessions"""
+    daemon_threads = True
+
+    def __init__(self, path=DEFAULT_SOCKET, idle_timeout=600):
+        self.path = path
+        self.pool = SessionPool(idle_timeout)
+        if os.path.exists(path):
+            # left over by a previous daemon, unless one is still running
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except socket.error:
+                os.remove(path)
+            else:
+                probe.close()
+                raise FrostbiteError("a session daemon is already listening on %s" % path)
+        umask = os.umask(077)
+        try:
+            SocketServer.UnixStreamServer.__init__(self, path, SessionRequestHandler)
+        finally:
+            os.umask(umask)
+        self._stopEvent = threading.Event()
+        self._reaper = threading.Thread(target=self._reap, name="SessionReaperThread")
+        self._reaper.daemon = True
+        self._reaper.start()
+
+    def execute(self, request):
+        """run the commands of a request and return the response"""
+        host, port, password = request['server']
+        key = (host, int(port), password)
+        try:
+            server = self.pool.get(*key)
+        except (FrostbiteError, socket.error), err:
+            return {'error': "could not open session : %r" % err}
+        results = []
+        for result in pipeline(server, [tuple(c) for c in request['commands']]):
+            if isinstance(result, CommandFailedError):
+                results.append({'failed': list(result.message)})
+            elif isinstance(result, Exception):
+                results.append({'error': repr(result)})
+                if isinstance(result, NetworkError):
+                    self.pool.discard(key, server)
+            else:
+                results.append({'ok': list(result)})
+        return {'results': results}
+
+    def stop(self):
+        self._stopEvent.set()
+        self.shutdown()
+        self.server_close()
+        self.pool.close_all()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _reap(self):
+        """Threaded code"""
+        while not self._stopEvent.wait(min(60, self.pool.idle_timeout)):
+            self.pool.expire_idle()
+
+
+class SessionClient(object):
+    """run commands on a game server through the session daemon, with the
+    same command() interface as FrostbiteServer"""
+
+    def __init__(self, host, port, password=None, path=DEFAULT_SOCKET, timeout=30):
+        self.server = [host, int(port), password]
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(path)
+        self._file = self._socket.makefile('rb')
+        self._lock = threading.Lock()
+
+    def pipeline(self, commands):
+        """run commands at once. Return, in order, the words following 'OK'
+        for each command, or the exception raised for it"""
+        request = json.dumps({'server': self.server, 'commands': [list(c) for c in commands]},
+                             encoding='latin-1')
+        self._lock.acquire()
+        try:
+            self._socket.sendall(request + '\n')
+            line = self._file.readline()
+        finally:
+            self._lock.release()
+        if not line:
+            raise NetworkError("session daemon closed the connection")
+        response = _latin1(json.loads(line))
+        if 'error' in response:
+            raise FrostbiteError(response['error'])
+        results = []
+        for result in response['results']:
+            if 'ok' in result:
+                results.append(result['ok'])
+            elif 'failed' in result:
+                results.append(CommandFailedError(result['failed']))
+            else:
+                results.append(FrostbiteError(result['error']))
+        return results
+
+    def command(self, *command):
+        if len(command) == 1 and type(command[0]) == tuple:
+            command = command[0]
+        result = self.pipeline([command])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+
+def main():
+    from getopt import getopt
+
+    path = DEFAULT_SOCKET
+    idle_timeout = 600
+    opts, args = getopt(sys.argv[1:], 's:i:')
+    for k, v in opts:
+        if k == '-s':
+            path = v
+        elif k == '-i':
+            idle_timeout = int(v)
+    if not args or args[0] not in ('serve', 'run', 'fleet') or (args[0] != 'serve' and len(args) < 3):
+        print "usage : python sessiond.py [-s <socket path>] [-i <idle timeout>] serve"
+        print "        python sessiond.py [-s <socket path>] run <host>:<port>:<password> <command> [<arguments>]"
+        print "        python sessiond.py [-s <socket path>] fleet <server list file> <command> [<arguments>]"
+        sys.exit(1)
+
+    if args[0] == 'serve':
+        daemon = SessionDaemon(path, idle_timeout)
+        print "listening on %s" % path
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            daemon.stop()
+        return
+
+    command = tuple(args[2:])
+    if args[0] == 'run':
+        host, port, password = args[1].split(':', 2)
+        client = SessionClient(host, port, password, path)
+        try:
+            print ' '.join(client.command(command))
+        except FrostbiteError, err:
+            print 'error: %r' % err
+            sys.exit(1)
+        finally:
+            client.close()
+    else:
+        def run(entry):
+            client = SessionClient(entry[0], entry[1], entry[2], path)
+            try:
+                return client.command(command)
+            finally:
+                client.close()
+        results = run_on_fleet(read_server_list(args[1]), run)
+        for entry in sorted(results.keys()):
+            result, elapsed = results[entry]
+            name = "%s:%s" % entry[:2]
+            if isinstance(result, Exception):
+                print "%-24s %6.3fs  failed : %s" % (name, elapsed, result)
+            else:
+                print "%-24s %6.3fs  %s" % (name, elapsed, ' '.join(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,8 @@ setup(
     options = {
         "py2exe": {
             "bundle_files": 2,
+            # command schemas are imported by name when the game is known
+            "includes": ["schema_bfbc2", "schema_bf3"],
         }
     },
 ) 
\ No newline at end of file
@@ -0,0 +1,12 @@
+from distutils.core import setup, Extension
+import sys
+import protocol
+
+
+sys.argv += ['build_ext', '--inplace']
+
+setup(
+    name = "Frostbite protocol speedups",
+    version = protocol.__version__,
+    ext_modules = [Extension("_frostbitespeedups", ["_frostbitespeedups.c"])],
+)
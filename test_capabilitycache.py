@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# usage : python -m unittest test_capabilitycache
+#
+from capabilitycache import CapabilityCache
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class CapabilityCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'capabilities.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_lookup_unknown_server(self):
+        self.assertEqual(None, CapabilityCache(self.filename).lookup('127.0.0.1', 48888))
+
+    def test_store_lookup(self):
+        cache = CapabilityCache(self.filename)
+        cache.store('127.0.0.1', 48888, 'BFBC2', 'R9', commands=['version', 'help'])
+        entry = cache.lookup('127.0.0.1', 48888)
+        self.assertEqual('BFBC2', entry['game'])
+        self.assertEqual('R9', entry['version'])
+        self.assertEqual(['version', 'help'], entry['commands'])
+        self.assertEqual(None, cache.lookup('127.0.0.1', 4888))
+
+    def test_store_lookup_from_file(self):
+        CapabilityCache(self.filename).store('127.0.0.1', 48888, 'BFBC2', 'R9',
+                                             commands=['version'], maps={'CONQUEST': ['mp_001']})
+        entry = CapabilityCache(self.filename).lookup('127.0.0.1', 48888)
+        self.assertEqual(['version'], entry['commands'])
+        self.assertEqual({'CONQUEST': ['mp_001']}, entry['maps'])
+        self.assertEqual(str, type(entry['commands'][0]))
+
+    def test_most_recent_version_wins(self):
+        cache = CapabilityCache(self.filename)
+        cache.store('127.0.0.1', 48888, 'BFBC2', 'R8', commands=['old'])
+        cache.store('127.0.0.1', 48888, 'BFBC2', 'R9', commands=['new'])
+        self.assertEqual('R9', CapabilityCache(self.filename).lookup('127.0.0.1', 48888)['version'])
+
+
+if __name__ == '__main__':
+    unittest.main()
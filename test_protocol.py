@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# usage : python -m unittest test_protocol
+#
+# FROSTBITE_STRESS_COMMANDS sets the number of commands of the concurrency
+# test, 1000000 by default. The codec test is skipped unless the C speedups
+# are built (python setupSpeedups.py).
+#
+from protocol import SequenceCounter, SEQUENCE_MASK, FrostbiteError, FrostbiteServer, \
+    EncodePacket, DecodePacket, SplitPackets, PyEncodeWords, PyDecodeWords, PySplitPackets
+import os
+import random
+import socket
+import threading
+import unittest
+
+
+class EchoServer(threading.Thread):
+    """game server on localhost replying 'OK' followed by the words of each
+    command, so that a reply shows which command it answers"""
+
+    def __init__(self):
+        threading.Thread.__init__(self, name="EchoServer")
+        self.daemon = True
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(16)
+        self.port = self.listener.getsockname()[1]
+
+    def run(self):
+        while True:
+            try:
+                conn, addr = self.listener.accept()
+            except socket.error:
+                return
+            t = threading.Thread(target=self.serve, args=(conn,))
+            t.daemon = True
+            t.start()
+
+    def serve(self, conn):
+        data = ''
+        while True:
+            try:
+                chunk = conn.recv(65536)
+            except socket.error:
+                return
+            if not chunk:
+                return
+            packets, data = SplitPackets(data + chunk)
+            replies = []
+            for packet in packets:
+                isFromServer, isResponse, sequence, words = DecodePacket(packet)
+                replies.append(EncodePacket(False, True, sequence, ['OK'] + words))
+            conn.sendall(''.join(replies))
+
+    def stop(self):
+        self.listener.close()
+
+
+class SequenceCounterTest(unittest.TestCase):
+
+    def test_wraps_around(self):
+        counter = SequenceCounter(SEQUENCE_MASK)
+        self.assertEqual(SEQUENCE_MASK, counter.allocate())
+        self.assertEqual(0, counter.allocate())
+
+    def test_skips_pending_sequences(self):
+        counter = SequenceCounter(SEQUENCE_MASK - 1)
+        in_use = set([SEQUENCE_MASK - 1, SEQUENCE_MASK, 0])
+        self.assertEqual(1, counter.allocate(in_use))
+        self.assertEqual(2, counter.allocate(in_use))
+
+    def test_all_sequences_in_use(self):
+        class Everything(object):
+            """every sequence number is pending"""
+            def __len__(self):
+                return SEQUENCE_MASK + 1
+            def __contains__(self, sequence):
+                return True
+        self.assertRaises(FrostbiteError, SequenceCounter().allocate, Everything())
+
+
+
+class ConcurrentCommandsTest(unittest.TestCase):
+    """many threads sending pipelined commands over several connections :
+    every reply has to be the one of its command"""
+
+    commands = int(os.environ.get('FROSTBITE_STRESS_COMMANDS', 1000000))
+    connections = 4
+    threads_per_connection = 4
+    batch = 1000
+
+    def setUp(self):
+        self.server = EchoServer()
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_replies_match_commands(self):
+        connections = [FrostbiteServer('127.0.0.1', self.server.port) for i in range(self.connections)]
+        nb_threads = self.connections * self.threads_per_connection
+        per_thread = self.commands // nb_threads
+        errors = []
+
+        def run(connection, thread_id):
+            try:
+                for start in xrange(0, per_thread, self.batch):
+                    pendings = []
+                    for i in xrange(start, min(per_thread, start + self.batch)):
+                        command = ('echo', thread_id, str(i))
+                        pendings.append((command, connection.command_async(command)))
+                    for command, pending in pendings:
+                        reply = tuple(connection.get_response(pending))
+                        if reply != command:
+                            errors.append((command, reply))
+            except Exception, err:
+                errors.append(err)
+
+        threads = []
+        try:
+            for c, connection in enumerate(connections):
+                for t in range(self.threads_per_connection):
+                    thread = threading.Thread(target=run, args=(connection, "%s.%s" % (c, t)))
+                    thread.start()
+                    threads.append(thread)
+            for thread in threads:
+                thread.join()
+        finally:
+            for connection in connections:
+                connection.stop()
+        self.assertEqual([], errors[:10])
+        self.assertEqual(per_thread * nb_threads, sum([c.stats()['commands_sent'] for c in connections]))
+
+
+
+try:
+    import _frostbitespeedups
+except ImportError:
+    _frostbitespeedups = None
+
+
+def _outcome(func, *args):
+    """result of a call, or the type and message of the exception it raised"""
+    try:
+        return 'result', func(*args)
+    except Exception, err:
+        return 'error', type(err), str(err)
+
+
+@unittest.skipIf(_frostbitespeedups is None, "the C speedups are not built")
+class SpeedupsCodecTest(unittest.TestCase):
+    """differential fuzzing : the C codec has to give the same bytes, words
+    and exceptions as the pure python one"""
+
+    iterations = 30000
+
+    def setUp(self):
+        self.random = random.Random(26030)
+
+    def random_word(self):
+        r = self.random
+        kind = r.random()
+        if kind < 0.1:
+            return r.randint(-10 ** 6, 10 ** 6)
+        if kind < 0.15:
+            return ''
+        return ''.join([chr(r.randint(0, 255)) for i in range(r.randint(1, 40))])
+
+    def random_words(self):
+        return [self.random_word() for i in range(self.random.randint(0, 12))]
+
+    def mutate(self, data):
+        r = self.random
+        data = bytearray(data)
+        for i in range(r.randint(1, 4)):
+            if not data:
+                break
+            action = r.random()
+            position = r.randrange(len(data))
+            if action < 0.5:
+                data[position] = r.randint(0, 255)
+            elif action < 0.75:
+                del data[position:position + r.randint(1, 8)]
+            else:
+                data[position:position] = chr(r.randint(0, 255)) * r.randint(1, 8)
+        return str(data)
+
+    def test_encode_words(self):
+        for i in xrange(self.iterations):
+            words = self.random_words()
+            self.assertEqual(PyEncodeWords(words), _frostbitespeedups.encode_words(words), words)
+
+    def test_decode_words(self):
+        for i in xrange(self.iterations):
+            size, data = PyEncodeWords(self.random_words())
+            if self.random.random() < 0.5:
+                data = self.mutate(data)
+                size = self.random.choice([size, len(data), self.random.randint(0, len(data) + 10)])
+            self.assertEqual(_outcome(PyDecodeWords, size, data),
+                             _outcome(_frostbitespeedups.decode_words, size, data), (size, data))
+
+    def test_split_packets(self):
+        for i in xrange(self.iterations // 10):
+            data = ''.join([EncodePacket(False, True, self.random.randint(0, SEQUENCE_MASK), self.random_words())
+                            for j in range(self.random.randint(0, 5))])
+            if self.random.random() < 0.5:
+                data = self.mutate(data)
+            for end in sorted(set([len(data), self.random.randint(0, len(data))])):
+                self.assertEqual(_outcome(PySplitPackets, data[:end]),
+                                 _outcome(_frostbitespeedups.split_packets, data[:end]), data[:end])
+
+
+if __name__ == '__main__':
+    unittest.main()